@@ -1,74 +1,268 @@
-import os
-from flask import Flask, request, jsonify
+import base64, hmac, json, os, zlib
+from contextlib import closing
+from flask import Flask, Response, request, jsonify, redirect
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-from services.db_service import get_conn, init_db, save_profile, get_profile, save_log, get_logs
-from ml.dual_baseline import score_entry
-
-from services.scoring_engine import score_all
+from services.db_service import (
+    get_conn, get_db_connection, init_db, save_profile, get_profile, save_log, save_logs,
+    get_profiles, get_logs_many, get_baseline, get_log_page, get_user_versions
+)
+from services.cohort_rollups import summarize as cohort_summary
+from services.ingest import IngestReport, iter_entries, accepted_rows, spool
+from services.result_cache import SCORE_CACHE, entry_key
+from services import metrics
+from services.metrics import stage
+from ml.dual_baseline import score_with_baseline, score_entries, ENGINES, ALL_METRICS
+
+from services.scoring_engine import score_all_batch, MODELS
+from services.model_registry import RegistryError
 from services.google_fit_service import (
     get_authorization_url,
-    exchange_code_for_tokens,
-    refresh_access_token,
-    fetch_aggregated_data
+    exchange_code_for_tokens
 )
+from services.fit_sync import TOKENS
+from services.jobs import RUNNER, STATUSES, submit, get_job, list_jobs
 
-from services.db_service import save_tokens, get_tokens
-import time
+from services.db_service import get_tokens
 
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
-
-conn = get_conn()
-init_db(conn)
+metrics.init_app(app)
+metrics.db_row_gauge(get_db_connection, ["logs", "profiles", "baselines", "user_tokens"])
+
+# schema/migrations once per process; routes use per-thread connections
+with closing(get_conn()) as _conn:
+    init_db(_conn)
+
+# background jobs run on JOB_WORKERS threads per process (0: only via manage.py run-jobs)
+@app.before_request
+def _start_job_runner():
+    RUNNER.ensure_started()
+
+# models load lazily on first use; MODEL_PRELOAD=1 (with gunicorn --preload)
+# compiles/maps them once in the master before workers fork
+if os.getenv("MODEL_PRELOAD") == "1":
+    MODELS.preload()
+
+# a newly activated model version is loaded, warmed up and swapped in by each
+# worker in the background (see services/model_registry.py)
+@app.before_request
+def _watch_model_version():
+    MODELS.maybe_reload()
+
+# /admin/* is off unless ADMIN_TOKEN is set; callers send it as X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def _admin_denied():
+    if not ADMIN_TOKEN:
+        return jsonify({"ok": False, "error": "admin endpoints are disabled (ADMIN_TOKEN not set)"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"ok": False, "error": "bad admin token"}), 403
+    return None
+
+def _user_id_denied(entries):
+    # user ids key dicts and SQL parameters: a list or object must be a 400, not a 500
+    if not all(isinstance(e.get("user_id", "demo_user"), str) for e in entries):
+        return jsonify({"ok": False, "error": "user_id must be a string"}), 400
+    return None
+
+def _json_body():
+    with stage("json_decode"):
+        return request.get_json(force=True)
 
 @app.get("/health")
 def health():
     return jsonify({"ok": True})
 
+@app.get("/metrics")
+def metrics_endpoint():
+    # Prometheus text format; stage/request metrics are per worker process
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.post("/profile")
 def set_profile():
-    data = request.get_json(force=True)
+    data = _json_body()
     user_id = data.get("user_id", "demo_user")
-    save_profile(conn, user_id, data)
+    save_profile(get_db_connection(), user_id, data)
     return jsonify({"ok": True})
 
 @app.post("/submit_data")
 def submit_data():
-    entry = request.get_json(force=True)
+    entry = _json_body()
     user_id = entry.get("user_id", "demo_user")
     date = entry.get("date")
     if not date:
         return jsonify({"ok": False, "error": "date required"}), 400
-    save_log(conn, user_id, date, entry)
+    save_log(get_db_connection(), user_id, date, entry)
     return jsonify({"ok": True})
 
+@app.post("/submit_data/bulk")
+def submit_data_bulk():
+    # JSON array or NDJSON body; bad rows are reported back and skipped, the
+    # rest land in one transaction. The upload is spooled first: save_logs
+    # holds the write lock while it parses, which must not wait on the network.
+    report = IngestReport()
+    with spool(request.stream) as body:
+        try:
+            entries = iter_entries(body, request.content_type)
+            save_logs(get_db_connection(), accepted_rows(entries, report))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify(report.to_dict())
+
 @app.post("/score")
 def score():
-    entry = request.get_json(force=True)
+    entry = _json_body()
+    denied = _user_id_denied([entry])
+    if denied:
+        return denied
     user_id = entry.get("user_id", "demo_user")
 
-    profile = get_profile(conn, user_id)
-    logs = get_logs(conn, user_id, limit=14)
+    # same entry + unchanged profile/logs -> the response computed last time
+    conn = get_db_connection()
+    key = (user_id, *get_user_versions(conn, user_id), entry_key(entry))
+    cached = SCORE_CACHE.get(key)
+    if cached is not None:
+        return Response(cached, mimetype="application/json")
 
-    result = score_entry(profile, entry, logs)
-    return jsonify(result)
+    profile = get_profile(conn, user_id)
+    baseline = get_baseline(conn, user_id)
+
+    result = score_with_baseline(profile, entry, baseline.base, baseline.days, timer=stage)
+    resp = jsonify(result)
+    SCORE_CACHE.put(key, resp.get_data())
+    return resp
+
+@app.post("/score/batch")
+def score_batch():
+    # accepts {"entries": [...], "engine": "python"|"numpy"} or a bare list of /score entries
+    data = _json_body()
+    entries = data.get("entries") if isinstance(data, dict) else data
+    engine = data.get("engine", "python") if isinstance(data, dict) else "python"
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        return jsonify({"ok": False, "error": "entries must be a list of objects"}), 400
+    if engine not in ENGINES:
+        return jsonify({"ok": False, "error": f"engine must be one of {list(ENGINES)}"}), 400
+    denied = _user_id_denied(entries)
+    if denied:
+        return denied
+
+    user_ids = {e.get("user_id", "demo_user") for e in entries}
+    conn = get_db_connection()
+    profiles = get_profiles(conn, user_ids)
+    logs = get_logs_many(conn, user_ids, limit=14, columns=ALL_METRICS)
+
+    results = score_entries(entries, profiles, logs, engine=engine, timer=stage)
+    return jsonify({"results": results})
+
+@app.post("/score/models")
+def score_models():
+    # ML model scores; a single entry, or {"entries": [...]} scored in one batch
+    data = _json_body()
+    batch = isinstance(data, dict) and "entries" in data
+    entries = data["entries"] if batch else [data]
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        return jsonify({"ok": False, "error": "entries must be a list of objects"}), 400
+    denied = _user_id_denied(entries)
+    if denied:
+        return denied
+
+    user_ids = [e.get("user_id", "demo_user") for e in entries]
+    profiles = get_profiles(get_db_connection(), set(user_ids))
+    results = score_all_batch(entries, [profiles[u] for u in user_ids])
+    return jsonify({"results": results} if batch else results[0])
+
+@app.get("/models")
+def models_status():
+    # which models this worker has mapped, its resident memory and model version
+    return jsonify(MODELS.memory_report())
+
+@app.post("/admin/models/reload")
+def admin_models_reload():
+    # {"version": "..."} loads and warms up that version here, and only then
+    # makes it CURRENT (default: reload CURRENT); this worker swaps now, the
+    # others on their next version check
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        result = MODELS.reload(data.get("version"), make_current=bool(data.get("version")))
+    except RegistryError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "pid": os.getpid(), **result})
 
 @app.route("/")
 def home():
     return {"ok": True, "message": "AstraSync backend running", "try": ["/health", "/score"]}, 200
 
+HISTORY_PAGE = 60
+HISTORY_MAX_PAGE = 500
+
+def _encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row["date"], row["id"]]).encode()).decode().rstrip("=")
+
+def _decode_cursor(token: str):
+    try:
+        date, log_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(date), int(log_id)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+
 @app.get("/history/<user_id>")
 def history(user_id):
-    logs = get_logs(conn, user_id, limit=60)
-    return jsonify({"logs": logs})
-
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    # ?limit=60&cursor=<next_cursor>&fields=date,steps,bp_sys
+    # ETag = this user's log version + the query, so an unchanged page is a
+    # 304 after one primary-key lookup
+    conn = get_db_connection()
+    log_version, _ = get_user_versions(conn, user_id)
+    query = "&".join(f"{k}={request.args.get(k, '')}" for k in ("limit", "cursor", "fields"))
+    etag = f"{log_version}-{zlib.crc32(query.encode()):08x}"
+    if etag in request.if_none_match:
+        return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+
+    try:
+        limit = max(1, min(int(request.args.get("limit", HISTORY_PAGE)), HISTORY_MAX_PAGE))
+        cursor = request.args.get("cursor")
+        before = _decode_cursor(cursor) if cursor else None
+        fields = request.args.get("fields")
+        columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        logs = get_log_page(conn, user_id, limit=limit + 1, before=before, columns=columns)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    more = len(logs) > limit
+    logs = logs[:limit]
+    resp = jsonify({
+        "logs": logs,
+        "next_cursor": _encode_cursor(logs[-1]) if more else None,
+        "log_version": log_version,
+    })
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+@app.get("/cohorts")
+def cohorts():
+    # ?metrics=bp_sys,sleep_hours&start=2026-01-01&end=2026-01-31&age_group=30_44&bmi_band=normal
+    # answered from cohort_rollups alone: cost follows cohorts x days, not users
+    metrics = request.args.get("metrics")
+    try:
+        result = cohort_summary(
+            get_db_connection(),
+            metrics=[m.strip() for m in metrics.split(",") if m.strip()] if metrics else None,
+            start=request.args.get("start"),
+            end=request.args.get("end"),
+            age_group=request.args.get("age_group"),
+            bmi_band=request.args.get("bmi_band"),
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"cohorts": result})
 
 @app.route("/auth/google-fit")
 def auth_google_fit():
@@ -83,12 +277,9 @@ def google_callback():
     if "access_token" not in tokens:
         return jsonify({"error": "Token exchange failed"}), 400
 
-    conn = get_db_connection()
-
-    save_tokens(
-        conn,
+    # written through the token cache so this worker doesn't keep serving an old token
+    TOKENS.put(
         user_id="demo_user",   # replace with real logged-in user later
-        provider="google_fit",
         access_token=tokens["access_token"],
         refresh_token=tokens.get("refresh_token"),
         expires_in=tokens["expires_in"]
@@ -98,31 +289,43 @@ def google_callback():
 
 @app.route("/sync/google-fit", methods=["POST"])
 def sync_google_fit():
-
-    conn = get_db_connection()
-    token_row = get_tokens(conn, "demo_user", "google_fit")
-
-    if not token_row:
+    # queued, not run inline: poll /jobs/<id> for the days written
+    if not get_tokens(get_db_connection(), "demo_user", "google_fit"):
         return jsonify({"error": "Google Fit not connected"}), 400
 
-    access_token, refresh_token, expires_at = token_row
-
-    # Auto refresh if expired
-    if time.time() > expires_at:
-        new_tokens = refresh_access_token(refresh_token)
-
-        access_token = new_tokens["access_token"]
-
-        save_tokens(
-            conn,
-            "demo_user",
-            "google_fit",
-            access_token,
-            refresh_token,
-            new_tokens["expires_in"]
-        )
-
-    data = fetch_aggregated_data(access_token)
-
-    return jsonify(data)
+    job_id = submit(get_db_connection(), "google_fit_sync", {"user_ids": ["demo_user"]}, priority=5)
+    return jsonify({"ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+@app.post("/jobs")
+def create_job():
+    # {"kind": ..., "params": {...}, "priority": 0, "max_attempts": 3}
+    data = _json_body()
+    if not isinstance(data, dict) or not isinstance(data.get("params") or {}, dict):
+        return jsonify({"ok": False, "error": "body and params must be objects"}), 400
+    try:
+        job_id = submit(get_db_connection(), data.get("kind"), data.get("params") or {},
+                        priority=data.get("priority", 0), max_attempts=data.get("max_attempts", 3))
+    except (ValueError, TypeError) as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+@app.get("/jobs")
+def jobs_index():
+    status = request.args.get("status")
+    if status and status not in STATUSES:
+        return jsonify({"ok": False, "error": f"status must be one of {list(STATUSES)}"}), 400
+    limit = max(1, min(request.args.get("limit", 50, type=int), 500))  # LIMIT -1 would be unlimited
+    return jsonify({"jobs": list_jobs(get_db_connection(), status, request.args.get("kind"), limit)})
+
+@app.get("/jobs/<int:job_id>")
+def job_status(job_id):
+    job = get_job(get_db_connection(), job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "job not found"}), 404
+    return jsonify(job)
 
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5001, debug=True)
@@ -0,0 +1,53 @@
+# backend/bench/compare.py
+"""
+Compares two bench.run outputs (run from backend/):
+
+    python -m bench.compare base.json new.json [--metric p95_ms] [--threshold 0.2]
+
+Prints the new/base ratio per scale and operation and exits 1 if any
+operation got slower by more than the threshold (0.2 = 20%).
+"""
+import argparse, json, sys
+
+
+def compare(base: dict, new: dict, metric: str):
+    """Yields (scale, op, base value, new value) for operations present in both runs."""
+    for scale, data in new["scales"].items():
+        old = base["scales"].get(scale)
+        if not old:
+            continue
+        for op, stats in data["ops"].items():
+            if op in old["ops"]:
+                yield scale, op, old["ops"][op][metric], stats[metric]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.compare")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p95_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    regressions = 0
+    print(f"{'scale':<6} {'operation':<28} {'base':>10} {'new':>10} {'ratio':>7}")
+    for scale, op, a, b in compare(base, new, args.metric):
+        ratio = b / a if a else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{scale:<6} {op:<28} {a:>10.3f} {b:>10.3f} {ratio:>6.2f}x{flag}")
+
+    if regressions:
+        print(f"{regressions} operation(s) slower than {args.metric} +{args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# backend/bench/fit_stub.py
+"""
+Local stand-in for the Google token endpoint and the Fit aggregate API.
+
+    with FitStub(latency=0.05, fail_rate=0.02) as stub:
+        google_fit_service.FIT_API_BASE = stub.url
+        google_fit_service.TOKEN_URL = stub.url + "/token"
+        ...
+
+Responses are shaped like Google's (one bucket per day with steps, heart
+rate and calories). fail_rate of the requests get a 429 or 503 so the
+client's retry path is exercised; `script` scripts exact statuses per
+path instead, e.g. {"/token": [503, 200]} (200: answer normally) for the
+next requests to it. Keep-alive works (HTTP/1.1), and the stub counts
+requests (also per path) and the peak number of concurrent ones.
+"""
+import hashlib, json, random, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def aggregate_response(token: str, start_ms: int, end_ms: int) -> dict:
+    """Deterministic per (token, day) so repeated syncs return the same values."""
+    buckets = []
+    t = start_ms
+    while t < end_ms:
+        seed = int(hashlib.md5(f"{token}:{t // DAY_MS}".encode()).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        buckets.append({
+            "startTimeMillis": str(t),
+            "endTimeMillis": str(min(t + DAY_MS, end_ms)),
+            "dataset": [
+                {"dataSourceId": "derived:com.google.step_count.delta:aggregated",
+                 "point": [{"value": [{"intVal": rng.randint(500, 15000)}]}]},
+                {"dataSourceId": "derived:com.google.heart_rate.summary:aggregated",
+                 "point": [{"value": [{"fpVal": rng.uniform(65, 95)},
+                                      {"fpVal": rng.uniform(100, 160)},
+                                      {"fpVal": rng.uniform(45, 65)}]}]},
+                {"dataSourceId": "derived:com.google.calories.expended:aggregated",
+                 "point": [{"value": [{"fpVal": rng.uniform(1500, 3000)}]}]},
+            ],
+        })
+        t += DAY_MS
+    return {"bucket": buckets}
+
+
+class FitStub:
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, seed: int = 0, script=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.script = {path: list(statuses) for path, statuses in (script or {}).items()}
+        self.requests = 0
+        self.paths = Counter()
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub._handle(self, body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, h, body: bytes):
+        with self._lock:
+            self.requests += 1
+            self.paths[h.path] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            scripted = self.script.get(h.path)
+            if scripted:
+                status = scripted.pop(0)
+            else:
+                status = self._rng.choice([429, 503]) if self._rng.random() < self.fail_rate else 200
+            if status != 200:
+                self.failures += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if status != 200:
+                return self._send(h, status, {"error": {"code": status}}, {"Retry-After": "0"})
+            if h.path == "/token":
+                return self._send(h, 200, {"access_token": f"stub-{self.requests}", "expires_in": 3600})
+            if h.path == "/users/me/dataset:aggregate":
+                req = json.loads(body or b"{}")
+                token = h.headers.get("Authorization", "").removeprefix("Bearer ")
+                return self._send(h, 200, aggregate_response(token, int(req["startTimeMillis"]),
+                                                             int(req["endTimeMillis"])))
+            return self._send(h, 404, {"error": {"code": 404}})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def _send(h, status: int, payload: dict, headers=None):
+        data = json.dumps(payload).encode()
+        h.send_response(status)
+        h.send_header("Content-Type", "application/json")
+        h.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            h.send_header(k, v)
+        h.end_headers()
+        h.wfile.write(data)
@@ -0,0 +1,89 @@
+# backend/bench/fit_sync.py
+"""
+Google Fit sync throughput against the local stub (run from backend/):
+
+    FIT_POOL_SIZE=64 python -m bench.fit_sync --users 10000 --latency-ms 100 --workers 64
+
+Seeds user_tokens in a temp DB (a share of them expired, so refreshes run
+too), syncs everyone with services.fit_sync.sync_all (first sync: a
+FIT_BACKFILL_DAYS backfill per user), re-syncs to show an up-to-date user
+costs nothing, and compares the rate with a one-at-a-time run over a
+sample of users.
+"""
+import argparse, json, os, sys, tempfile, time
+from contextlib import closing
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="astrasync-fit-"), "bench.db")
+
+from bench.fit_stub import FitStub
+from services import google_fit_service
+from services.db_service import get_conn, init_db
+from services.fit_sync import sync_all
+
+
+def seed_tokens(n_users: int, expired_share: float):
+    now = int(time.time())
+    rows = []
+    for i in range(n_users):
+        expired = i < n_users * expired_share
+        rows.append((f"fit_{i:06d}", "google_fit", f"token-{i}", f"refresh-{i}",
+                     now - 60 if expired else now + 3600))
+    with closing(get_conn()) as conn:
+        init_db(conn)
+        conn.executemany("INSERT OR REPLACE INTO user_tokens VALUES (?,?,?,?,?)", rows)
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.fit_sync")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100, help="stub response time")
+    parser.add_argument("--fail-rate", type=float, default=0.02, help="share of stub responses that are 429/503")
+    parser.add_argument("--expired", type=float, default=0.2, help="share of users whose token needs a refresh")
+    parser.add_argument("--sample", type=int, default=50, help="users synced one at a time for comparison")
+    args = parser.parse_args()
+
+    seed_tokens(args.users, args.expired)
+    with FitStub(latency=args.latency_ms / 1000, fail_rate=args.fail_rate) as stub:
+        google_fit_service.FIT_API_BASE = stub.url
+        google_fit_service.TOKEN_URL = stub.url + "/token"
+
+        ids = [f"fit_{i:06d}" for i in range(args.users)]
+        split = max(args.users - args.sample, 0)
+        serial = sync_all(workers=1, user_ids=ids[split:])
+        stub.peak_in_flight = 0
+
+        before = stub.requests
+        report = sync_all(workers=args.workers, user_ids=ids[:split])
+        first_requests = stub.requests - before
+        before = stub.requests
+        resync = sync_all(workers=args.workers)
+        result = {
+            "users": report.users,
+            "workers": args.workers,
+            "pool_size": google_fit_service.POOL_SIZE,
+            "stub_latency_ms": args.latency_ms,
+            "stub_fail_rate": args.fail_rate,
+            "seconds": round(report.seconds, 2),
+            "users_per_sec": round(report.users / report.seconds, 1),
+            "ok": report.ok,
+            "failed": report.failed,
+            "days_written": report.days,
+            "fit_requests": report.requests,
+            "stub_requests": first_requests,
+            "stub_injected_failures": stub.failures,
+            "peak_concurrent_requests": stub.peak_in_flight,
+            "resync_seconds": round(resync.seconds, 2),
+            "resync_stub_requests": stub.requests - before,
+            "serial_users_per_sec": round(serial.users / serial.seconds, 1),
+            "serial_estimate_seconds": round(report.users * serial.seconds / max(serial.users, 1), 1),
+            "errors": report.errors[:5],
+        }
+    print(json.dumps(result, indent=2))
+    if report.failed or resync.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# backend/bench/run.py
+"""
+Benchmarks for the scoring and storage hot paths (run from backend/):
+
+    python -m bench.run                          # 1k and 100k log rows
+    python -m bench.run --scales 1k,100k,1M --out bench.json
+    python -m bench.run --keep /tmp/astrasync-bench   # reuse generated DBs
+
+Each scale gets its own SQLite DB filled with synthetic users (bench/synthetic.py).
+Every operation is timed call by call; the JSON output has p50/p95/p99 and
+ops/sec per operation, plus enough environment info to compare runs
+(see bench/compare.py).
+"""
+import argparse, json, os, platform, random, sqlite3, subprocess, sys, tempfile, time
+from contextlib import closing
+from datetime import datetime, timezone
+
+# the app reads DB_PATH at import; point it somewhere harmless before that
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.gettempdir(), "astrasync-bench-init.db"))
+
+import numpy as np
+
+from bench.synthetic import dataset, make_entry, user_id
+from services import db_service
+from services.db_service import (
+    get_conn, get_db_connection, init_db, save_logs, save_log, get_logs,
+    get_profile, rebuild_baselines
+)
+from ml.dual_baseline import score_entry, compute_personal_baseline, ALL_METRICS
+from services.scoring_engine import score_all
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DAYS = 90          # logs per synthetic user
+BATCH = 50         # entries per /score/batch and /score/models call
+
+
+def parse_scale(s: str) -> int:
+    if s in SCALES:
+        return SCALES[s]
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:].lower())
+    return int(float(s[:-1]) * mult) if mult else int(s)
+
+
+# ---------------------------
+# Timing
+# ---------------------------
+def summarize(samples: list) -> dict:
+    a = np.asarray(samples) * 1000.0
+    return {
+        "n": len(a),
+        "mean_ms": round(float(a.mean()), 4),
+        "p50_ms": round(float(np.percentile(a, 50)), 4),
+        "p95_ms": round(float(np.percentile(a, 95)), 4),
+        "p99_ms": round(float(np.percentile(a, 99)), 4),
+        "max_ms": round(float(a.max()), 4),
+        "ops_per_sec": round(len(a) / (a.sum() / 1000.0), 2),
+    }
+
+
+def measure(fn, args: list, warmup: int) -> dict:
+    """Calls fn(*a) for every a in args; the first `warmup` calls are not recorded."""
+    samples = []
+    for i, a in enumerate(args):
+        t0 = time.perf_counter()
+        fn(*a)
+        dt = time.perf_counter() - t0
+        if i >= warmup:
+            samples.append(dt)
+    return summarize(samples)
+
+
+# ---------------------------
+# Setup
+# ---------------------------
+def use_db(path: str):
+    """Points db_service (and so the Flask routes) at path."""
+    db_service.DB_PATH = path
+    conn = getattr(db_service._local, "conn", None)
+    if conn is not None:
+        conn.close()
+    db_service._local.pid = None  # next get_db_connection() reopens
+
+
+def populate(path: str, n_rows: int, seed: int) -> dict:
+    n_users, profiles, rows = dataset(n_rows, days=DAYS, seed=seed)
+    t0 = time.perf_counter()
+    with closing(get_conn(path)) as conn:
+        init_db(conn)
+        for p in profiles:
+            conn.execute("INSERT OR REPLACE INTO profiles (user_id, payload) VALUES (?,?)",
+                         (p["user_id"], json.dumps(p)))
+        conn.commit()
+        t1 = time.perf_counter()
+        save_logs(conn, rows, batch_size=5000)
+        t2 = time.perf_counter()
+        rebuild_baselines(conn)
+        t3 = time.perf_counter()
+    return {
+        "rows": n_rows,
+        "users": n_users,
+        "profiles_s": round(t1 - t0, 3),
+        "save_logs_s": round(t2 - t1, 3),
+        "save_logs_rows_per_sec": round(n_rows / max(t2 - t1, 1e-9), 1),
+        "rebuild_baselines_s": round(t3 - t2, 3),
+    }
+
+
+def prepare(n_rows: int, seed: int, keep: str | None, tmp: str):
+    """
+    Returns (db path, population stats). With --keep the generated DB is
+    stored in that dir and reused by later runs; the benchmarks write to
+    it (save_log, /submit_data), so they always run on a fresh copy.
+    """
+    name = f"bench-{n_rows}-{seed}.db"
+    directory = keep or tmp
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    stats_path = path + ".json"
+    reused = bool(keep) and os.path.exists(path) and os.path.exists(stats_path)
+    if reused:
+        with open(stats_path) as f:
+            stats = json.load(f)
+    else:
+        for p in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(p):
+                os.remove(p)
+        stats = populate(path, n_rows, seed)
+        with open(stats_path, "w") as f:
+            json.dump(stats, f)
+    if keep:
+        work = os.path.join(tmp, name)
+        with closing(sqlite3.connect(path)) as src, closing(sqlite3.connect(work)) as dst:
+            src.backup(dst)
+        path = work
+    return path, {**stats, "reused": reused}
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+def run_scale(path: str, n_users: int, iterations: int, warmup: int, seed: int) -> dict:
+    from app import app  # imported late: needs DB_PATH set up
+
+    use_db(path)
+    rng = random.Random(seed + 2)
+    conn = get_db_connection()
+    total = iterations + warmup
+
+    users = [user_id(rng.randrange(n_users)) for _ in range(total)]
+    entries = [make_entry(rng, u, DAYS + 1) for u in users]
+    profiles = [get_profile(conn, u) for u in users]
+    logs = [get_logs(conn, u, limit=14) for u in users]
+    batches = [[make_entry(rng, user_id(rng.randrange(n_users)), DAYS + 1) for _ in range(BATCH)]
+               for _ in range(total)]
+    client = app.test_client()
+
+    ops = {}
+    ops["score_entry"] = measure(score_entry, list(zip(profiles, entries, logs)), warmup)
+    ops["compute_personal_baseline"] = measure(compute_personal_baseline, [(l,) for l in logs], warmup)
+    ops["score_all"] = measure(score_all, list(zip(entries, profiles)), warmup)
+    ops["get_logs"] = measure(lambda u: get_logs(conn, u, limit=14), [(u,) for u in users], warmup)
+    ops["get_logs_typed"] = measure(lambda u: get_logs(conn, u, limit=14, columns=ALL_METRICS),
+                                    [(u,) for u in users], warmup)
+    ops["save_log"] = measure(lambda e: save_log(conn, e["user_id"], e["date"], e),
+                              [(e,) for e in entries], warmup)
+
+    def post(url, body):
+        r = client.post(url, json=body)
+        assert r.status_code == 200, (url, r.status_code, r.get_data(as_text=True)[:200])
+
+    def get(url):
+        r = client.get(url)
+        assert r.status_code == 200, (url, r.status_code)
+
+    ops["POST /score"] = measure(post, [("/score", e) for e in entries], warmup)
+    ops[f"POST /score/batch x{BATCH}"] = measure(post, [("/score/batch", {"entries": b}) for b in batches], warmup)
+    ops[f"POST /score/models x{BATCH}"] = measure(post, [("/score/models", {"entries": b}) for b in batches], warmup)
+    ops["POST /submit_data"] = measure(post, [("/submit_data", e) for e in entries], warmup)
+    ops["GET /history"] = measure(get, [(f"/history/{u}",) for u in users], warmup)
+    return ops
+
+
+def environment(seed: int, iterations: int, warmup: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scoring_backend": os.getenv("SCORING_BACKEND", "compact"),
+        "seed": seed,
+        "iterations": iterations,
+        "warmup": warmup,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.run")
+    parser.add_argument("--scales", default="1k,100k", help="comma-separated log row counts, e.g. 1k,100k,1M")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed calls before those")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", metavar="DIR", help="keep generated DBs in DIR and reuse them")
+    parser.add_argument("--out", help="write JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    result = {"environment": environment(args.seed, args.iterations, args.warmup), "scales": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in args.scales.split(","):
+            n_rows = parse_scale(label.strip())
+            print(f"[{label}] preparing {n_rows} log rows...", file=sys.stderr)
+            path, data = prepare(n_rows, args.seed, args.keep, tmp)
+            print(f"[{label}] timing...", file=sys.stderr)
+            ops = run_scale(path, data["users"], args.iterations, args.warmup, args.seed)
+            result["scales"][label] = {"dataset": data, "ops": ops}
+            use_db(db_service.DB_PATH)  # close before the temp dir goes away
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# backend/bench/synthetic.py
+"""
+Deterministic synthetic users, profiles and daily logs for benchmarks.
+
+Values are drawn in roughly realistic ranges with the same untidiness the
+app sees from clients: ~10% of metrics missing, a few blanks and a few
+numbers sent as strings.
+"""
+import random
+from datetime import date, timedelta
+
+# (metric, low, high)
+RANGES = [
+    ("bp_sys", 100, 170), ("bp_dia", 60, 105), ("spo2_avg", 86, 100),
+    ("resting_hr", 50, 110), ("sleep_hours", 3, 9), ("steps", 500, 15000),
+    ("water_ml", 500, 3500), ("screen_time_min", 30, 600), ("toilet_freq", 3, 12),
+]
+
+START = date(2025, 1, 1)
+
+
+def user_id(i: int) -> str:
+    return f"bench_{i:07d}"
+
+
+def day(i: int) -> str:
+    return (START + timedelta(days=i)).isoformat()
+
+
+def make_profile(rng: random.Random, uid: str) -> dict:
+    p = {"user_id": uid}
+    if rng.random() < 0.9: p["age"] = rng.randint(15, 80)
+    if rng.random() < 0.8: p["height"] = rng.randint(150, 195)
+    if rng.random() < 0.8: p["weight"] = rng.randint(45, 130)
+    if rng.random() < 0.7: p["gender"] = rng.choice(["male", "female"])
+    return p
+
+
+def make_entry(rng: random.Random, uid: str, day_index: int) -> dict:
+    e = {"user_id": uid, "date": day(day_index)}
+    for k, lo, hi in RANGES:
+        r = rng.random()
+        if r < 0.10:
+            continue
+        if r < 0.12:
+            e[k] = ""
+            continue
+        v = rng.uniform(lo, hi)
+        e[k] = round(v, 1) if rng.random() < 0.7 else int(v)
+        if rng.random() < 0.03:
+            e[k] = str(e[k])
+    e["alcohol"] = rng.choice([0, 0, 1, None])
+    e["smoking"] = rng.choice([0, 0, 0, 1])
+    return e
+
+
+def dataset(n_rows: int, days: int = 90, seed: int = 0):
+    """
+    Sizes a dataset of n_rows logs at `days` logs per user.
+    Returns (n_users, profiles iterator, rows iterator of (user_id, date, entry)).
+    """
+    n_users = max(1, -(-n_rows // days))
+
+    def profiles():
+        rng = random.Random(seed)
+        for i in range(n_users):
+            yield make_profile(rng, user_id(i))
+
+    def rows():
+        rng = random.Random(seed + 1)
+        n = 0
+        for d in range(days):
+            for i in range(n_users):
+                if n >= n_rows:
+                    return
+                uid = user_id(i)
+                yield uid, day(d), make_entry(rng, uid, d)
+                n += 1
+
+    return n_users, profiles(), rows()
@@ -0,0 +1,97 @@
+"""
+Maintenance commands for the AstraSync backend (run from backend/):
+
+    python manage.py rebuild-baselines [--user USER_ID ...]
+    python manage.py sync-google-fit [--workers 16] [--user USER_ID ...]
+    python manage.py run-jobs [--workers 2]
+    python manage.py models [--activate VERSION]
+"""
+import argparse, json, sys, time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.db_service import get_conn, init_db, rebuild_baselines
+
+
+def cmd_rebuild_baselines(args):
+    conn = get_conn()
+    init_db(conn)
+    n = rebuild_baselines(conn, args.user or None)
+    print(f"Rebuilt baselines for {n} user(s)")
+
+
+def cmd_sync_google_fit(args):
+    from services.fit_sync import sync_all, WORKERS
+
+    conn = get_conn()
+    init_db(conn)
+    report = sync_all(workers=args.workers or WORKERS, user_ids=args.user or None)
+    print(json.dumps(report.to_dict(), indent=2))
+    if report.failed:
+        sys.exit(1)
+
+
+def cmd_run_jobs(args):
+    # dedicated job process; run the web with JOB_WORKERS=0 to keep jobs here only
+    from services.jobs import JobRunner
+
+    conn = get_conn()
+    init_db(conn)
+    runner = JobRunner(workers=args.workers)
+    runner.ensure_started()
+    print(f"running jobs with {args.workers} thread(s); Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+def cmd_models(args):
+    # lazy: the registry pulls in joblib/numpy
+    from services.model_registry import RegistryError, current_version, read_manifest, versions
+    from services.scoring_engine import MODELS, REGISTRY_DIR
+
+    if args.activate:
+        try:
+            # loaded and warmed up here first: a version that can't serve never becomes CURRENT
+            MODELS.reload(args.activate, make_current=True)
+        except RegistryError as e:
+            sys.exit(str(e))
+        print(f"CURRENT -> {args.activate}; workers reload it on their next check")
+    current = current_version(REGISTRY_DIR)
+    for v in versions(REGISTRY_DIR):
+        m = read_manifest(REGISTRY_DIR, v)
+        print(f"{'*' if v == current else ' '} {v}  {m['created']}  {', '.join(sorted(m['models']))}")
+    if current is None:
+        print(f"no registry in {REGISTRY_DIR}; serving the flat models/ directory")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="manage.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-baselines", help="recompute stored personal baselines from logs")
+    p.add_argument("--user", action="append", help="only this user (repeatable)")
+    p.set_defaults(func=cmd_rebuild_baselines)
+
+    p = sub.add_parser("sync-google-fit", help="fetch Google Fit aggregates for every connected user")
+    p.add_argument("--workers", type=int, default=None, help="concurrent users (default FIT_SYNC_WORKERS or 16)")
+    p.add_argument("--user", action="append", help="only this user (repeatable)")
+    p.set_defaults(func=cmd_sync_google_fit)
+
+    p = sub.add_parser("run-jobs", help="process queued background jobs")
+    p.add_argument("--workers", type=int, default=2)
+    p.set_defaults(func=cmd_run_jobs)
+
+    p = sub.add_parser("models", help="list published model versions, or activate one")
+    p.add_argument("--activate", metavar="VERSION", help="point CURRENT at this version (after loading and warming it up)")
+    p.set_defaults(func=cmd_models)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 # backend/ml/dual_baseline.py
 from __future__ import annotations
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Dict, Any, List, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Tuple
 import math, statistics as stats
 
+from ml.population_grid import population_band
+
 IMPORTANT = ["bp_sys","bp_dia","spo2_avg","resting_hr","sleep_hours","steps"]
 
 ALL_METRICS = IMPORTANT + ["water_ml","screen_time_min","toilet_freq","alcohol","smoking"]
@@ -28,6 +33,9 @@ def mad(xs: List[float]) -> float:
     m = median(xs)
     return median([abs(x-m) for x in xs]) if xs else 0.0
 
+def _no_timer(stage: str):
+    return nullcontext()
+
 def clamp(a, lo, hi):
     return max(lo, min(hi, a))
 
@@ -57,11 +65,27 @@ def bmi_band(b: float | None) -> str:
 # Standard reference (Day-1 safety)
 # Keep hackathon-safe: screening thresholds, not diagnosis.
 # ---------------------------
-def standard_thresholds(profile: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+def cohort(profile: Dict[str, Any]) -> Tuple[str, str]:
+    """(age_group, bmi_band) of a profile; the only inputs standard_thresholds depends on."""
+    # stored profiles may hold anything ("45.5", "abc"); unparseable ages are "unknown"
+    age = safe_float(profile.get("age"))
+    height = safe_float(profile.get("height"))
+    weight = safe_float(profile.get("weight"))
+    b = bmi(height or 0, weight or 0)
+    known = age is not None and 0 < age < math.inf
+    return (age_group(age) if known else "unknown"), bmi_band(b)
+
+def standard_thresholds(profile: Dict[str, Any]) -> Mapping[str, Mapping[str, float]]:
     """
     Returns thresholds by metric: {metric: {yellow_low/high, red_low/high}}.
     Some metrics are "lower is worse" (SpO2, sleep).
+    Read-only and shared by every profile in the same cohort.
     """
+    return cohort_thresholds(*cohort(profile))
+
+@lru_cache(maxsize=None)
+def cohort_thresholds(ag: str, bb: str) -> Mapping[str, Mapping[str, float]]:
+    """Built once per (age_group, bmi_band); ~30 combinations in total."""
     # Base thresholds (simple MVP)
     base = {
         "bp_sys": {"yellow_high": 140, "red_high": 160},
@@ -73,14 +97,6 @@ def standard_thresholds(profile: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
     }
 
     # Optional: adjust slightly by age / BMI (simple, defensible)
-    age = int(profile.get("age") or 0)
-    height = safe_float(profile.get("height"))
-    weight = safe_float(profile.get("weight"))
-    b = bmi(height or 0, weight or 0)
-
-    ag = age_group(age) if age else "unknown"
-    bb = bmi_band(b)
-
     # older age: allow slightly higher resting HR threshold
     if ag in ("45_59","60_plus"):
         base["resting_hr"]["yellow_high"] = 95
@@ -93,9 +109,9 @@ def standard_thresholds(profile: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
         base["bp_dia"]["yellow_high"] = 88
         base["bp_dia"]["red_high"] = 98
 
-    return base
+    return MappingProxyType({k: MappingProxyType(v) for k, v in base.items()})
 
-def standard_score(entry: Dict[str, Any], thresh: Dict[str, Dict[str, float]]) -> Tuple[float, List[str], str]:
+def standard_score(entry: Dict[str, Any], thresh: Mapping[str, Mapping[str, float]]) -> Tuple[float, List[str], str]:
     """
     Returns (score 0..1, reasons, label_hint)
     """
@@ -179,17 +195,23 @@ def compute_personal_baseline(logs: List[Dict[str, Any]], window: int = 14) -> D
             v = safe_float(row.get(k))
             if v is not None:
                 xs.append(v)
-        if len(xs) < 4:
-            continue
-        med = median(xs)
-        spread = mad(xs)
-        if spread < 1e-6:
-            spread = max(1.0, 0.05*abs(med) if med else 1.0)
-        low = med - 2.2*spread
-        high = med + 2.2*spread
-        base[k] = {"median": med, "mad": spread, "low": low, "high": high}
+        b = metric_baseline(xs)
+        if b is not None:
+            base[k] = b
     return base
 
+def metric_baseline(xs: List[float]) -> Dict[str, float] | None:
+    """Median/MAD band for one metric's window values, None below 4 values."""
+    if len(xs) < 4:
+        return None
+    med = median(xs)
+    spread = mad(xs)
+    if spread < 1e-6:
+        spread = max(1.0, 0.05*abs(med) if med else 1.0)
+    low = med - 2.2*spread
+    high = med + 2.2*spread
+    return {"median": med, "mad": spread, "low": low, "high": high}
+
 def personal_score(entry: Dict[str, Any], base: Dict[str, Dict[str, float]]) -> Tuple[float, List[str]]:
     reasons = []
     total = 0.0
@@ -204,11 +226,27 @@ def personal_score(entry: Dict[str, Any], base: Dict[str, Dict[str, float]]) ->
             total += s
             delta = v - b["median"]
             sign = "+" if delta >= 0 else ""
-            reasons.append((s, f"{k} {sign}{delta:.1f} vs your baseline"))
+            reasons.append((s, f"{k} {sign}{delta:.1f} vs {b.get('ref', 'your baseline')}"))
     reasons.sort(reverse=True, key=lambda x: x[0])
     score = clamp(total/3.0, 0.0, 1.0)
     return score, [r for _, r in reasons[:3]]
 
+def cold_start_baseline(
+    profile: Dict[str, Any], per_base: Dict[str, Dict[str, float]], days: int
+) -> Dict[str, Dict[str, float]]:
+    """
+    Below 7 days of history, metrics without a personal band fall back to
+    the population band for the profile (ml/population_grid.py), in
+    ALL_METRICS order like compute_personal_baseline. Unchanged otherwise
+    or when no grid has been exported.
+    """
+    if days >= 7:
+        return per_base
+    pop = population_band(profile)
+    if all(k in per_base for k in pop):
+        return per_base
+    return {k: per_base[k] if k in per_base else pop[k] for k in ALL_METRICS if k in per_base or k in pop}
+
 # ---------------------------
 # Missing-data completeness + confidence
 # ---------------------------
@@ -262,20 +300,102 @@ def score_entry(
     logs should be latest-first list of dicts.
     """
     days = len(logs)
+    per_base = compute_personal_baseline(logs, window=14) if days >= 4 else {}
+    return score_with_baseline(profile, entry, per_base, days)
 
+def score_with_baseline(
+    profile: Dict[str, Any],
+    entry: Dict[str, Any],
+    per_base: Dict[str, Dict[str, float]],
+    days: int,
+    timer=None
+) -> Dict[str, Any]:
+    """
+    score_entry for callers that already hold the personal baseline
+    (e.g. the stored RollingBaseline): per_base as returned by
+    compute_personal_baseline, days = number of logs it was built from.
+    timer(stage) -> context manager, called around each scoring stage
+    (e.g. services.metrics.stage).
+    """
+    timer = timer or _no_timer
+    with timer("standard_thresholds"):
+        th = standard_thresholds(profile)
+    with timer("cold_start_baseline"):
+        per_base = cold_start_baseline(profile, per_base, days)
+    return _score_with_baseline(th, entry, per_base, days, timer)
+
+ENGINES = ("python", "numpy")
+
+def score_entries(
+    entries: List[Dict[str, Any]],
+    profiles: Dict[str, Dict[str, Any]],
+    logs_by_user: Dict[str, List[Dict[str, Any]]],
+    engine: str = "python",
+    timer=None
+) -> List[Dict[str, Any]]:
+    """
+    Batch version of score_entry for /score/batch.
+    profiles and logs_by_user are keyed by user_id (logs latest-first);
+    entries without a user_id belong to demo_user, same as /score.
+    Thresholds and personal baselines only depend on the user, so they
+    are computed once per user instead of once per entry.
+    engine="numpy" runs the array version in dual_baseline_np (same output).
+    timer: as in score_with_baseline; the numpy engine is timed as one stage.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    timer = timer or _no_timer
+    if engine == "numpy":
+        from ml import dual_baseline_np
+        with timer("score_entries_numpy"):
+            return dual_baseline_np.score_entries(entries, profiles, logs_by_user)
+
+    per_user = {}
+    results = []
+    for entry in entries:
+        user_id = entry.get("user_id", "demo_user")
+        if user_id not in per_user:
+            logs = logs_by_user.get(user_id, [])
+            days = len(logs)
+            profile = profiles.get(user_id, {})
+            with timer("standard_thresholds"):
+                th = standard_thresholds(profile)
+            with timer("compute_personal_baseline"):
+                per_base = compute_personal_baseline(logs, window=14) if days >= 4 else {}
+                per_base = cold_start_baseline(profile, per_base, days)
+            per_user[user_id] = (th, per_base, days)
+        th, per_base, days = per_user[user_id]
+        results.append(_score_with_baseline(th, entry, per_base, days, timer))
+    return results
+
+def _score_with_baseline(
+    th: Mapping[str, Mapping[str, float]],
+    entry: Dict[str, Any],
+    per_base: Dict[str, Dict[str, float]],
+    days: int,
+    timer=_no_timer
+) -> Dict[str, Any]:
     comp, missing = completeness(entry)
 
     # Standard
-    th = standard_thresholds(profile)
-    std_s, std_reasons, std_hint = standard_score(entry, th)
+    with timer("standard_score"):
+        std_s, std_reasons, std_hint = standard_score(entry, th)
 
     # Personal baseline
-    per_base = compute_personal_baseline(logs, window=14) if days >= 4 else {}
-    per_s, per_reasons = personal_score(entry, per_base) if per_base else (0.0, [])
+    with timer("personal_score"):
+        per_s, per_reasons = personal_score(entry, per_base) if per_base else (0.0, [])
 
     # Fuse
-    risk, conf = fuse_risk(std_s, std_hint, per_s, comp, days)
+    with timer("fuse_risk"):
+        risk, conf = fuse_risk(std_s, std_hint, per_s, comp, days)
 
+    return _assemble_result(risk, conf, comp, missing, std_s, std_reasons, per_s, per_reasons, days)
+
+def _assemble_result(
+    risk: str, conf: int, comp: float, missing: List[str],
+    std_s: float, std_reasons: List[str],
+    per_s: float, per_reasons: List[str], days: int
+) -> Dict[str, Any]:
     # Merge reasons: prioritize Red/Yellow standard reasons + personal drift
     reasons = (std_reasons + per_reasons)[:3]
     if not reasons:
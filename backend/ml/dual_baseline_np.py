@@ -0,0 +1,337 @@
+# backend/ml/dual_baseline_np.py
+"""
+NumPy engine for dual_baseline.
+
+Same scoring as the pure-Python functions in dual_baseline.py (scores,
+labels and reasons are identical), but entries are rows of an
+(entries x ALL_METRICS) matrix and log windows are an
+(users x days x ALL_METRICS) tensor with NaN for missing values, so each
+step is a handful of array ops over the whole cohort.
+Select it per call with dual_baseline.score_entries(..., engine="numpy").
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Any, List, Mapping, Tuple
+import math
+import numpy as np
+
+from ml.dual_baseline import (
+    IMPORTANT, ALL_METRICS, safe_float, cohort, cohort_thresholds, _assemble_result
+)
+from ml.population_grid import population_band, REF
+
+COL = {k: i for i, k in enumerate(ALL_METRICS)}
+IMPORTANT_COLS = [COL[k] for k in IMPORTANT]
+
+# (metric, threshold key) columns of the per-entry threshold matrix
+TH_KEYS = [
+    ("bp_sys", "red_high"), ("bp_sys", "yellow_high"),
+    ("bp_dia", "red_high"), ("bp_dia", "yellow_high"),
+    ("spo2_avg", "red_low"), ("spo2_avg", "yellow_low"),
+    ("sleep_hours", "red_low"), ("sleep_hours", "yellow_low"),
+    ("resting_hr", "red_high"), ("resting_hr", "yellow_high"),
+    ("steps", "red_low"), ("steps", "yellow_low"),
+]
+
+# standard_score checks in evaluation order:
+# (metric, "high"/"low", red level, red reason, red amt, yellow reason, yellow amt)
+# levels: 2 = Red, 1 = Yellow (steps never go Red)
+STD_CHECKS = [
+    ("bp_sys", "high", 2, "BP systolic very high vs standard", 0.40, "BP systolic high vs standard", 0.22),
+    ("bp_dia", "high", 2, "BP diastolic very high vs standard", 0.35, "BP diastolic high vs standard", 0.20),
+    ("spo2_avg", "low", 2, "SpO₂ low vs standard", 0.45, "SpO₂ slightly low vs standard", 0.25),
+    ("sleep_hours", "low", 2, "Severe sleep deficit vs standard", 0.30, "Sleep deficit vs standard", 0.18),
+    ("resting_hr", "high", 2, "Resting HR very high vs standard", 0.30, "Resting HR high vs standard", 0.16),
+    ("steps", "low", 1, "Very low activity today", 0.10, "Low activity today", 0.07),
+]
+# lifestyle flags, after the metric checks: (flag column, reason, amt)
+FLAG_CHECKS = [
+    (0, "Smoking logged (risk factor)", 0.10),
+    (1, "Alcohol logged (risk factor)", 0.06),
+]
+
+STD_REASONS = []
+for _, _, _, red_r, _, yellow_r, _ in STD_CHECKS:
+    STD_REASONS += [red_r, yellow_r]
+STD_REASONS += [r for _, r, _ in FLAG_CHECKS]
+
+LABELS = ["Green", "Yellow", "Red"]
+
+# ---------------------------
+# Array builders
+# ---------------------------
+def _num(v) -> float:
+    # safe_float with a fast path for values that are already numbers
+    t = type(v)
+    if t is float:
+        return v
+    if t is int:
+        try:
+            return float(v)
+        except OverflowError:
+            return math.nan
+    if v is None:
+        return math.nan
+    x = safe_float(v)
+    return math.nan if x is None else x
+
+def entries_matrix(rows: List[Dict[str, Any]]) -> np.ndarray:
+    """(len(rows) x ALL_METRICS) float matrix, NaN where safe_float gives None."""
+    flat = [_num(row.get(k)) for row in rows for k in ALL_METRICS]
+    return np.array(flat, dtype=float).reshape(len(rows), len(ALL_METRICS))
+
+def lifestyle_flags(rows: List[Dict[str, Any]]) -> np.ndarray:
+    """(len(rows) x 2) bool matrix of smoking/alcohol, parsed like standard_score."""
+    out = np.zeros((len(rows), 2), dtype=bool)
+    for i, row in enumerate(rows):
+        out[i, 0] = int(row.get("smoking") or 0) == 1
+        out[i, 1] = int(row.get("alcohol") or 0) == 1
+    return out
+
+def logs_tensor(logs_per_user: List[List[Dict[str, Any]]], window: int = 14) -> np.ndarray:
+    """(users x window x ALL_METRICS) tensor of latest-first logs, NaN padded."""
+    out = np.full((len(logs_per_user), window, len(ALL_METRICS)), np.nan)
+    counts = [min(len(logs), window) for logs in logs_per_user]
+    rows = entries_matrix([row for logs in logs_per_user for row in logs[:window]])
+    # scatter the stacked rows back into each user's slice of the tensor
+    u = np.repeat(np.arange(len(counts)), counts)
+    d = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    out[u, d] = rows
+    return out
+
+def thresholds_matrix(thresholds: List[Mapping[str, Mapping[str, float]]]) -> np.ndarray:
+    """(len(thresholds) x TH_KEYS) matrix from standard_thresholds mappings."""
+    return np.array([[th[m][k] for m, k in TH_KEYS] for th in thresholds], dtype=float).reshape(-1, len(TH_KEYS))
+
+BAND_KEYS = ("median", "mad", "low", "high")
+
+def population_arrays(profiles: List[Mapping[str, Any] | None]) -> Dict[str, np.ndarray] | None:
+    """
+    population_band per profile as (len(profiles) x ALL_METRICS) arrays of
+    BAND_KEYS, NaN where there is no band (or the profile is None); None if
+    no grid is exported.
+    """
+    bands = [population_band(p) if p is not None else {} for p in profiles]
+    if not any(bands):
+        return None
+    out = {k: np.full((len(bands), len(ALL_METRICS)), np.nan) for k in BAND_KEYS}
+    for i, band in enumerate(bands):
+        for m, b in band.items():
+            for k in BAND_KEYS:
+                out[k][i, COL[m]] = b[k]
+    return out
+
+@lru_cache(maxsize=None)
+def cohort_row(ag: str, bb: str) -> Tuple[float, ...]:
+    """cohort_thresholds(ag, bb) as one TH_KEYS row, built once per cohort."""
+    th = cohort_thresholds(ag, bb)
+    return tuple(float(th[m][k]) for m, k in TH_KEYS)
+
+# ---------------------------
+# Vectorized scoring steps
+# ---------------------------
+def standard_score(X: np.ndarray, flags: np.ndarray, TH: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (score 0..1, reason codes into STD_REASONS with -1 padding
+    (n x 3), worst level 0/1/2) for every row of X.
+    """
+    n = X.shape[0]
+    score = np.zeros(n)
+    worst = np.zeros(n, dtype=np.int8)
+    codes = np.full((n, len(STD_CHECKS) + len(FLAG_CHECKS)), -1, dtype=np.int16)
+
+    slot = 0
+    for i, (m, kind, red_level, _, red_amt, _, yellow_amt) in enumerate(STD_CHECKS):
+        v = X[:, COL[m]]
+        red_t, yellow_t = TH[:, 2*i], TH[:, 2*i + 1]
+        # NaN compares False, which skips missing values like the None checks do
+        if kind == "high":
+            red = v >= red_t
+            yellow = ~red & (v >= yellow_t)
+        else:
+            red = v < red_t
+            yellow = ~red & (v < yellow_t)
+        score += np.where(red, red_amt, np.where(yellow, yellow_amt, 0.0))
+        worst = np.maximum(worst, np.where(red, red_level, np.where(yellow, 1, 0)).astype(np.int8))
+        codes[:, slot] = np.where(red, 2*i, np.where(yellow, 2*i + 1, -1))
+        slot += 1
+
+    for j, (col, _, amt) in enumerate(FLAG_CHECKS):
+        hit = flags[:, col]
+        score += np.where(hit, amt, 0.0)
+        worst = np.maximum(worst, hit.astype(np.int8))
+        codes[:, slot] = np.where(hit, 2*len(STD_CHECKS) + j, -1)
+        slot += 1
+
+    # first three fired checks, in check order
+    order = np.argsort(codes < 0, axis=1, kind="stable")[:, :3]
+    reasons = np.take_along_axis(codes, order, axis=1)
+    return np.clip(score, 0.0, 1.0), reasons, worst
+
+def _nan_median(S: np.ndarray, n: np.ndarray) -> np.ndarray:
+    # S sorted along axis 1 with NaNs last, n = non-NaN count per column;
+    # picks the middle pair exactly like statistics.median
+    lo = np.take_along_axis(S, np.maximum((n - 1) // 2, 0)[:, None, :], axis=1)[:, 0, :]
+    hi = np.take_along_axis(S, (n // 2)[:, None, :], axis=1)[:, 0, :]
+    return np.where(n % 2 == 1, hi, (lo + hi) / 2)
+
+def compute_personal_baseline(L: np.ndarray, days: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    L: (users x window x ALL_METRICS) latest-first logs, days: len(logs) per user.
+    Returns users x ALL_METRICS arrays median/mad/low/high plus a "valid"
+    mask marking the metrics compute_personal_baseline would include.
+    """
+    n = np.sum(~np.isnan(L), axis=1)
+    valid = (n >= 4) & (days[:, None] >= 4)
+    with np.errstate(invalid="ignore"):
+        med = _nan_median(np.sort(L, axis=1), n)
+        spread = _nan_median(np.sort(np.abs(L - med[:, None, :]), axis=1), n)
+        fallback = np.where(med != 0, np.maximum(1.0, 0.05*np.abs(med)), 1.0)
+        spread = np.where(spread < 1e-6, fallback, spread)
+    return {
+        "median": med,
+        "mad": spread,
+        "low": med - 2.2*spread,
+        "high": med + 2.2*spread,
+        "valid": valid,
+    }
+
+def personal_score(X: np.ndarray, base: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    X and every base array are aligned row-for-row (one baseline row per entry).
+    Returns (score 0..1, outlier mask, per-metric severity, delta vs median).
+    """
+    med, spread = base["median"], base["mad"]
+    with np.errstate(invalid="ignore"):
+        z = np.abs(X - med) / (spread + 1e-6)
+        out = base["valid"] & ~np.isnan(X) & ((X < base["low"]) | (X > base["high"]) | (z > 1.5))
+        s = np.minimum(1.0, z/3.0)
+
+    # accumulate in ALL_METRICS order, same as iterating the baseline dict
+    total = np.zeros(X.shape[0])
+    for k in range(X.shape[1]):
+        total += np.where(out[:, k], s[:, k], 0.0)
+    return np.clip(total/3.0, 0.0, 1.0), out, s, X - med
+
+def personal_reasons(out: np.ndarray, s: np.ndarray, delta: np.ndarray,
+                     population: np.ndarray | None = None) -> List[List[str]]:
+    # strongest three drifts per row; stable sort keeps metric order on ties
+    key = np.where(out, -s, np.inf)
+    order = np.argsort(key, axis=1, kind="stable")[:, :3]
+    hit = np.take_along_axis(out, order, axis=1).tolist()
+    d3 = np.take_along_axis(delta, order, axis=1).tolist()
+    pop3 = (np.take_along_axis(population, order, axis=1).tolist() if population is not None
+            else np.zeros(order.shape, dtype=bool).tolist())
+    reasons = []
+    for i, row in enumerate(order.tolist()):
+        rs = []
+        for j, k in enumerate(row):
+            if not hit[i][j]:
+                break
+            d = d3[i][j]
+            sign = "+" if d >= 0 else ""
+            rs.append(f"{ALL_METRICS[k]} {sign}{d:.1f} vs {REF if pop3[i][j] else 'your baseline'}")
+        reasons.append(rs)
+    return reasons
+
+def completeness(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (share of IMPORTANT present, missing mask over IMPORTANT)."""
+    missing = np.isnan(X[:, IMPORTANT_COLS])
+    comp = np.sum(~missing, axis=1) / len(IMPORTANT)
+    return comp, missing
+
+def fuse_risk(std_score: np.ndarray, std_worst: np.ndarray, per_score: np.ndarray,
+              comp: np.ndarray, days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (risk level 0/1/2, confidence) per row."""
+    cold = days < 7
+    w_std = np.where(cold, 0.65, 0.40)
+    w_per = np.where(cold, 0.35, 0.60)
+
+    final = w_std*std_score + w_per*per_score
+
+    risk = np.where(final >= 0.35, 1, 0)
+    risk = np.where((final >= 0.65) | (std_worst == 2), 2, risk)
+
+    hist_factor = np.where(cold, 0.55, 0.75)
+    conf = np.trunc(100 * (0.25 + 0.45*comp + 0.30*hist_factor))
+    return risk, np.clip(conf, 35, 92).astype(int)
+
+# ---------------------------
+# Batch entry point
+# ---------------------------
+def score_arrays(
+    X: np.ndarray, flags: np.ndarray, TH: np.ndarray,
+    L: np.ndarray, days_u: np.ndarray, uidx: np.ndarray,
+    pop_u: Dict[str, np.ndarray] | None = None
+) -> Dict[str, Any]:
+    """
+    Scores already-built arrays: X/flags/TH are per entry, L/days_u per user
+    and uidx maps each entry to its user row. Callers that hold columnar
+    data can skip the dict conversion in score_entries entirely.
+    pop_u: population_arrays per user, used like cold_start_baseline.
+    """
+    base_u = compute_personal_baseline(L, days_u)
+    population = None
+    if pop_u is not None:
+        use = (days_u < 7)[:, None] & ~base_u["valid"] & ~np.isnan(pop_u["median"])
+        for k in BAND_KEYS:
+            base_u[k] = np.where(use, pop_u[k], base_u[k])
+        base_u["valid"] = base_u["valid"] | use
+        population = use[uidx]
+    days = days_u[uidx]
+
+    comp, missing = completeness(X)
+    std_s, std_codes, std_worst = standard_score(X, flags, TH)
+    per_s, out, s, delta = personal_score(X, {k: v[uidx] for k, v in base_u.items()})
+    risk, conf = fuse_risk(std_s, std_worst, per_s, comp, days)
+    return {
+        "risk": risk, "confidence": conf, "completeness": comp, "missing": missing,
+        "standard_score": std_s, "standard_reasons": std_codes,
+        "personal_score": per_s, "personal_reasons": personal_reasons(out, s, delta, population),
+        "days": days,
+    }
+
+def score_entries(
+    entries: List[Dict[str, Any]],
+    profiles: Dict[str, Dict[str, Any]],
+    logs_by_user: Dict[str, List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """Array version of dual_baseline.score_entries (same inputs and output)."""
+    if not entries:
+        return []
+
+    user_ids, uidx = [], []
+    seen = {}
+    for entry in entries:
+        user_id = entry.get("user_id", "demo_user")
+        if user_id not in seen:
+            seen[user_id] = len(user_ids)
+            user_ids.append(user_id)
+        uidx.append(seen[user_id])
+    uidx = np.array(uidx)
+
+    user_logs = [logs_by_user.get(u, []) for u in user_ids]
+    TH_u = np.array([cohort_row(*cohort(profiles.get(u, {}))) for u in user_ids],
+                    dtype=float).reshape(-1, len(TH_KEYS))
+    days_u = np.array([len(logs) for logs in user_logs])
+    r = score_arrays(
+        entries_matrix(entries), lifestyle_flags(entries), TH_u[uidx],
+        logs_tensor(user_logs, window=14), days_u, uidx,
+        population_arrays([profiles.get(u, {}) if d < 7 else None for u, d in zip(user_ids, days_u)]),
+    )
+
+    # back to Python scalars once, then build the same dicts as score_entry
+    risk, conf, comp, std_s, per_s, days, missing, std_codes = (
+        r[k].tolist() for k in ("risk", "confidence", "completeness", "standard_score",
+                                "personal_score", "days", "missing", "standard_reasons")
+    )
+    per_reasons = r["personal_reasons"]
+    results = []
+    for i in range(len(entries)):
+        results.append(_assemble_result(
+            LABELS[risk[i]], conf[i], comp[i],
+            [k for k, m in zip(IMPORTANT, missing[i]) if m],
+            std_s[i], [STD_REASONS[c] for c in std_codes[i] if c >= 0],
+            per_s[i], per_reasons[i], days[i],
+        ))
+    return results
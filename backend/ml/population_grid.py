@@ -0,0 +1,149 @@
+# backend/ml/population_grid.py
+"""
+Population baseline (ml_training/train_population_baseline.py) as a lookup grid.
+
+The regressor predicts expected bp_sys / bp_dia / resting_hr / spo2_avg from
+age, gender, height and weight. Instead of running its 250 trees per
+request, export time predicts every cell of a grid over those inputs
+(build_grid) and saves it to models/population_grid.npz; serving rounds a
+profile to its nearest cell and reads the values (one array index, cached
+per cell). Each numeric axis has an extra slot 0 for "not in the profile",
+predicted with a NaN input that the model's imputer fills, same as a
+missing value at training time.
+
+Cold-start scoring (fewer than 7 days of history) uses the grid as the
+baseline for those metrics until the user has a personal one. Without a
+grid file, population_band() returns {} and scoring is unchanged.
+"""
+from __future__ import annotations
+import os
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping
+
+import numpy as np
+
+GRID_PATH = os.getenv("POPULATION_GRID", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "population_grid.npz"))
+
+# (start, stop, step) per numeric model input; grid cells are the nearest point
+AGES = (15.0, 90.0, 5.0)
+HEIGHTS_M = (1.40, 2.10, 0.05)
+WEIGHTS_KG = (40.0, 150.0, 5.0)
+GENDERS = ("Male", "Female", "Unknown")
+
+# between-person spread around the expected value at a fixed age/sex/size;
+# the band is median +- 2.2 * mad, same as metric_baseline
+POPULATION_MAD = {"bp_sys": 9.0, "bp_dia": 6.0, "resting_hr": 7.0, "spo2_avg": 1.0}
+REF = "typical for your profile"  # reason wording, vs "your baseline"
+
+
+def axis(spec) -> np.ndarray:
+    start, stop, step = spec
+    return np.round(np.arange(start, stop + step / 2, step), 4)
+
+
+def gender_index(x) -> int:
+    # same mapping as ml_training/utils_columns.standardize_gender
+    s = str(x).strip().lower() if x is not None else ""
+    if s in ("m", "male", "man", "1"): return 0
+    if s in ("f", "female", "woman", "0"): return 1
+    return 2
+
+
+# ---------------------------
+# Export time
+# ---------------------------
+def build_grid(bundle: dict) -> dict:
+    """
+    bundle: the {"model", "features", "targets"} dict saved by
+    train_population_baseline.py. Returns the arrays save_grid writes.
+    """
+    import pandas as pd
+
+    ages, heights, weights = (np.concatenate([[np.nan], axis(s)]) for s in (AGES, HEIGHTS_M, WEIGHTS_KG))
+    a, g, h, w = np.meshgrid(ages, np.arange(len(GENDERS)), heights, weights, indexing="ij")
+    X = pd.DataFrame({"age": a.ravel(), "gender": np.array(GENDERS)[g.ravel()],
+                      "height_m": h.ravel(), "weight_kg": w.ravel()})[bundle["features"]]
+    targets = list(bundle["targets"])
+    values = np.asarray(bundle["model"].predict(X), dtype=np.float32).reshape(*a.shape, len(targets))
+    return {
+        "values": values,
+        "targets": np.array(targets),
+        "mad": np.array([POPULATION_MAD.get(t, 1.0) for t in targets], dtype=np.float32),
+        "axes": np.array([AGES, HEIGHTS_M, WEIGHTS_KG]),
+    }
+
+
+def save_grid(grid: dict, path: str = GRID_PATH):
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **grid)
+    os.replace(tmp, path)
+
+
+# ---------------------------
+# Serving
+# ---------------------------
+class PopulationGrid:
+    def __init__(self, path: str):
+        with np.load(path) as f:
+            self.values = f["values"]
+            self.targets = [str(t) for t in f["targets"]]
+            self.mad = f["mad"].tolist()
+            self.axes = [tuple(a) for a in f["axes"].tolist()]
+
+    def cell(self, profile: Mapping[str, Any]) -> tuple:
+        age = _num(profile.get("age"))
+        height = _num(profile.get("height"))
+        weight = _num(profile.get("weight"))
+        return (
+            _slot(age, self.axes[0]),
+            gender_index(profile.get("gender")),
+            _slot(height / 100.0 if height else None, self.axes[1]),
+            _slot(weight, self.axes[2]),
+        )
+
+
+def _num(x):
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return None
+    return v if v > 0 and v != float("inf") else None
+
+
+def _slot(v, spec) -> int:
+    # 0 = missing, else 1 + nearest grid point (clamped to the ends)
+    if v is None:
+        return 0
+    start, stop, step = spec
+    n = int(round((stop - start) / step)) + 1
+    return 1 + min(max(int(round((v - start) / step)), 0), n - 1)
+
+
+@lru_cache(maxsize=1)
+def load_grid(path: str = GRID_PATH) -> PopulationGrid | None:
+    """The grid at path, or None if it hasn't been exported (loaded once)."""
+    return PopulationGrid(path) if os.path.exists(path) else None
+
+
+def population_band(profile: Mapping[str, Any]) -> Mapping[str, Mapping[str, float]]:
+    """
+    {metric: {"median", "mad", "low", "high", "ref"}} expected for this
+    profile, in compute_personal_baseline's shape; {} without a grid.
+    Read-only and shared by every profile in the same grid cell.
+    """
+    grid = load_grid()
+    if grid is None:
+        return MappingProxyType({})
+    return _cell_band(grid, grid.cell(profile))
+
+
+@lru_cache(maxsize=4096)
+def _cell_band(grid: PopulationGrid, cell: tuple) -> Mapping[str, Mapping[str, float]]:
+    band = {}
+    for t, expected, spread in zip(grid.targets, grid.values[cell].tolist(), grid.mad):
+        if expected == expected:  # NaN if the model couldn't predict it
+            band[t] = MappingProxyType({"median": expected, "mad": spread, "low": expected - 2.2*spread,
+                                        "high": expected + 2.2*spread, "ref": REF})
+    return MappingProxyType(band)
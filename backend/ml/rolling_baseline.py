@@ -0,0 +1,89 @@
+# backend/ml/rolling_baseline.py
+from __future__ import annotations
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple
+
+from ml.dual_baseline import ALL_METRICS, safe_float, metric_baseline
+
+WINDOW = 14
+
+@dataclass
+class RollingBaseline:
+    """
+    Personal baseline kept up to date one log at a time, so /score reads a
+    single stored row instead of re-running compute_personal_baseline
+    over the last 14 logs.
+
+    window: latest-first [date, log_id, {metric: value}] rows, at most WINDOW
+    values: per-metric sorted values currently in the window
+    base:   same dict compute_personal_baseline(window logs) returns
+    """
+    window: List[list] = field(default_factory=list)
+    values: Dict[str, List[float]] = field(default_factory=dict)
+    base: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    @property
+    def days(self) -> int:
+        # score_entry's days = len(get_logs(limit=14))
+        return len(self.window)
+
+    @classmethod
+    def from_logs(cls, rows: List[Tuple[str, int, Dict[str, Any]]]) -> "RollingBaseline":
+        """rows: latest-first (date, log_id, entry) tuples, as get_logs orders them."""
+        state = cls()
+        for date, log_id, entry in reversed(rows[:WINDOW]):
+            state.push(date, log_id, entry)
+        return state
+
+    def position(self, date: str, log_id: int) -> str:
+        """
+        Where a new log lands relative to the window:
+        "head" (newest, can be pushed), "inside" (older than the head but
+        within the window, so the stored state is out of date) or
+        "outside" (too old to matter).
+        """
+        key = (str(date), log_id)
+        if not self.window or key > self._key(0):
+            return "head"
+        if len(self.window) < WINDOW or key > self._key(-1):
+            return "inside"
+        return "outside"
+
+    def push(self, date: str, log_id: int, entry: Dict[str, Any]):
+        """Adds the newest log and drops the oldest once the window is full."""
+        vals = {}
+        for k in ALL_METRICS:
+            v = safe_float(entry.get(k))
+            if v is not None:
+                vals[k] = v
+                insort(self.values.setdefault(k, []), v)
+        self.window.insert(0, [str(date), log_id, vals])
+        touched = set(vals)
+
+        if len(self.window) > WINDOW:
+            _, _, old = self.window.pop()
+            for k, v in old.items():
+                xs = self.values[k]
+                del xs[bisect_left(xs, v)]
+            touched.update(old)
+
+        for k in touched:
+            b = metric_baseline(self.values[k])
+            if b is None:
+                self.base.pop(k, None)
+            else:
+                self.base[k] = b
+        # personal_score walks base in ALL_METRICS order
+        self.base = {k: self.base[k] for k in ALL_METRICS if k in self.base}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "values": self.values, "base": self.base}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RollingBaseline":
+        return cls(window=d["window"], values=d["values"], base=d["base"])
+
+    def _key(self, i: int) -> Tuple[str, int]:
+        date, log_id, _ = self.window[i]
+        return (date, log_id)
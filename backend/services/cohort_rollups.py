@@ -0,0 +1,173 @@
+# backend/services/cohort_rollups.py
+"""
+Per-cohort, per-day histograms of a few metrics, kept in cohort_rollups.
+
+Each row is one histogram bucket: (metric, age_group, bmi_band, date,
+bucket) -> n, total. Buckets have a fixed width per metric (ROLLUP_METRICS),
+so adding or removing a log is an upsert of +-1 on a few rows, and
+percentiles come out of summed buckets to within one bucket width.
+
+Writes go through db_service: save_log/save_logs/merge_day_logs add their logs to the
+user's current cohort (from the stored profile), and save_profile moves
+the user's logs when their cohort changes. /cohorts reads only this table,
+so its cost depends on cohorts x days x buckets, not on users or logs.
+"""
+import math
+
+from ml.dual_baseline import cohort, safe_float
+from services.metrics import timed
+
+# metric -> (low, high, bucket width); values outside [low, high) go to the end buckets
+ROLLUP_METRICS = {
+    "bp_sys": (60.0, 240.0, 2.0),
+    "resting_hr": (30.0, 150.0, 1.0),
+    "spo2_avg": (70.0, 100.0, 0.5),
+    "sleep_hours": (0.0, 16.0, 0.25),
+}
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_UPSERT = (
+    "INSERT INTO cohort_rollups (metric, age_group, bmi_band, date, bucket, n, total) "
+    "VALUES (?,?,?,?,?,?,?) ON CONFLICT(metric, age_group, bmi_band, date, bucket) "
+    "DO UPDATE SET n = n + excluded.n, total = total + excluded.total"
+)
+
+
+def create_table(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS cohort_rollups(
+      metric TEXT NOT NULL,
+      age_group TEXT NOT NULL,
+      bmi_band TEXT NOT NULL,
+      date TEXT NOT NULL,
+      bucket INTEGER NOT NULL,
+      n INTEGER NOT NULL,
+      total REAL NOT NULL,
+      PRIMARY KEY (metric, age_group, bmi_band, date, bucket)
+    ) WITHOUT ROWID
+    """)
+
+
+def bucket(metric: str, value: float) -> int:
+    low, high, width = ROLLUP_METRICS[metric]
+    last = int(math.ceil((high - low) / width)) - 1
+    return min(max(int((value - low) // width), 0), last)
+
+
+# ---------------------------
+# Incremental updates
+# ---------------------------
+def add(deltas: dict, ag_bb: tuple, date: str, values: dict, sign: int = 1):
+    """Accumulates one log's contribution (sign=-1 removes it) into deltas."""
+    for metric in ROLLUP_METRICS:
+        v = safe_float(values.get(metric))
+        if v is None or math.isinf(v):
+            continue
+        key = (metric, *ag_bb, date, bucket(metric, v))
+        d = deltas.get(key)
+        if d is None:
+            deltas[key] = [sign, sign * v]
+        else:
+            d[0] += sign
+            d[1] += sign * v
+
+
+def apply(conn, deltas: dict):
+    # no commit: part of the write that produced the deltas
+    conn.executemany(_UPSERT, [(*key, n, total) for key, (n, total) in deltas.items() if n])
+    emptied = [key for key, (n, _) in deltas.items() if n < 0]
+    conn.executemany("DELETE FROM cohort_rollups WHERE metric=? AND age_group=? AND bmi_band=? "
+                     "AND date=? AND bucket=? AND n <= 0", emptied)
+
+
+def move_user(conn, user_id: str, old: tuple, new: tuple):
+    """
+    Re-files all of user_id's logs from cohort old to new (no commit). The
+    caller holds the write lock from before it read old, so no log can be
+    added to the old cohort in between.
+    """
+    if old == new:
+        return
+    metrics = list(ROLLUP_METRICS)
+    deltas = {}
+    cur = conn.execute(f"SELECT date, {', '.join(metrics)} FROM logs WHERE user_id=?", (user_id,))
+    for date, *vals in cur:
+        values = dict(zip(metrics, vals))
+        add(deltas, old, date, values, -1)
+        add(deltas, new, date, values)
+    apply(conn, deltas)
+
+
+def rebuild(conn, decode_profile, chunk: int = 5000):
+    """Recomputes the whole table from profiles and the typed log columns (no commit)."""
+    cohorts = {uid: cohort(decode_profile(p)) for uid, p in conn.execute("SELECT user_id, payload FROM profiles")}
+    unknown = cohort({})
+    metrics = list(ROLLUP_METRICS)
+    conn.execute("DELETE FROM cohort_rollups")
+    last_id = 0
+    while True:
+        rows = conn.execute(f"SELECT id, user_id, date, {', '.join(metrics)} FROM logs "
+                            "WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk)).fetchall()
+        if not rows:
+            break
+        deltas = {}
+        for _, uid, date, *vals in rows:
+            add(deltas, cohorts.get(uid, unknown), date, dict(zip(metrics, vals)))
+        apply(conn, deltas)
+        last_id = rows[-1][0]
+
+
+# ---------------------------
+# Reads
+# ---------------------------
+def _percentile(buckets: list, n: int, q: float, low: float, width: float) -> float:
+    # buckets: sorted (bucket, count); linear inside the bucket holding the q-th value
+    target = q * n
+    seen = 0
+    for b, count in buckets:
+        if seen + count >= target:
+            return round(low + width * (b + (target - seen) / count), 3)
+        seen += count
+    b = buckets[-1][0]
+    return round(low + width * (b + 1), 3)
+
+
+@timed("db.cohort_summary")
+def summarize(conn, metrics=None, start: str | None = None, end: str | None = None,
+              age_group: str | None = None, bmi_band: str | None = None) -> list[dict]:
+    """
+    [{"age_group", "bmi_band", "metrics": {metric: {"n", "mean", "p10".."p90"}}}]
+    over logs dated start..end (inclusive ISO dates; open if None).
+    """
+    metrics = list(metrics or ROLLUP_METRICS)
+    bad = [m for m in metrics if m not in ROLLUP_METRICS]
+    if bad:
+        raise ValueError(f"no rollups for {bad}, expected some of {list(ROLLUP_METRICS)}")
+    where = [f"metric IN ({','.join('?' * len(metrics))})"]
+    args = list(metrics)
+    for clause, value in (("date >= ?", start), ("date <= ?", end),
+                          ("age_group = ?", age_group), ("bmi_band = ?", bmi_band)):
+        if value:
+            where.append(clause)
+            args.append(value)
+    cur = conn.execute(
+        "SELECT age_group, bmi_band, metric, bucket, SUM(n), SUM(total) FROM cohort_rollups "
+        f"WHERE {' AND '.join(where)} GROUP BY age_group, bmi_band, metric, bucket "
+        "ORDER BY age_group, bmi_band, metric, bucket", args)
+
+    hists = {}
+    for ag, bb, metric, b, n, total in cur:
+        h = hists.setdefault((ag, bb), {}).setdefault(metric, [[], 0, 0.0])
+        h[0].append((b, n))
+        h[1] += n
+        h[2] += total
+
+    out = []
+    for (ag, bb), by_metric in hists.items():
+        summary = {}
+        for metric, (buckets, n, total) in by_metric.items():
+            low, _, width = ROLLUP_METRICS[metric]
+            summary[metric] = {"n": n, "mean": round(total / n, 3),
+                               **{f"p{p}": _percentile(buckets, n, p / 100, low, width) for p in PERCENTILES}}
+        out.append({"age_group": ag, "bmi_band": bb, "metrics": summary})
+    return out
@@ -0,0 +1,206 @@
+# backend/services/compact_forest.py
+"""
+Compact NumPy evaluator for the exported scoring pipelines.
+
+The training scripts save Pipeline(ColumnTransformer(median imputer |
+most-frequent imputer + one-hot), RandomForestClassifier). Calling
+predict_proba on that pays sklearn's per-call validation, a DataFrame
+round trip and a joblib dispatch over 250-300 trees, which dominates
+single-row latency. CompactModel flattens the same fitted parameters into
+a few arrays and walks every tree for the whole batch at once, level by
+level, so one call costs ~max_depth vectorized gathers. Nodes are laid
+out breadth-first per tree so a node's two children are adjacent and the
+next node is child[node] + (x > threshold).
+"""
+from __future__ import annotations
+from typing import Dict, List
+import numpy as np
+
+BLOCK_ROWS = 256
+
+ARRAY_FIELDS = (
+    "num_fill", "num_keep", "cat_fill", "cat_levels", "cat_offsets",
+    "feature", "threshold", "child", "value", "roots",
+)
+
+
+class UnsupportedModel(ValueError):
+    pass
+
+
+class CompactModel:
+    """
+    Preprocessing + forest as flat arrays.
+
+    num_cols/cat_cols: input columns in ColumnTransformer order
+    num_fill:  median per numeric column (NaN -> fill)
+    num_keep:  numeric columns the imputer kept (all-NaN columns are dropped)
+    cat_fill:  most-frequent value per categorical column
+    cat_levels/cat_offsets: one-hot categories of every cat column, concatenated
+    feature/threshold: split of every node of every tree (leaves: +inf)
+    child:     index of the left child (right = child + 1); leaves point to themselves
+    value:     class probabilities per node (rows sum to 1 on leaves)
+    roots:     root node index of every tree
+    """
+
+    def __init__(self, features: List[str], num_cols: List[str], cat_cols: List[str],
+                 classes: List, max_depth: int, arrays: Dict[str, np.ndarray]):
+        self.features = features
+        self.num_cols = num_cols
+        self.cat_cols = cat_cols
+        self.classes = classes
+        self.max_depth = max_depth
+        for k in ARRAY_FIELDS:
+            setattr(self, k, arrays[k])
+        self._is_leaf = self.child == np.arange(len(self.child))
+
+    # ---------------------------
+    # Compile from a fitted sklearn pipeline
+    # ---------------------------
+    @classmethod
+    def from_pipeline(cls, pipe, features: List[str]) -> "CompactModel":
+        try:
+            pre = pipe.named_steps["pre"]
+            clf = pipe.named_steps["clf"]
+        except (AttributeError, KeyError):
+            raise UnsupportedModel("expected Pipeline(pre=ColumnTransformer, clf=forest)")
+        if getattr(clf, "n_outputs_", 1) != 1 or not hasattr(clf, "estimators_"):
+            raise UnsupportedModel("only single-output forests are supported")
+
+        num_cols, cat_cols = [], []
+        num_fill = num_keep = cat_fill = None
+        levels, offsets = [], [0]
+        for name, trans, cols in pre.transformers_:
+            if trans == "drop" or name == "remainder":
+                continue
+            steps = dict(trans.steps)
+            imp = steps.get("imp")
+            if imp is None or imp.strategy not in ("median", "most_frequent"):
+                raise UnsupportedModel(f"unsupported transformer {name!r}")
+            if "oh" in steps:
+                oh = steps["oh"]
+                if oh.drop_idx_ is not None or oh.handle_unknown != "ignore":
+                    raise UnsupportedModel("one-hot with drop/strict unknowns")
+                cat_cols += list(cols)
+                cat_fill = np.asarray(imp.statistics_, dtype=object)
+                for cats in oh.categories_:
+                    levels += list(cats)
+                    offsets.append(len(levels))
+            elif len(steps) == 1:
+                num_cols += list(cols)
+                stats = np.asarray(imp.statistics_, dtype=float)
+                num_keep = ~np.isnan(stats)
+                num_fill = stats
+            else:
+                raise UnsupportedModel(f"unsupported transformer {name!r}")
+
+        trees = [est.tree_ for est in clf.estimators_]
+        child, feature, threshold, value, roots = [], [], [], [], []
+        base = 0
+        for t in trees:
+            # breadth-first renumbering: children of a node get consecutive ids
+            order = [0]
+            for nd in order:
+                if t.children_left[nd] != -1:
+                    order += [t.children_left[nd], t.children_right[nd]]
+            order = np.array(order)
+            new_id = np.empty(t.node_count, dtype=np.int64)
+            new_id[order] = np.arange(t.node_count) + base
+
+            leaf = t.children_left[order] == -1
+            child.append(np.where(leaf, new_id[order], new_id[np.maximum(t.children_left[order], 0)]))
+            feature.append(np.where(leaf, 0, t.feature[order]))
+            threshold.append(np.where(leaf, np.inf, t.threshold[order]))
+            v = t.value[order, 0, :len(clf.classes_)].astype(float)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            value.append(v / norm)
+            roots.append(base)
+            base += t.node_count
+
+        arrays = {
+            "num_fill": num_fill if num_fill is not None else np.zeros(0),
+            "num_keep": num_keep if num_keep is not None else np.zeros(0, dtype=bool),
+            "cat_fill": np.array([str(x) for x in cat_fill]) if cat_fill is not None else np.zeros(0, dtype="U1"),
+            "cat_levels": np.array([str(x) for x in levels]) if levels else np.zeros(0, dtype="U1"),
+            "cat_offsets": np.array(offsets, dtype=np.int64),
+            "feature": np.concatenate(feature).astype(np.int64),
+            "threshold": np.concatenate(threshold),
+            "child": np.concatenate(child),
+            "value": np.concatenate(value),
+            "roots": np.array(roots, dtype=np.int64),
+        }
+        max_depth = max(t.max_depth for t in trees)
+        return cls(list(features), num_cols, cat_cols, list(clf.classes_), max_depth, arrays)
+
+    # ---------------------------
+    # Inference
+    # ---------------------------
+    def transform(self, num: np.ndarray, cat: List[List]) -> np.ndarray:
+        """
+        num: (n x num_cols) floats with NaN for missing
+        cat: n rows of raw categorical values (None for missing)
+        Returns the (n x model features) matrix the forest was trained on.
+        """
+        num = np.where(np.isnan(num), self.num_fill, num)[:, self.num_keep]
+        if not self.cat_cols:
+            return num
+        onehot = np.zeros((num.shape[0], self.cat_offsets[-1]))
+        for j in range(len(self.cat_cols)):
+            lo, hi = self.cat_offsets[j], self.cat_offsets[j + 1]
+            levels = list(self.cat_levels[lo:hi])
+            for i, row in enumerate(cat):
+                v = row[j]
+                v = self.cat_fill[j] if v is None else str(v)
+                if v in levels:  # unknown categories stay all-zero
+                    onehot[i, lo + levels.index(v)] = 1.0
+        return np.hstack([num, onehot])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Mean leaf class distribution over all trees, like forest.predict_proba."""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if len(X) <= BLOCK_ROWS:
+            return self._walk(X)
+        # row blocks keep the walker arrays cache-sized
+        return np.vstack([self._walk(X[i:i + BLOCK_ROWS]) for i in range(0, len(X), BLOCK_ROWS)])
+
+    def _walk(self, X: np.ndarray) -> np.ndarray:
+        n, n_feat = X.shape
+        flat = X.ravel()
+        n_trees = len(self.roots)
+
+        # one (tree, row) walker per pair; walkers that reach a leaf drop out
+        node = np.repeat(self.roots, n)
+        offset = np.tile(np.arange(n) * n_feat, n_trees)
+        slot = np.arange(n_trees * n)
+        leaf_of = node.copy()
+        for _ in range(self.max_depth):
+            x = flat[offset + self.feature[node]]
+            node = self.child[node] + (x > self.threshold[node])
+            done = self._is_leaf[node]
+            if done.any():
+                leaf_of[slot[done]] = node[done]
+                keep = ~done
+                node, offset, slot = node[keep], offset[keep], slot[keep]
+                if not len(node):
+                    break
+        return self.value[leaf_of].reshape(n_trees, n, -1).mean(axis=0)
+
+    # ---------------------------
+    # Flat-array persistence (see model_store)
+    # ---------------------------
+    def meta(self) -> dict:
+        return {
+            "features": self.features, "num_cols": self.num_cols, "cat_cols": self.cat_cols,
+            "classes": [c.item() if hasattr(c, "item") else c for c in self.classes],
+            "max_depth": self.max_depth,
+        }
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {k: getattr(self, k) for k in ARRAY_FIELDS}
+
+    @classmethod
+    def from_parts(cls, meta: dict, arrays: Dict[str, np.ndarray]) -> "CompactModel":
+        return cls(meta["features"], meta["num_cols"], meta["cat_cols"],
+                   meta["classes"], meta["max_depth"], arrays)
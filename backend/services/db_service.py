@@ -1,11 +1,57 @@
-import sqlite3, json, os
+import sqlite3, json, os, threading, time
 from pathlib import Path
 
+from ml.dual_baseline import ALL_METRICS, safe_float, cohort
+from ml.rolling_baseline import RollingBaseline, WINDOW
+from services.metrics import timed
+from services import cohort_rollups
+
 DB_PATH = os.getenv("DB_PATH", "./data/astrasync.db")
 
-def get_conn():
-    Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+# Typed copies of each metric live next to the JSON payload in logs,
+# so scoring/history queries can read just the columns they need.
+METRIC_TYPES = {k: "INTEGER" if k in ("alcohol", "smoking") else "REAL" for k in ALL_METRICS}
+LOG_COLUMNS = ("id", "date") + tuple(ALL_METRICS)
+
+_LOG_INSERT = (
+    f"INSERT INTO logs (user_id, date, payload, {', '.join(ALL_METRICS)}) "
+    f"VALUES (?,?,?,{','.join('?' * len(ALL_METRICS))})"
+)
+
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# WAL lets readers run alongside the single writer; NORMAL sync is safe
+# under WAL (only the last commits can be lost on power failure).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",  # KiB, ~16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+)
+
+def get_conn(path: str | None = None):
+    """New configured connection; request code should use get_db_connection()."""
+    path = path or DB_PATH
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+_local = threading.local()
+
+def get_db_connection():
+    """
+    This thread's connection, opened on first use and reused afterwards.
+    Also reopened after a fork, so gunicorn workers never inherit the
+    master's connection.
+    """
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.conn = get_conn()
+        _local.pid = pid
+    return _local.conn
 
 def init_db(conn):
     cur = conn.cursor()
@@ -23,32 +69,380 @@ def init_db(conn):
       payload TEXT NOT NULL
     )
     """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS baselines(
+      user_id TEXT PRIMARY KEY,
+      stale INTEGER NOT NULL DEFAULT 0,
+      payload TEXT NOT NULL
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_versions(
+      user_id TEXT PRIMARY KEY,
+      log_version INTEGER NOT NULL DEFAULT 0,
+      profile_version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sync_cursors(
+      user_id TEXT NOT NULL,
+      provider TEXT NOT NULL,
+      end_ms INTEGER NOT NULL,
+      PRIMARY KEY (user_id, provider)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS jobs(
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      kind TEXT NOT NULL,
+      params TEXT NOT NULL,
+      priority INTEGER NOT NULL DEFAULT 0,
+      status TEXT NOT NULL,
+      attempts INTEGER NOT NULL DEFAULT 0,
+      max_attempts INTEGER NOT NULL,
+      result TEXT,
+      error TEXT,
+      worker TEXT,
+      run_after REAL NOT NULL,
+      created_at REAL NOT NULL,
+      started_at REAL,
+      finished_at REAL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, id)")
+    cohort_rollups.create_table(conn)
     init_tokens_table(conn)
     conn.commit()
+    migrate(conn)
+
+# ---------------------------
+# Schema versions (PRAGMA user_version)
+# ---------------------------
+def _v1_typed_logs(conn):
+    # typed metric columns + per-user index matching get_logs' ORDER BY
+    have = {r[1] for r in conn.execute("PRAGMA table_info(logs)")}
+    for k, typ in METRIC_TYPES.items():
+        if k not in have:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {k} {typ}")
+
+    sql = f"UPDATE logs SET {', '.join(f'{k}=?' for k in ALL_METRICS)} WHERE id=?"
+    last_id = 0
+    while True:
+        rows = conn.execute("SELECT id, payload FROM logs WHERE id > ? ORDER BY id LIMIT 5000",
+                            (last_id,)).fetchall()
+        if not rows:
+            break
+        conn.executemany(sql, [(*_typed_values(json.loads(p)), i) for i, p in rows])
+        last_id = rows[-1][0]
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_user_date ON logs(user_id, date DESC, id DESC)")
+
+def _v2_cohort_rollups(conn):
+    # backfill for logs written before rollups were kept incrementally
+    cohort_rollups.create_table(conn)
+    cohort_rollups.rebuild(conn, json.loads)
+
+def _v3_job_leases(conn):
+    # running jobs hold a lease their runner renews (services/jobs.py)
+    if "lease_until" not in {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}:
+        conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+    conn.execute("UPDATE jobs SET lease_until = started_at + 3600 WHERE status='running'")
+
+MIGRATIONS = [_v1_typed_logs, _v2_cohort_rollups, _v3_job_leases]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """Applies pending MIGRATIONS, each in its own transaction with the version bump."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for v in range(version, SCHEMA_VERSION):
+        conn.execute("BEGIN")
+        try:
+            MIGRATIONS[v](conn)
+            conn.execute(f"PRAGMA user_version = {v + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def _typed_values(entry: dict) -> list:
+    # same parsing scoring applies to payload values, so typed reads score identically
+    return [safe_float(entry.get(k)) for k in ALL_METRICS]
+
+def _select_list(columns) -> str:
+    bad = [c for c in columns if c not in LOG_COLUMNS]
+    if bad:
+        raise ValueError(f"unknown log columns: {bad}")
+    return ", ".join(columns)
+
+def _begin_write(conn):
+    """
+    Takes the write lock before a write reads what it depends on (the stored
+    profile's cohort, the user's logs), so no other save_* can land between
+    that read and the write. No-op inside a transaction the caller opened.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
 
 def save_profile(conn, user_id: str, profile: dict):
-    conn.execute("INSERT OR REPLACE INTO profiles (user_id, payload) VALUES (?,?)",
-                 (user_id, json.dumps(profile)))
-    conn.commit()
+    _begin_write(conn)
+    try:
+        # a cohort change re-files the user's logs in cohort_rollups
+        cohort_rollups.move_user(conn, user_id, cohort(get_profile(conn, user_id)), cohort(profile))
+        conn.execute("INSERT OR REPLACE INTO profiles (user_id, payload) VALUES (?,?)",
+                     (user_id, json.dumps(profile)))
+        _bump_version(conn, "profile_version", [user_id])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
+@timed("db.get_profile")
 def get_profile(conn, user_id: str) -> dict:
     cur = conn.cursor()
     cur.execute("SELECT payload FROM profiles WHERE user_id=?", (user_id,))
     row = cur.fetchone()
     return json.loads(row[0]) if row else {}
 
+@timed("db.save_log")
 def save_log(conn, user_id: str, date: str, entry: dict):
-    conn.execute("INSERT INTO logs (user_id, date, payload) VALUES (?,?,?)",
-                 (user_id, date, json.dumps(entry)))
-    conn.commit()
+    _begin_write(conn)
+    try:
+        cur = conn.execute(_LOG_INSERT, (user_id, date, json.dumps(entry), *_typed_values(entry)))
+        _update_baseline(conn, user_id, date, cur.lastrowid, entry)
+        rollups = {}
+        cohort_rollups.add(rollups, cohort(get_profile(conn, user_id)), date, entry)
+        cohort_rollups.apply(conn, rollups)
+        _bump_version(conn, "log_version", [user_id])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@timed("db.save_logs")
+def save_logs(conn, rows, batch_size: int = 1000, commit: bool = True) -> int:
+    """
+    Bulk save_log: rows is an iterable of (user_id, date, entry), consumed
+    lazily and written with executemany in one transaction (one commit,
+    one fsync). Stored baselines of the users touched are invalidated
+    instead of being pushed row by row. commit=False leaves the transaction
+    open so the caller can add its own writes (e.g. a sync cursor) to it.
+    """
+    cohorts = {}
+    rollups = {}
+    n = 0
+    batch = []
+    _begin_write(conn)
+    try:
+        for user_id, date, entry in rows:
+            batch.append((user_id, date, json.dumps(entry), *_typed_values(entry)))
+            if user_id not in cohorts:
+                cohorts[user_id] = cohort(get_profile(conn, user_id))
+            cohort_rollups.add(rollups, cohorts[user_id], date, entry)
+            if len(batch) >= batch_size:
+                conn.executemany(_LOG_INSERT, batch)
+                n += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(_LOG_INSERT, batch)
+            n += len(batch)
+        cohort_rollups.apply(conn, rollups)
+        _logs_changed(conn, list(cohorts))
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return n
+
+_LOG_MERGE = (
+    f"UPDATE logs SET payload=?, {', '.join(f'{k}=?' for k in ALL_METRICS)} WHERE id=?"
+)
+
+def merge_day_logs(conn, rows, commit: bool = True) -> int:
+    """
+    save_logs for sources that report one entry per day (Google Fit): an
+    entry for a date the user already has a log for is merged into that log
+    (its latest one, whose own values win) instead of adding a second log,
+    so days of history and the baselines count each date once. Returns the
+    number of entries inserted or merged; commit=False as in save_logs.
+    """
+    cohorts = {}
+    rollups = {}
+    fresh = []
+    merged = 0
+    _begin_write(conn)
+    try:
+        for user_id, date, entry in rows:
+            row = conn.execute("SELECT id, payload FROM logs WHERE user_id=? AND date=? "
+                               "ORDER BY id DESC LIMIT 1", (user_id, date)).fetchone()
+            if row is None:
+                fresh.append((user_id, date, entry))
+                continue
+            stored = json.loads(row[1])
+            added = {k: v for k, v in entry.items() if k not in stored and k != "source"}
+            if added:
+                stored.update(added)
+                conn.execute(_LOG_MERGE, (json.dumps(stored), *_typed_values(stored), row[0]))
+                if user_id not in cohorts:
+                    cohorts[user_id] = cohort(get_profile(conn, user_id))
+                # the merged-in metrics were empty before, so only they are new to the rollups
+                cohort_rollups.add(rollups, cohorts[user_id], date, added)
+            merged += 1
+        cohort_rollups.apply(conn, rollups)
+        _logs_changed(conn, list(cohorts))
+        n = save_logs(conn, fresh, commit=False) + merged
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return n
+
+def _logs_changed(conn, user_ids):
+    # no commit: stored baselines are rebuilt from logs on the next get_baseline
+    for chunk in _chunks(user_ids):
+        conn.execute(f"UPDATE baselines SET stale=1 WHERE user_id IN ({','.join('?' * len(chunk))})", chunk)
+    _bump_version(conn, "log_version", user_ids)
+
+@timed("db.get_logs")
+def get_logs(conn, user_id: str, limit: int = 14, columns=None) -> list[dict]:
+    """
+    Latest-first logs. columns=None returns the stored payloads; a list of
+    LOG_COLUMNS returns only those typed columns (no JSON decode).
+    """
+    if columns is not None:
+        cur = conn.execute(f"SELECT {_select_list(columns)} FROM logs WHERE user_id=? "
+                           "ORDER BY date DESC, id DESC LIMIT ?", (user_id, limit))
+        return [dict(zip(columns, r)) for r in cur.fetchall()]
 
-def get_logs(conn, user_id: str, limit: int = 14) -> list[dict]:
     cur = conn.cursor()
     cur.execute("SELECT payload FROM logs WHERE user_id=? ORDER BY date DESC, id DESC LIMIT ?",
                 (user_id, limit))
     rows = cur.fetchall()
     return [json.loads(r[0]) for r in rows]
 
+def get_log_page(conn, user_id: str, limit: int = 60, before=None, columns=None) -> list[dict]:
+    """
+    One page of a user's logs, latest first, strictly older than before=(date, id)
+    (the last row of the previous page). Keyset on idx_logs_user_date, so
+    every page costs the same however deep it is. Rows always carry id and
+    date; columns=None adds the decoded payload, else just those typed columns.
+    """
+    cols = ["id", "date"] + [c for c in (columns or []) if c not in ("id", "date")]
+    select = _select_list(cols) + ("" if columns is not None else ", payload")
+    sql = f"SELECT {select} FROM logs WHERE user_id=?"
+    args = [user_id]
+    if before is not None:
+        sql += " AND (date, id) < (?, ?)"
+        args += [before[0], before[1]]
+    cur = conn.execute(sql + " ORDER BY date DESC, id DESC LIMIT ?", (*args, limit))
+    if columns is not None:
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+    # the row's own id/date win over same-named payload keys (the cursor is built from them)
+    return [{**json.loads(r[2]), "id": r[0], "date": r[1]} for r in cur.fetchall()]
+
+# ---------------------------
+# Per-user change counters (ETags, cache keys)
+# ---------------------------
+def _bump_version(conn, column: str, user_ids):
+    # no commit: part of the write it versions
+    conn.executemany(
+        f"INSERT INTO user_versions (user_id, {column}) VALUES (?, 1) "
+        f"ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + 1",
+        [(u,) for u in user_ids])
+
+def get_user_versions(conn, user_id: str) -> tuple[int, int]:
+    """(log_version, profile_version); both move on every write to that user's logs/profile."""
+    row = conn.execute("SELECT log_version, profile_version FROM user_versions WHERE user_id=?",
+                       (user_id,)).fetchone()
+    return tuple(row) if row else (0, 0)
+
+# ---------------------------
+# Stored personal baselines (see ml/rolling_baseline.py)
+# ---------------------------
+def _update_baseline(conn, user_id: str, date: str, log_id: int, entry: dict):
+    row = conn.execute("SELECT stale, payload FROM baselines WHERE user_id=?", (user_id,)).fetchone()
+    if not row or row[0]:
+        return  # rebuilt from logs on the next get_baseline
+    state = RollingBaseline.from_dict(json.loads(row[1]))
+    pos = state.position(date, log_id)
+    if pos == "head":
+        state.push(date, log_id, entry)
+        _store_baseline(conn, user_id, state)
+    elif pos == "inside":
+        # backfilled log inside the window: invalidate, rebuild lazily
+        conn.execute("UPDATE baselines SET stale=1 WHERE user_id=?", (user_id,))
+
+def _store_baseline(conn, user_id: str, state: RollingBaseline):
+    conn.execute("INSERT OR REPLACE INTO baselines (user_id, stale, payload) VALUES (?,0,?)",
+                 (user_id, json.dumps(state.to_dict())))
+
+@timed("db.get_baseline")
+def get_baseline(conn, user_id: str) -> RollingBaseline:
+    """Stored personal baseline; missing or stale rows are rebuilt from logs."""
+    row = conn.execute("SELECT stale, payload FROM baselines WHERE user_id=?", (user_id,)).fetchone()
+    if row and not row[0]:
+        return RollingBaseline.from_dict(json.loads(row[1]))
+    return rebuild_baseline(conn, user_id)
+
+@timed("db.rebuild_baseline")
+def rebuild_baseline(conn, user_id: str) -> RollingBaseline:
+    rows = get_logs(conn, user_id, limit=WINDOW, columns=LOG_COLUMNS)
+    state = RollingBaseline.from_logs([(r["date"], r["id"], r) for r in rows])
+    _store_baseline(conn, user_id, state)
+    conn.commit()
+    return state
+
+def rebuild_baselines(conn, user_ids=None) -> int:
+    """Rebuilds stored baselines for user_ids (default: every user with logs)."""
+    if user_ids is None:
+        user_ids = [r[0] for r in conn.execute("SELECT DISTINCT user_id FROM logs")]
+    n = 0
+    for user_id in user_ids:
+        rebuild_baseline(conn, user_id)
+        n += 1
+    return n
+
+def _chunks(seq, n=500):
+    # stay well under SQLITE_MAX_VARIABLE_NUMBER on older builds
+    seq = list(seq)
+    for i in range(0, len(seq), n):
+        yield seq[i:i+n]
+
+@timed("db.get_profiles")
+def get_profiles(conn, user_ids) -> dict[str, dict]:
+    """
+    Batch version of get_profile: {user_id: profile} for every id,
+    with {} for users that have no profile yet.
+    """
+    out = {uid: {} for uid in user_ids}
+    for chunk in _chunks(out):
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(f"SELECT user_id, payload FROM profiles WHERE user_id IN ({marks})", chunk)
+        for uid, payload in cur.fetchall():
+            out[uid] = json.loads(payload)
+    return out
+
+@timed("db.get_logs_many")
+def get_logs_many(conn, user_ids, limit: int = 14, columns=None) -> dict[str, list[dict]]:
+    """
+    Batch version of get_logs: latest-first logs per user, one query per
+    chunk of users instead of one per user. columns works like get_logs.
+    """
+    select = "payload" if columns is None else _select_list(columns)
+    out = {uid: [] for uid in user_ids}
+    for chunk in _chunks(out):
+        marks = ",".join("?" * len(chunk))
+        cur = conn.execute(f"""
+            SELECT user_id, {select} FROM (
+              SELECT *, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date DESC, id DESC) AS rn
+              FROM logs WHERE user_id IN ({marks})
+            ) WHERE rn <= ? ORDER BY user_id, rn
+        """, (*chunk, limit))
+        for uid, *vals in cur.fetchall():
+            out[uid].append(json.loads(vals[0]) if columns is None else dict(zip(columns, vals)))
+    return out
+
 def init_tokens_table(conn):
     conn.execute("""
         CREATE TABLE IF NOT EXISTS user_tokens (
@@ -62,8 +456,6 @@ def init_tokens_table(conn):
     """)
     conn.commit()
 
-    import time
-
 def save_tokens(conn, user_id, provider, access_token, refresh_token, expires_in):
     expires_at = int(time.time()) + expires_in
 
@@ -85,4 +477,26 @@ def get_tokens(conn, user_id, provider):
 
     return cursor.fetchone()
 
+def get_sync_cursor(conn, user_id, provider):
+    """endTimeMillis up to which provider data is already in logs, or None."""
+    row = conn.execute("SELECT end_ms FROM sync_cursors WHERE user_id=? AND provider=?",
+                       (user_id, provider)).fetchone()
+    return row[0] if row else None
+
+def set_sync_cursor(conn, user_id, provider, end_ms):
+    # no commit: written in the same transaction as the logs it covers
+    conn.execute("INSERT OR REPLACE INTO sync_cursors (user_id, provider, end_ms) VALUES (?,?,?)",
+                 (user_id, provider, end_ms))
+
+def get_all_tokens(conn, provider):
+    """(user_id, access_token, refresh_token, expires_at) for every user connected to provider."""
+    cursor = conn.execute("""
+        SELECT user_id, access_token, refresh_token, expires_at
+        FROM user_tokens
+        WHERE provider = ?
+        ORDER BY user_id
+    """, (provider,))
+
+    return cursor.fetchall()
+
 
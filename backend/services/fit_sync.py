@@ -0,0 +1,172 @@
+# backend/services/fit_sync.py
+"""
+Google Fit sync for every connected user.
+
+sync_all() walks user_tokens and runs sync_user for each user on a bounded
+thread pool. All calls go through google_fit_service.session(), so threads
+share keep-alive connections, the pool caps concurrent requests per host
+and 429/5xx responses are retried with backoff. A failing user is counted
+and reported; it never stops the run.
+
+Each user has a cursor in sync_cursors: the end of the last day already
+written to logs. A sync fetches only complete UTC days after it (the first
+one backfills BACKFILL_DAYS), in CHUNK_DAYS-day requests, and writes each
+chunk's daily rows and the moved cursor in one transaction. A day the
+user already logged by hand is merged into that log (merge_day_logs), so
+each date stays one log. Re-syncing a user who is up to date makes no Fit
+request at all.
+
+    python manage.py sync-google-fit [--workers 16] [--user USER_ID ...]
+"""
+import os, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from services.db_service import (
+    get_db_connection, get_all_tokens, merge_day_logs, get_sync_cursor, set_sync_cursor
+)
+from services.google_fit_service import refresh_access_token, fetch_aggregated_data
+from services.metrics import Counter
+from services.token_cache import TokenCache
+
+PROVIDER = "google_fit"
+TOKENS = TokenCache(PROVIDER, refresh_access_token)
+WORKERS = int(os.getenv("FIT_SYNC_WORKERS", "16"))
+MAX_ERRORS = 100  # per-user errors kept in the report; counts are always exact
+
+DAY_MS = 24 * 60 * 60 * 1000
+BACKFILL_DAYS = int(os.getenv("FIT_BACKFILL_DAYS", "30"))  # history pulled on a user's first sync
+CHUNK_DAYS = 30  # daily buckets per aggregate request
+
+SYNCED = Counter("astrasync_fit_sync_users_total", "Users processed by the Google Fit sync.", ["result"])
+
+
+class SyncReport:
+    def __init__(self):
+        self.users = 0
+        self.ok = 0
+        self.failed = 0
+        self.days = 0
+        self.requests = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def fail(self, user_id: str, error: Exception):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"user_id": user_id, "error": f"{type(error).__name__}: {error}"})
+
+    def to_dict(self) -> dict:
+        return {
+            "users": self.users,
+            "ok": self.ok,
+            "failed": self.failed,
+            "days_written": self.days,
+            "requests": self.requests,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+# ---------------------------
+# Fit buckets -> daily log entries
+# ---------------------------
+def _values(ds, field):
+    return [v.get(field) for p in ds.get("point", []) for v in p.get("value", [])]
+
+
+def bucket_entry(bucket: dict) -> dict | None:
+    """
+    One daily aggregate bucket as a log entry, or None if the day is empty.
+    steps -> steps; average and lowest heart rate (avg_hr, min_hr) and
+    calories are kept in the payload only. The day's lowest heart rate is
+    not a resting measurement, so it stays out of the resting_hr baseline.
+    """
+    start = int(bucket["startTimeMillis"])
+    entry = {"date": datetime.fromtimestamp(start / 1000, timezone.utc).date().isoformat(),
+             "source": PROVIDER}
+    for ds in bucket.get("dataset", []):
+        source = ds.get("dataSourceId", "")
+        if "step_count" in source:
+            steps = [v for v in _values(ds, "intVal") if v is not None]
+            if steps:
+                entry["steps"] = sum(steps)
+        elif "heart_rate" in source:
+            # summary points are [average, max, min]
+            for p in ds.get("point", []):
+                vals = [v.get("fpVal") for v in p.get("value", [])]
+                if len(vals) == 3 and None not in vals:
+                    entry["avg_hr"] = round(vals[0], 1)
+                    entry["min_hr"] = round(vals[2], 1)
+        elif "calories" in source:
+            kcal = [v for v in _values(ds, "fpVal") if v is not None]
+            if kcal:
+                entry["calories_kcal"] = round(sum(kcal), 1)
+    return entry if len(entry) > 2 else None
+
+
+def day_start_ms(t_ms: int) -> int:
+    return t_ms - t_ms % DAY_MS
+
+
+# ---------------------------
+# Sync
+# ---------------------------
+def sync_user(user_id, now_ms=None) -> dict:
+    """
+    Backfills every complete day since the user's cursor into logs, with
+    the access token from TOKENS (refreshed there when close to expiry;
+    NotConnected if the user has none).
+    Returns {"user_id", "days", "requests", "cursor"}.
+    """
+    access_token = TOKENS.access_token(user_id)
+    conn = get_db_connection()
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    end = day_start_ms(now_ms)  # today is still filling up
+    start = get_sync_cursor(conn, user_id, PROVIDER)
+    if start is None:
+        start = end - BACKFILL_DAYS * DAY_MS
+    days = requests = 0
+    while start < end:
+        stop = min(start + CHUNK_DAYS * DAY_MS, end)
+        data = fetch_aggregated_data(access_token, start, stop)
+        requests += 1
+        rows = []
+        for bucket in data.get("bucket", []):
+            entry = bucket_entry(bucket)
+            if entry:
+                rows.append((user_id, entry["date"], {"user_id": user_id, **entry}))
+        days += merge_day_logs(conn, rows, commit=False)
+        set_sync_cursor(conn, user_id, PROVIDER, stop)
+        conn.commit()
+        start = stop
+    return {"user_id": user_id, "days": days, "requests": requests, "cursor": start}
+
+
+def sync_all(workers: int = WORKERS, user_ids=None) -> SyncReport:
+    """Syncs every connected user (or just user_ids) with `workers` threads."""
+    t0 = time.perf_counter()
+    rows = get_all_tokens(get_db_connection(), PROVIDER)
+    if user_ids is not None:
+        wanted = set(user_ids)
+        rows = [r for r in rows if r[0] in wanted]
+    TOKENS.prime(rows)  # one query instead of one per user
+
+    report = SyncReport()
+    report.users = len(rows)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fit-sync") as pool:
+        futures = {pool.submit(sync_user, row[0]): row[0] for row in rows}
+        for f in as_completed(futures):
+            try:
+                done = f.result()
+            except Exception as e:
+                report.fail(futures[f], e)
+                SYNCED.inc(result="failed")
+            else:
+                report.ok += 1
+                report.days += done["days"]
+                report.requests += done["requests"]
+                SYNCED.inc(result="ok")
+    report.seconds = time.perf_counter() - t0
+    return report
@@ -0,0 +1,122 @@
+import os, threading, time
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.metrics import stage
+
+AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
+TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+FIT_API_BASE = os.getenv("FIT_API_BASE", "https://www.googleapis.com/fitness/v1")
+
+SCOPES = [
+    "https://www.googleapis.com/auth/fitness.activity.read",
+    "https://www.googleapis.com/auth/fitness.heart_rate.read",
+]
+
+TIMEOUT = 15  # seconds per Google call
+
+# keep-alive connections per host; with pool_block the pool also caps how
+# many requests run against one host at a time, however many threads call in
+POOL_SIZE = int(os.getenv("FIT_POOL_SIZE", "16"))
+RETRIES = 4
+BACKOFF = 0.5  # s; doubles per retry, Retry-After wins when Google sends it
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_sessions = {}  # retry_post -> session
+_session_lock = threading.Lock()
+
+def session(retry_post: bool = True) -> requests.Session:
+    """
+    Process-wide pooled session with retry/backoff on 429/5xx and connection
+    errors. retry_post=False only retries GETs (and POSTs that never reached
+    the server): for calls that must not run twice, like redeeming an
+    authorization code, which Google accepts exactly once.
+    """
+    s = _sessions.get(retry_post)
+    if s is None:
+        with _session_lock:
+            s = _sessions.get(retry_post)
+            if s is None:
+                retry = Retry(
+                    total=RETRIES,
+                    backoff_factor=BACKOFF,
+                    status_forcelist=RETRY_STATUS,
+                    # refresh-token and aggregate calls are safe to repeat
+                    allowed_methods=frozenset({"GET", "POST"} if retry_post else {"GET"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE,
+                                      pool_block=True, max_retries=retry)
+                s = requests.Session()
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _sessions[retry_post] = s
+    return s
+
+def _client():
+    return {
+        "client_id": os.getenv("GOOGLE_CLIENT_ID", ""),
+        "client_secret": os.getenv("GOOGLE_CLIENT_SECRET", ""),
+        "redirect_uri": os.getenv("GOOGLE_REDIRECT_URI", "http://127.0.0.1:5001/auth/google/callback"),
+    }
+
+def get_authorization_url():
+    c = _client()
+    params = {
+        "client_id": c["client_id"],
+        "redirect_uri": c["redirect_uri"],
+        "response_type": "code",
+        "scope": " ".join(SCOPES),
+        "access_type": "offline",  # we need a refresh_token
+        "prompt": "consent",
+    }
+    return f"{AUTH_URL}?{urlencode(params)}"
+
+def exchange_code_for_tokens(code):
+    c = _client()
+    with stage("google_fit.exchange_code"):
+        # not retried: a repeat of a code Google already redeemed fails with
+        # invalid_grant and hides whether the first attempt worked
+        r = session(retry_post=False).post(TOKEN_URL, data={**c, "code": code, "grant_type": "authorization_code"},
+                                           timeout=TIMEOUT)
+    return r.json()
+
+def refresh_access_token(refresh_token):
+    c = _client()
+    data = {
+        "client_id": c["client_id"],
+        "client_secret": c["client_secret"],
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token",
+    }
+    with stage("google_fit.refresh_token"):
+        r = session().post(TOKEN_URL, data=data, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+def fetch_aggregated_data(access_token, start_ms=None, end_ms=None):
+    # steps, heart rate and calories, one bucket per day (default: the last 24 hours)
+    end = int(time.time() * 1000 if end_ms is None else end_ms)
+    start = int(end - 24 * 60 * 60 * 1000 if start_ms is None else start_ms)
+    body = {
+        "aggregateBy": [
+            {"dataTypeName": "com.google.step_count.delta"},
+            {"dataTypeName": "com.google.heart_rate.bpm"},
+            {"dataTypeName": "com.google.calories.expended"},
+        ],
+        "bucketByTime": {"durationMillis": 24 * 60 * 60 * 1000},
+        "startTimeMillis": start,
+        "endTimeMillis": end,
+    }
+    with stage("google_fit.aggregate"):
+        r = session().post(
+            f"{FIT_API_BASE}/users/me/dataset:aggregate",
+            headers={"Authorization": f"Bearer {access_token}"},
+            json=body,
+            timeout=TIMEOUT,
+        )
+    r.raise_for_status()
+    return r.json()
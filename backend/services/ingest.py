@@ -0,0 +1,207 @@
+# backend/services/ingest.py
+"""
+Streaming parsers + row validation for /submit_data/bulk.
+
+Bodies are read in chunks, so a months-long backfill never has to sit in
+memory as one JSON document. spool() first copies the upload off the
+network into a temp file (in memory up to SPOOL_MEMORY), so parsing and
+the write transaction never wait on a slow client. Supported bodies:
+  - a JSON array of entry objects
+  - NDJSON: one entry object per line
+"""
+import codecs, json, shutil, tempfile
+
+from ml.dual_baseline import ALL_METRICS, safe_float
+
+CHUNK = 64 * 1024
+MAX_ERRORS = 1000  # per-row errors echoed back; counts are always exact
+SPOOL_MEMORY = 8 * 1024 * 1024  # body bytes kept in memory before spilling to disk
+
+_decoder = json.JSONDecoder()
+
+
+class IngestReport:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, row: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": True,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+
+def spool(stream, max_memory: int = SPOOL_MEMORY):
+    """The rest of stream copied into a rewound temp file; close it when done."""
+    body = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        shutil.copyfileobj(stream, body, CHUNK)
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body
+
+
+def _text_chunks(stream):
+    dec = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        b = stream.read(CHUNK)
+        if not b:
+            tail = dec.decode(b"", final=True)
+            if tail:
+                yield tail
+            return
+        yield dec.decode(b)
+
+
+def iter_ndjson(chunks):
+    """Yields (row, obj) per non-blank line; obj is a ValueError for bad JSON."""
+    buf = ""
+    row = 0
+    for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.strip():
+                yield row, _loads(line)
+                row += 1
+    if buf.strip():
+        yield row, _loads(buf)
+
+
+def _loads(line):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"invalid JSON: {e.msg}")
+
+
+def iter_json_array(chunks):
+    """
+    Yields (row, obj) for each element of a top-level JSON array.
+    A structurally broken array can't be resynchronised, so that raises.
+    """
+    chunks = iter(chunks)
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        nxt = next(chunks, None)
+        if nxt is None:
+            eof = True
+        else:
+            buf = buf[pos:] + nxt
+            pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            more()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    row = 0
+    skip_ws()
+    if pos < len(buf) and buf[pos] == "]":
+        return
+    while True:
+        skip_ws()
+        try:
+            obj, end = _decoder.raw_decode(buf, pos)
+            # a value ending exactly at the buffer edge may be cut short (e.g. a number)
+            complete = end < len(buf) or eof
+        except ValueError:
+            complete = False
+            if eof:
+                raise ValueError(f"invalid JSON array near element {row}")
+        if not complete:
+            more()
+            continue
+        pos = end
+        yield row, obj
+        row += 1
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        if buf[pos] != ",":
+            raise ValueError(f"expected ',' after element {row - 1}")
+        pos += 1
+
+
+def iter_entries(stream, content_type: str = ""):
+    """
+    Picks the parser from the content type (ndjson / jsonl) or, failing
+    that, the first non-blank character of the body.
+    """
+    chunks = _text_chunks(stream)
+    ct = (content_type or "").lower()
+    if "ndjson" in ct or "jsonl" in ct or "json-seq" in ct:
+        return iter_ndjson(chunks)
+
+    first = ""
+    for chunk in chunks:
+        first += chunk
+        if first.strip():
+            break
+    head = [first]
+
+    def rejoined():
+        yield from head
+        yield from chunks
+
+    if first.lstrip().startswith("["):
+        return iter_json_array(rejoined())
+    return iter_ndjson(rejoined())
+
+
+def validate_entry(entry) -> str | None:
+    """Error message for a row /submit_data would not accept, else None."""
+    if isinstance(entry, ValueError):
+        return str(entry)
+    if not isinstance(entry, dict):
+        return "entry must be an object"
+    date = entry.get("date")
+    if not date:
+        return "date required"
+    if not isinstance(date, str):
+        return "date must be a string"
+    bad = []
+    for k in ALL_METRICS:
+        v = entry.get(k)
+        if v is None or v == "" or isinstance(v, (int, float)):
+            continue
+        if not isinstance(v, str) or safe_float(v) is None:
+            bad.append(k)
+    if bad:
+        return f"non-numeric values for {', '.join(bad)}"
+    return None
+
+
+def accepted_rows(entries, report: IngestReport):
+    """(user_id, date, entry) for rows that pass validate_entry; counts into report."""
+    for row, entry in entries:
+        error = validate_entry(entry)
+        if error:
+            report.reject(row, error)
+            continue
+        report.accepted += 1
+        yield entry.get("user_id", "demo_user"), entry["date"], entry
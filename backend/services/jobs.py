@@ -0,0 +1,299 @@
+# backend/services/jobs.py
+"""
+Background jobs persisted in the jobs table of the app DB.
+
+    job_id = submit(conn, "google_fit_sync", {"user_ids": ["demo_user"]}, priority=5)
+    get_job(conn, job_id)  # {"status": "queued" | "running" | "done" | "failed", ...}
+
+A JobRunner in each process claims queued jobs (highest priority first,
+then oldest) with JOB_WORKERS threads, so heavy work runs at a fixed
+concurrency no matter how many requests submit it. Claiming is a
+BEGIN IMMEDIATE transaction, so several gunicorn workers (or a separate
+`manage.py run-jobs` process) can share one queue. Failed attempts are
+retried with exponential backoff up to max_attempts.
+
+A claimed job holds a LEASE_SECONDS lease that its runner renews every
+HEARTBEAT_SECONDS while the handler runs, however long that takes. Jobs
+left "running" by a dead process stop being renewed and are re-queued
+once the lease runs out (failed, if that was their last attempt). Only
+the worker that still holds a job can record its outcome.
+"""
+import json, os, socket, threading, time
+from contextlib import closing
+
+from services.db_service import (
+    get_conn, get_db_connection, get_profile, get_logs, rebuild_baselines, migrate
+)
+from ml.dual_baseline import score_entry
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_SECONDS = 1.0
+RETRY_DELAY = 5.0       # s before the 2nd attempt; doubles per attempt
+LEASE_SECONDS = 300     # a running job whose lease isn't renewed for this long is assumed orphaned
+HEARTBEAT_SECONDS = 60  # lease renewal interval while a job runs
+MAX_ATTEMPTS = 3
+
+STATUSES = ("queued", "running", "done", "failed")
+JOB_COLUMNS = ("id", "kind", "params", "priority", "status", "attempts", "max_attempts",
+               "result", "error", "created_at", "started_at", "finished_at")
+
+
+# ---------------------------
+# Job kinds: handler(params) -> JSON-serialisable result
+# ---------------------------
+def _google_fit_sync(params):
+    from services.fit_sync import sync_all, sync_user, WORKERS
+    user_ids = params.get("user_ids")
+    if user_ids and len(user_ids) == 1:
+        return sync_user(user_ids[0])
+    return sync_all(workers=params.get("workers", WORKERS), user_ids=user_ids).to_dict()
+
+
+def _rescore_history(params):
+    """Scores each of the user's logs against the 14 logs before it, as /score did at the time."""
+    user_id = params["user_id"]
+    conn = get_db_connection()
+    profile = get_profile(conn, user_id)
+    logs = get_logs(conn, user_id, limit=int(params.get("limit", 365)))
+    counts = {}
+    scores = []
+    for i, entry in enumerate(logs):
+        r = score_entry(profile, entry, logs[i + 1:i + 15])
+        counts[r["risk_color"]] = counts.get(r["risk_color"], 0) + 1
+        scores.append({"date": entry.get("date"), "risk_color": r["risk_color"], "confidence": r["confidence"]})
+    return {"user_id": user_id, "scored": len(logs), "risk_counts": counts, "scores": scores}
+
+
+def _rebuild_baselines(params):
+    return {"users": rebuild_baselines(get_db_connection(), params.get("user_ids"))}
+
+
+def _migrate(params):
+    conn = get_db_connection()
+    migrate(conn)
+    return {"user_version": conn.execute("PRAGMA user_version").fetchone()[0]}
+
+
+KINDS = {
+    "google_fit_sync": _google_fit_sync,
+    "rescore_history": _rescore_history,
+    "rebuild_baselines": _rebuild_baselines,
+    "migrate": _migrate,
+}
+
+# kind -> {param: (required, type)}; checked by submit() so a bad job is a
+# 400 for the caller instead of max_attempts failures in a worker
+PARAMS = {
+    "google_fit_sync": {"user_ids": (False, list), "workers": (False, int)},
+    "rescore_history": {"user_id": (True, str), "limit": (False, int)},
+    "rebuild_baselines": {"user_ids": (False, list)},
+    "migrate": {},
+}
+
+
+_TYPE_NAMES = {str: "a string", int: "an integer", list: "a list of strings"}
+
+
+def check_params(kind: str, params: dict):
+    """Raises ValueError unless params fit PARAMS[kind]."""
+    spec = PARAMS[kind]
+    unknown = sorted(set(params) - set(spec))
+    if unknown:
+        raise ValueError(f"{kind}: unknown params {unknown}, expected some of {sorted(spec)}")
+    for name, (required, typ) in spec.items():
+        value = params.get(name)
+        if value is None:
+            if required:
+                raise ValueError(f"{kind}: {name} is required")
+            continue
+        ok = isinstance(value, typ) and not isinstance(value, bool)
+        if typ is list:
+            ok = ok and all(isinstance(v, str) for v in value)
+        if not ok:
+            raise ValueError(f"{kind}: {name} must be {_TYPE_NAMES[typ]}")
+
+
+# ---------------------------
+# Queue
+# ---------------------------
+def submit(conn, kind: str, params: dict | None = None, priority: int = 0,
+           max_attempts: int = MAX_ATTEMPTS) -> int:
+    if kind not in KINDS:
+        raise ValueError(f"unknown job kind {kind!r}, expected one of {sorted(KINDS)}")
+    check_params(kind, params or {})
+    now = time.time()
+    cur = conn.execute(
+        "INSERT INTO jobs (kind, params, priority, status, attempts, max_attempts, run_after, created_at) "
+        "VALUES (?,?,?,'queued',0,?,?,?)",
+        (kind, json.dumps(params or {}), int(priority), max(1, int(max_attempts)), now, now))
+    conn.commit()
+    RUNNER.wake()
+    return cur.lastrowid
+
+
+def _job_dict(row) -> dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+def get_job(conn, job_id: int) -> dict | None:
+    row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(conn, status: str | None = None, kind: str | None = None, limit: int = 50) -> list[dict]:
+    """Newest first; results are left out to keep listings small."""
+    where, args = [], []
+    if status:
+        where.append("status=?")
+        args.append(status)
+    if kind:
+        where.append("kind=?")
+        args.append(kind)
+    sql = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", (*args, limit)).fetchall()
+    jobs = [_job_dict(r) for r in rows]
+    for job in jobs:
+        job.pop("result")
+    return jobs
+
+
+def claim(conn, worker: str):
+    """Marks the next runnable job running and returns (id, kind, params), or None."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # orphaned by a crashed process: back in the queue, unless it has used
+        # up its attempts (a job that kills its worker would loop forever)
+        conn.execute("UPDATE jobs SET status='failed', error='lease expired: worker lost on every attempt', "
+                     "finished_at=? WHERE status='running' AND lease_until < ? AND attempts >= max_attempts",
+                     (now, now))
+        conn.execute("UPDATE jobs SET status='queued', run_after=? WHERE status='running' AND lease_until < ?",
+                     (now, now))
+        row = conn.execute(
+            "SELECT id, kind, params FROM jobs WHERE status='queued' AND run_after <= ? "
+            "ORDER BY priority DESC, id LIMIT 1", (now,)).fetchone()
+        if row:
+            conn.execute("UPDATE jobs SET status='running', attempts=attempts+1, started_at=?, lease_until=?, "
+                         "worker=? WHERE id=?", (now, now + LEASE_SECONDS, worker, row[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return (row[0], row[1], json.loads(row[2])) if row else None
+
+
+def renew(conn, job_id: int, worker: str) -> bool:
+    """Extends a running job's lease; False if it is no longer this worker's."""
+    cur = conn.execute("UPDATE jobs SET lease_until=? WHERE id=? AND status='running' AND worker=?",
+                       (time.time() + LEASE_SECONDS, job_id, worker))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def _heartbeat(job_id: int, worker: str, done: threading.Event):
+    with closing(get_conn()) as conn:
+        while not done.wait(HEARTBEAT_SECONDS):
+            try:
+                if not renew(conn, job_id, worker):
+                    return
+            except Exception:
+                pass  # DB busy etc.: the next beat is still well inside the lease
+
+
+def finish(conn, job_id: int, worker: str, result=None, error: str | None = None) -> bool:
+    """
+    Records the outcome; a failed attempt goes back to the queue until
+    max_attempts. False (nothing written) if worker no longer holds the job:
+    its lease ran out and the job was re-queued or claimed again.
+    """
+    now = time.time()
+    owned = "id=? AND status='running' AND worker=?"
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(f"SELECT attempts, max_attempts FROM jobs WHERE {owned}", (job_id, worker)).fetchone()
+        if row is None:
+            pass
+        elif error is None:
+            conn.execute(f"UPDATE jobs SET status='done', result=?, error=NULL, finished_at=? WHERE {owned}",
+                         (json.dumps(result), now, job_id, worker))
+        elif row[0] < row[1]:
+            conn.execute(f"UPDATE jobs SET status='queued', error=?, run_after=? WHERE {owned}",
+                         (error, now + RETRY_DELAY * 2 ** (row[0] - 1), job_id, worker))
+        else:
+            conn.execute(f"UPDATE jobs SET status='failed', error=?, finished_at=? WHERE {owned}",
+                         (error, now, job_id, worker))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return row is not None
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+class JobRunner:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def ensure_started(self):
+        """Starts the worker threads once per process (threads don't survive a fork)."""
+        if self._pid == os.getpid() or self.workers <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            for i in range(self.workers):
+                threading.Thread(target=self._loop, name=f"job-runner-{i}", daemon=True).start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run_one(self, worker: str | None = None) -> bool:
+        """Claims and runs one job on this thread; False if the queue had nothing runnable."""
+        conn = get_db_connection()
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        job = claim(conn, worker)
+        if job is None:
+            return False
+        job_id, kind, params = job
+        done = threading.Event()
+        threading.Thread(target=_heartbeat, args=(job_id, worker, done), name=f"job-lease-{job_id}",
+                         daemon=True).start()
+        try:
+            result = KINDS[kind](params)
+        except Exception as e:
+            finish(conn, job_id, worker, error=f"{type(e).__name__}: {e}")
+        else:
+            finish(conn, job_id, worker, result=result)
+        finally:
+            done.set()
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_one()
+            except Exception:
+                ran = False  # DB busy etc.: try again after the poll interval
+            if not ran:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+
+
+RUNNER = JobRunner()
@@ -0,0 +1,190 @@
+# backend/services/metrics.py
+"""
+In-process request/stage metrics rendered in the Prometheus text format.
+
+    with stage("db.get_profile"): ...      # one observation in astrasync_stage_seconds
+    @timed("db.get_logs")                   # same, as a decorator
+
+init_app(app) adds request counts, error counts and request latency for
+every route. Values live in the worker process: with several gunicorn
+workers each scrape of /metrics sees the worker that served it, so scrape
+per worker or aggregate on the Prometheus side.
+"""
+import sqlite3, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# seconds; sub-millisecond buckets for the pure-Python stages, up to 10s for HTTP
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_REGISTRY = []
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_labels(self.labels, key)} {v}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            v[0][i] += 1
+            v[1] += value
+            v[2] += 1
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for key, (counts, total, n) in items:
+            cum = 0
+            for le, c in zip(self.buckets + ("+Inf",), counts):
+                cum += c
+                yield f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {cum}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {n}"
+
+
+class Gauge:
+    """Value(s) read at scrape time: fn() returns {label values tuple: value}."""
+
+    def __init__(self, name: str, help: str, labels=(), fn=None):
+        self.name, self.help, self.labels, self.fn = name, help, tuple(labels), fn
+        _REGISTRY.append(self)
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for key, v in sorted(self.fn().items()):
+            yield f"{self.name}{_labels(self.labels, key)} {v}"
+
+
+def render() -> str:
+    lines = []
+    for metric in _REGISTRY:
+        try:
+            lines.extend(metric.collect())
+        except Exception:
+            continue  # a failing gauge must not take the whole scrape down
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# AstraSync metrics
+# ---------------------------
+STAGE_SECONDS = Histogram("astrasync_stage_seconds", "Time spent per request-path stage.", ["stage"])
+STAGE_ERRORS = Counter("astrasync_stage_errors_total", "Stages that raised.", ["stage"])
+REQUEST_SECONDS = Histogram("astrasync_request_seconds", "HTTP request latency.", ["endpoint", "method"])
+REQUESTS = Counter("astrasync_requests_total", "HTTP requests served.", ["endpoint", "method", "status"])
+REQUEST_ERRORS = Counter("astrasync_request_errors_total", "HTTP responses with status >= 400.",
+                         ["endpoint", "status"])
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=name)
+
+
+def timed(name: str):
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def db_row_gauge(get_conn, tables, ttl: float = 60.0):
+    """
+    Registers astrasync_db_rows{table}, counted with get_conn(). COUNT(*)
+    scans the whole table, so the counts are reused for ttl seconds (about a
+    scrape interval) instead of rescanning logs on every scrape.
+    """
+    cache = {"at": None, "counts": {}}
+    lock = threading.Lock()
+
+    def counts():
+        with lock:
+            now = time.monotonic()
+            if cache["at"] is None or now - cache["at"] >= ttl:
+                conn = get_conn()
+                out = {}
+                for t in tables:
+                    try:
+                        out[(t,)] = conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                    except sqlite3.OperationalError:
+                        continue  # table not created yet
+                cache["at"], cache["counts"] = now, out
+            return cache["counts"]
+    return Gauge("astrasync_db_rows", f"Rows per table, recounted at most every {ttl:g} s.", ["table"], counts)
+
+
+def init_app(app):
+    """Request counts/latency for every route of a Flask app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        t0 = g.pop("_metrics_t0", None)
+        # route pattern, not the raw path, so /history/<user_id> stays one series
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        if t0 is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint=endpoint, method=request.method)
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.inc(endpoint=endpoint, status=response.status_code)
+        return response
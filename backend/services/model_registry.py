@@ -0,0 +1,261 @@
+# backend/services/model_registry.py
+"""
+Versioned model sets with hot reload.
+
+export_models_to_backend.py publishes each export as a version:
+
+    models/registry/<version>/manifest.json   sha256, size and features per model
+    models/registry/<version>/*.pkl
+    models/registry/CURRENT                   the active version's name
+
+ModelRegistry holds one ModelStore for the active version. reload() checks
+the new version's pickles against the manifest, builds a fresh ModelStore,
+maps every model and runs a warm-up inference on it, and only then swaps
+it in with one assignment. Requests read `registry.store` once and keep
+that set until they finish, so an in-flight request never mixes versions.
+If anything fails, the old set stays in place.
+
+Reloads are triggered by:
+  - CURRENT changing on disk. Each worker checks it at most every
+    MODEL_RELOAD_CHECK_S seconds on a request and reloads in the
+    background, so activating a version reaches every gunicorn worker.
+  - POST /admin/models/reload.
+
+Not SIGHUP: gunicorn resets it to the default (terminate) in its workers.
+
+Without a registry (no CURRENT), the flat models/ directory is served as
+before, as version "unversioned".
+"""
+import hashlib, json, os, shutil, threading, time
+from datetime import datetime, timezone
+
+from services.model_store import ModelStore, _load_artifact
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+UNVERSIONED = "unversioned"
+RELOAD_CHECK_S = float(os.getenv("MODEL_RELOAD_CHECK_S", "5"))  # 0: only the admin endpoint
+
+
+class RegistryError(ValueError):
+    pass
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ---------------------------
+# On-disk versions
+# ---------------------------
+def versions(registry_dir: str) -> list[str]:
+    """Published versions, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(v for v in os.listdir(registry_dir) if os.path.exists(os.path.join(registry_dir, v, MANIFEST)))
+
+
+def current_version(registry_dir: str) -> str | None:
+    try:
+        with open(os.path.join(registry_dir, CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(registry_dir: str, version: str) -> dict:
+    try:
+        with open(os.path.join(registry_dir, version, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise RegistryError(f"no model version {version!r} in {registry_dir}")
+
+
+def verify(registry_dir: str, version: str) -> dict:
+    """The version's manifest, after checking every pickle's size and sha256 against it."""
+    manifest = read_manifest(registry_dir, version)
+    for name, m in manifest["models"].items():
+        path = os.path.join(registry_dir, version, m["file"])
+        if not os.path.exists(path):
+            raise RegistryError(f"{version}: {m['file']} is missing")
+        if os.path.getsize(path) != m["bytes"] or file_sha256(path) != m["sha256"]:
+            raise RegistryError(f"{version}: {m['file']} does not match its manifest checksum")
+    return manifest
+
+
+def _write_current(registry_dir: str, version: str):
+    # workers pick it up on their next check; only ModelRegistry.reload(...,
+    # make_current=True) calls this, once the version has loaded and warmed up
+    tmp = os.path.join(registry_dir, f"{CURRENT}.tmp-{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(registry_dir, CURRENT))
+
+
+def publish(src_dir: str, files: dict, registry_dir: str, version: str | None = None,
+            notes: dict | None = None) -> dict:
+    """
+    Copies {model name: pickle file} from src_dir (skipping missing ones)
+    into a new version with its manifest; returns the manifest. CURRENT is
+    left alone: make it current with ModelRegistry.reload(version, make_current=True).
+    """
+    version = version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise RegistryError(f"model version {version!r} already exists")
+    tmp = f"{target}.tmp-{os.getpid()}"
+    os.makedirs(tmp)
+    try:
+        models = {}
+        for name, file in files.items():
+            src = os.path.join(src_dir, file)
+            if not os.path.exists(src):
+                continue
+            dst = os.path.join(tmp, file)
+            shutil.copy2(src, dst)
+            models[name] = {"file": file, "bytes": os.path.getsize(dst), "sha256": file_sha256(dst),
+                            "features": list(_load_artifact(dst)["features"])}
+        manifest = {"version": version, "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "models": models, **({"notes": notes} if notes else {})}
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return manifest
+
+
+# ---------------------------
+# In-process model set
+# ---------------------------
+class ModelRegistry:
+    def __init__(self, registry_dir: str, legacy_dir: str, files: dict, cache_dir: str | None = None,
+                 warm_up=None, check_s: float = RELOAD_CHECK_S):
+        """
+        files: {model name: pickle file name}, as ModelStore
+        warm_up(store): runs inference on a new store, raising if it can't serve
+        """
+        self.registry_dir = registry_dir
+        self.legacy_dir = legacy_dir
+        self.files = files
+        self.cache_dir = cache_dir
+        self.warm_up = warm_up
+        self.check_s = check_s
+        self._reload_lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._failed = None  # version whose reload failed; not retried until CURRENT moves again
+        self.last_error = None
+        self.version = current_version(registry_dir)
+        self.manifest = None
+        if self.version:
+            try:
+                self.manifest = verify(registry_dir, self.version)
+            except RegistryError as e:
+                # serve the flat models/ directory rather than nothing
+                self.last_error, self._failed, self.version = str(e), self.version, None
+        self.loaded_at = time.time()
+        # lazy like before: the first set maps its models on first use (or preload())
+        self.store = self._store_for(self.version)
+
+    def _store_for(self, version: str | None) -> ModelStore:
+        if version is None:
+            return ModelStore(self.legacy_dir, self.files, cache_dir=self.cache_dir)
+        return ModelStore(os.path.join(self.registry_dir, version), self.files, cache_dir=self.cache_dir)
+
+    # the current set's ModelStore interface (one-off callers; a request that
+    # makes several calls should hold on to .store instead)
+    def available(self, name: str) -> bool:
+        return self.store.available(name)
+
+    def compact(self, name: str):
+        return self.store.compact(name)
+
+    def artifact(self, name: str):
+        return self.store.artifact(name)
+
+    def preload(self):
+        self.store.preload()
+
+    def load(self, version: str) -> tuple[ModelStore, dict]:
+        """
+        (store, manifest) for version, ready to serve: checksums verified,
+        every model mapped, features checked against the manifest and warmed
+        up. Raises whatever failed; nothing is swapped in.
+        """
+        manifest = verify(self.registry_dir, version)
+        store = self._store_for(version)
+        store.preload()
+        for name, m in manifest["models"].items():
+            if name in self.files and _features(store, name) != m["features"]:
+                raise RegistryError(f"{version}: {name} features differ from its manifest")
+        if self.warm_up is not None:
+            self.warm_up(store)
+        return store, manifest
+
+    def reload(self, version: str | None = None, make_current: bool = False) -> dict:
+        """
+        Loads version (default: CURRENT), warms it up and swaps it in.
+        make_current: then point CURRENT at it, so the other workers follow;
+        a version that fails here never becomes CURRENT. Raises RegistryError
+        (old set and CURRENT kept) if it can't be served.
+        """
+        with self._reload_lock:
+            version = version or current_version(self.registry_dir)
+            if version is None:
+                raise RegistryError(f"no CURRENT model version in {self.registry_dir}")
+            t0 = time.perf_counter()
+            try:
+                store, manifest = self.load(version)
+                if make_current:
+                    _write_current(self.registry_dir, version)
+            except Exception as e:
+                if not make_current:  # it never became CURRENT otherwise: nothing to skip
+                    self._failed = version
+                self.last_error = f"{version}: {e}"
+                raise RegistryError(self.last_error) from e
+            self.store, self.version, self.manifest = store, version, manifest
+            self.loaded_at = time.time()
+            self.last_error = self._failed = None
+            return {"version": version, "seconds": round(time.perf_counter() - t0, 3)}
+
+    def maybe_reload(self):
+        """Reloads in the background if CURRENT moved (checked at most every check_s)."""
+        now = time.monotonic()
+        if self.check_s <= 0 or now - self._checked < self.check_s:
+            return
+        self._checked = now
+        target = current_version(self.registry_dir)
+        if target and target not in (self.version, self._failed) and not self._reload_lock.locked():
+            threading.Thread(target=self._reload_quietly, args=(target,), name="model-reload", daemon=True).start()
+
+    def _reload_quietly(self, version: str | None = None):
+        try:
+            self.reload(version)
+        except RegistryError:
+            pass  # kept in last_error, shown by /models
+
+    def status(self) -> dict:
+        return {
+            "version": self.version or UNVERSIONED,
+            "current": current_version(self.registry_dir),
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat(timespec="seconds"),
+            "models": {n: {k: m[k] for k in ("file", "sha256", "features")}
+                       for n, m in (self.manifest or {}).get("models", {}).items()},
+            "last_error": self.last_error,
+        }
+
+    def memory_report(self) -> dict:
+        return {**self.store.memory_report(), "registry": self.status()}
+
+
+def _features(store: ModelStore, name: str) -> list | None:
+    compact = store.compact(name)
+    if compact is not None:
+        return list(compact.features)
+    art = store.artifact(name)
+    return list(art["features"]) if art else None
@@ -0,0 +1,143 @@
+# backend/services/model_store.py
+"""
+Lazy, memory-mapped model loading shared across gunicorn workers.
+
+Each model pickle in backend/models/ is compiled once into a CompactModel
+(services/compact_forest.py) and its arrays are written as plain .npy
+files under a cache directory keyed by the pickle's size + mtime. Workers
+np.load those with mmap_mode="r", so the tree arrays live in the OS page
+cache once per machine instead of once per worker, and nothing is read
+until a model is first used.
+"""
+import json, os, resource, shutil, threading
+import joblib
+import numpy as np
+
+from services.compact_forest import CompactModel, UnsupportedModel, ARRAY_FIELDS
+
+FORMAT_VERSION = 1
+
+
+class ModelStore:
+    def __init__(self, models_dir: str, files: dict, cache_dir: str | None = None):
+        """files: {model name: pickle file name in models_dir}"""
+        self.models_dir = models_dir
+        self.files = files
+        self.cache_dir = cache_dir or os.path.join(models_dir, ".compact")
+        self._lock = threading.Lock()
+        self._compact = {}
+        self._artifacts = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.models_dir, self.files[name])
+
+    def available(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    # ---------------------------
+    # Loading
+    # ---------------------------
+    def compact(self, name: str) -> CompactModel | None:
+        """Memory-mapped CompactModel, or None if missing/not compilable."""
+        if name not in self._compact:
+            with self._lock:
+                if name not in self._compact:
+                    self._compact[name] = self._load_compact(name) if self.available(name) else None
+        return self._compact[name]
+
+    def artifact(self, name: str) -> dict | None:
+        """The pickled {"model", "features"} artifact (sklearn path), loaded on first use."""
+        if name not in self._artifacts:
+            with self._lock:
+                if name not in self._artifacts:
+                    self._artifacts[name] = _load_artifact(self.path(name)) if self.available(name) else None
+        return self._artifacts[name]
+
+    def preload(self):
+        """Loads everything now, e.g. in the gunicorn master before forking."""
+        for name in self.files:
+            self.compact(name)
+
+    def _cache_path(self, name: str) -> str:
+        st = os.stat(self.path(name))
+        return os.path.join(self.cache_dir, f"{name}-v{FORMAT_VERSION}-{st.st_size}-{st.st_mtime_ns}")
+
+    def _load_compact(self, name: str) -> CompactModel | None:
+        target = self._cache_path(name)
+        meta_path = os.path.join(target, "meta.json")
+        if not os.path.exists(meta_path):
+            # compile-time load only; the pickle isn't kept, workers just map the arrays
+            art = _load_artifact(self.path(name))
+            try:
+                model = CompactModel.from_pipeline(art["model"], art["features"])
+                _write_cache(target, model.arrays(), model.meta())
+            except UnsupportedModel:
+                _write_cache(target, {}, {"unsupported": True})
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("unsupported"):
+            return None
+        arrays = {k: np.load(os.path.join(target, f"{k}.npy"), mmap_mode="r") for k in ARRAY_FIELDS}
+        return CompactModel.from_parts(meta, arrays)
+
+    # ---------------------------
+    # Introspection
+    # ---------------------------
+    def memory_report(self) -> dict:
+        loaded = {k: m for k, m in self._compact.items() if m is not None}
+        return {
+            "pid": os.getpid(),
+            "memory": process_memory(),
+            "models": {
+                name: {
+                    "available": self.available(name),
+                    "compact_loaded": name in loaded,
+                    "mapped_bytes": sum(a.nbytes for a in loaded[name].arrays().values()) if name in loaded else 0,
+                    "pickle_loaded": self._artifacts.get(name) is not None,
+                }
+                for name in self.files
+            },
+        }
+
+
+def _load_artifact(path: str) -> dict:
+    art = joblib.load(path)
+    # training scripts save {"model": pipeline, "features": [...]}
+    if not isinstance(art, dict):
+        art = {"model": art, "features": list(getattr(art, "feature_names_in_", []))}
+    return art
+
+
+def _write_cache(target: str, arrays: dict, meta: dict):
+    # write into a private dir, then rename: concurrent workers either see
+    # no cache or a complete one
+    tmp = f"{target}.tmp-{os.getpid()}-{threading.get_ident()}"
+    os.makedirs(tmp, exist_ok=True)
+    for k, a in arrays.items():
+        np.save(os.path.join(tmp, f"{k}.npy"), np.ascontiguousarray(a))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another worker got there first
+
+
+def process_memory() -> dict:
+    """
+    Resident memory of this process in bytes. rss_file counts mapped model
+    pages, which are shared with every other worker mapping the same files.
+    """
+    out = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem"):
+                    out[key] = int(rest.split()[0]) * 1024
+        out = {"rss": out.get("VmRSS"), "rss_anon": out.get("RssAnon"),
+               "rss_file": out.get("RssFile"), "rss_shmem": out.get("RssShmem")}
+    except OSError:
+        # non-Linux: only the peak is available (KiB on Linux, bytes on macOS)
+        out = {"max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return out
@@ -0,0 +1,79 @@
+# backend/services/result_cache.py
+"""
+Byte-bounded LRU cache for encoded /score responses.
+
+Keys carry the user's log_version and profile_version (user_versions
+table), which every save_log/save_logs/save_profile bumps in the same
+transaction as the write. A changed profile or a new log therefore
+produces a different key, so a stale result can never be served; old
+entries just age out of the LRU. Each process has its own cache; the
+versions live in the DB, so that stays correct across gunicorn workers.
+"""
+import hashlib, json, os, threading
+from collections import OrderedDict
+
+from services.metrics import Counter, Gauge
+
+SCORE_CACHE_BYTES = int(os.getenv("SCORE_CACHE_BYTES", str(32 * 1024 * 1024)))  # 0 disables
+ENTRY_OVERHEAD = 200  # bytes per entry for the key, tuple and dict slot, roughly
+
+LOOKUPS = Counter("astrasync_result_cache_total", "Result cache lookups and evictions.", ["cache", "result"])
+
+
+def entry_key(entry: dict) -> str:
+    """Stable hash of a request body (key order doesn't matter)."""
+    raw = json.dumps(entry, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()  # key -> bytes value
+        self._lock = threading.Lock()
+
+    def get(self, key) -> bytes | None:
+        if self.max_bytes <= 0:
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        LOOKUPS.inc(cache=self.name, result="hit" if value is not None else "miss")
+        return value
+
+    def put(self, key, value: bytes):
+        size = len(value) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old) + ENTRY_OVERHEAD
+            self._data[key] = value
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, v = self._data.popitem(last=False)
+                self.bytes -= len(v) + ENTRY_OVERHEAD
+                evicted += 1
+        if evicted:
+            LOOKUPS.inc(evicted, cache=self.name, result="eviction")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+SCORE_CACHE = LRUCache("score", SCORE_CACHE_BYTES)
+
+Gauge("astrasync_result_cache_bytes", "Approximate bytes held per result cache.", ["cache"],
+      lambda: {(SCORE_CACHE.name,): SCORE_CACHE.bytes})
+Gauge("astrasync_result_cache_entries", "Entries held per result cache.", ["cache"],
+      lambda: {(SCORE_CACHE.name,): len(SCORE_CACHE)})
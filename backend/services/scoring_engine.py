@@ -1,21 +1,24 @@
 # backend/services/scoring.py
-import os, joblib
+import os
 import numpy as np
 
+from ml.dual_baseline import safe_float
+from services.model_registry import ModelRegistry
+from services.metrics import stage
+
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # backend/
 MODELS_DIR = os.path.join(BASE_DIR, "models")
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY", os.path.join(MODELS_DIR, "registry"))
 
-def _load(name):
-    path = os.path.join(MODELS_DIR, name)
-    if not os.path.exists(path):
-        return None
-    return joblib.load(path)
+# "compact" walks the forests with NumPy (services/compact_forest.py);
+# "sklearn" calls the pickled pipelines' predict_proba directly.
+BACKEND = os.getenv("SCORING_BACKEND", "compact")
 
-MODELS = {
-    "heart": _load("heart_model.pkl"),
-    "sleep": _load("sleep_model.pkl"),
-    "kidney": _load("kidney_model.pkl"),
-    "spo2": _load("spo2_model.pkl"),
+MODEL_FILES = {
+    "heart": "heart_model.pkl",
+    "sleep": "sleep_model.pkl",
+    "kidney": "kidney_model.pkl",
+    "spo2": "spo2_model.pkl",
 }
 
 def _risk_from_proba(p_red: float):
@@ -31,73 +34,123 @@ def _model_score(risk):
 # Heart & BP = biggest acute risk; SpO2 next; Sleep affects risk but less acute; Kidney early warning but depends on labs
 WEIGHTS = {"heart": 0.40, "spo2": 0.25, "sleep": 0.20, "kidney": 0.15}
 
-def score_all(entry: dict):
-    # Build feature dict with safe defaults
-    x = {
-        "bp_sys": float(entry.get("bp_sys") or 0),
-        "bp_dia": float(entry.get("bp_dia") or 0),
-        "resting_hr": float(entry.get("resting_hr") or 0),
-        "spo2_avg": float(entry.get("spo2_avg") or 0),
-        "sleep_hours": float(entry.get("sleep_hours") or 0),
-        "steps": float(entry.get("steps") or 0),
-        "screen_time_min": float(entry.get("screen_time_min") or 0),
-        "water_ml": float(entry.get("water_ml") or 0),
-        "toilet_freq": float(entry.get("toilet_freq") or 0),
-        "alcohol": int(bool(entry.get("alcohol"))),
-        "smoking": int(bool(entry.get("smoking"))),
-    }
-
-    results = {}
-    reasons = []
-
-    # Heart model
-    if MODELS["heart"]:
-        feats = ["bp_sys","bp_dia","resting_hr","spo2_avg","steps","sleep_hours"]
-        X = np.array([[x[f] for f in feats]])
-        proba = MODELS["heart"].predict_proba(X)[0]
-        p_red = float(proba[-1])  # assumes classes ordered
-        risk = _risk_from_proba(p_red)
-        results["heart"] = {"risk": risk, "confidence": round(50 + p_red*50, 1)}
-        if risk != "Green": reasons.append("Heart/BP pattern elevated")
-    else:
-        results["heart"] = {"risk": "Unknown", "confidence": 0}
-
-    # Sleep model
-    if MODELS["sleep"]:
-        feats = ["sleep_hours","spo2_avg","resting_hr","screen_time_min"]
-        X = np.array([[x[f] for f in feats]])
-        proba = MODELS["sleep"].predict_proba(X)[0]
-        p_red = float(proba[-1])
-        risk = _risk_from_proba(p_red)
-        results["sleep"] = {"risk": risk, "confidence": round(50 + p_red*50, 1)}
-        if risk != "Green": reasons.append("Sleep/SpO₂ recovery risk")
-    else:
-        results["sleep"] = {"risk": "Unknown", "confidence": 0}
-
-    # Kidney model
-    if MODELS["kidney"]:
-        feats = ["water_ml","toilet_freq","bp_sys","bp_dia"]
-        X = np.array([[x[f] for f in feats]])
-        proba = MODELS["kidney"].predict_proba(X)[0]
-        p_red = float(proba[-1])
-        risk = _risk_from_proba(p_red)
-        results["kidney"] = {"risk": risk, "confidence": round(50 + p_red*50, 1)}
-        if risk != "Green": reasons.append("Hydration/toilet pattern unusual")
-    else:
-        results["kidney"] = {"risk": "Unknown", "confidence": 0}
-
-    # SpO2 model
-    if MODELS["spo2"]:
-        feats = ["spo2_avg","sleep_hours","resting_hr"]
-        X = np.array([[x[f] for f in feats]])
-        proba = MODELS["spo2"].predict_proba(X)[0]
-        p_red = float(proba[-1])
-        risk = _risk_from_proba(p_red)
-        results["spo2"] = {"risk": risk, "confidence": round(50 + p_red*50, 1)}
-        if risk != "Green": reasons.append("Oxygen dips risk")
-    else:
-        results["spo2"] = {"risk": "Unknown", "confidence": 0}
+# (model, reason shown when it is not Green), in reason priority order
+COMPONENTS = [
+    ("heart", "Heart/BP pattern elevated"),
+    ("sleep", "Sleep/SpO₂ recovery risk"),
+    ("kidney", "Hydration/toilet pattern unusual"),
+    ("spo2", "Oxygen dips risk"),
+]
+
+# model feature -> entry/profile keys it is read from (first present wins)
+FEATURE_SOURCES = {
+    "Age": ["age"],
+    "Smoking": ["smoking"],
+    "AlcoholConsumption": ["alcohol"],
+    "weight_kg": ["weight_kg", "weight"],
+    "gender": ["gender", "sex"],
+}
+CATEGORICAL = {"gender"}
 
+def _gender(x):
+    # same buckets as ml_training/utils_columns.standardize_gender
+    if x is None or (isinstance(x, str) and not x.strip()):
+        return None
+    s = str(x).strip().lower()
+    if s in ["m", "male", "man", "1"]: return "Male"
+    if s in ["f", "female", "woman", "0"]: return "Female"
+    return "Unknown"
+
+def _raw_value(row: dict, feat: str):
+    if feat == "height_m":
+        h = safe_float(row.get("height_m"))
+        if h is None:
+            cm = safe_float(row.get("height"))
+            h = cm / 100.0 if cm is not None else None
+        return h
+    for key in FEATURE_SOURCES.get(feat, [feat]):
+        if row.get(key) is not None:
+            return _gender(row[key]) if feat in CATEGORICAL else safe_float(row[key])
+    return None
+
+def _feature_table(rows, names):
+    """One pass over the rows: numeric matrix (NaN = missing) + categorical values."""
+    num_names = [f for f in names if f not in CATEGORICAL]
+    cat_names = [f for f in names if f in CATEGORICAL]
+    num = np.array(
+        [[_raw_value(r, f) for f in num_names] for r in rows], dtype=float
+    ).reshape(len(rows), len(num_names))
+    cat = [[_raw_value(r, f) for f in cat_names] for r in rows]
+    return num, {f: i for i, f in enumerate(num_names)}, cat, {f: i for i, f in enumerate(cat_names)}
+
+def _compact(store, name):
+    return store.compact(name) if BACKEND == "compact" else None
+
+def _features(store, name):
+    compact = _compact(store, name)
+    if compact is not None:
+        return compact.features
+    art = store.artifact(name)
+    return art["features"] if art else []
+
+def _p_red(store, name, num, num_idx, cat, cat_idx):
+    compact = _compact(store, name)
+    if compact is not None:
+        X = compact.transform(
+            num[:, [num_idx[c] for c in compact.num_cols]],
+            [[row[cat_idx[c]] for c in compact.cat_cols] for row in cat],
+        )
+        return compact.predict_proba(X)[:, -1]
+
+    art = store.artifact(name)
+    import pandas as pd  # sklearn path needs named columns for the ColumnTransformer
+    df = pd.DataFrame({
+        f: ([np.nan if row[cat_idx[f]] is None else row[cat_idx[f]] for row in cat]
+            if f in cat_idx else num[:, num_idx[f]])
+        for f in art["features"]
+    })
+    return art["model"].predict_proba(df)[:, -1]  # assumes classes ordered
+
+def score_all_batch(entries: list, profiles: list | None = None, store=None) -> list:
+    """
+    Scores N entries with every model in one predict call per model.
+    profiles (optional, aligned with entries) supply age/gender/height/weight;
+    features missing from both are left to the pipelines' imputers.
+    store: the model set to use (default: MODELS' current one, read once so a
+    reload mid-request doesn't mix versions).
+    """
+    store = store or MODELS.store
+    rows = [{**(profiles[i] if profiles else {}), **e} for i, e in enumerate(entries)]
+    names = sorted({f for k, _ in COMPONENTS for f in _features(store, k)})
+    num, num_idx, cat, cat_idx = _feature_table(rows, names)
+
+    p_red = {}
+    for k, _ in COMPONENTS:
+        if not store.available(k):
+            p_red[k] = None
+            continue
+        with stage(f"model.{k}"):
+            p_red[k] = _p_red(store, k, num, num_idx, cat, cat_idx)
+
+    out = []
+    for i in range(len(entries)):
+        results = {}
+        reasons = []
+        for k, reason in COMPONENTS:
+            if p_red[k] is None:
+                results[k] = {"risk": "Unknown", "confidence": 0}
+                continue
+            p = float(p_red[k][i])
+            risk = _risk_from_proba(p)
+            results[k] = {"risk": risk, "confidence": round(50 + p*50, 1)}
+            if risk != "Green": reasons.append(reason)
+        out.append(_summarize(results, reasons))
+    return out
+
+def score_all(entry: dict, profile: dict | None = None):
+    return score_all_batch([entry], [profile or {}])[0]
+
+def _summarize(results: dict, reasons: list) -> dict:
     # Final score (0–100)
     # Convert each risk to points 0/1/2, weighted → 0..2
     total = 0.0
@@ -130,4 +183,17 @@ def score_all(entry: dict):
         "components": results,
         "reasons": reasons[:3],
         "next_steps": next_steps[:3],
-    }
\ No newline at end of file
+    }
+
+# ---------------------------
+# Model set (see services/model_registry.py)
+# ---------------------------
+def warm_up(store):
+    # one empty entry through every available model: maps the arrays / loads
+    # the pickles and runs each predict path before the set is swapped in
+    score_all_batch([{}], [{}], store=store)
+
+# versions from models/registry/ (flat models/ without one), loaded lazily on
+# first use and memory-mapped from <version>/.compact/
+MODELS = ModelRegistry(REGISTRY_DIR, MODELS_DIR, MODEL_FILES,
+                       cache_dir=os.getenv("MODEL_CACHE_DIR"), warm_up=warm_up)
@@ -0,0 +1,115 @@
+# backend/services/token_cache.py
+"""
+Per-process cache of OAuth tokens in front of user_tokens.
+
+Access tokens are served from memory and refreshed REFRESH_SKEW seconds
+before they expire. Concurrent callers that need a refresh for the same
+user share one in-flight refresh_fn call (single flight): one thread
+refreshes and writes the new token back once, the rest wait for its
+result. Each gunicorn worker has its own cache, so at most one refresh
+per user per worker is in flight.
+
+Another worker (or a re-authorization) may have replaced the tokens in
+the meantime, so the leader re-reads user_tokens first and only calls
+refresh_fn if the stored token is stale too. A failed refresh drops the
+user from the cache: the next call starts again from user_tokens instead
+of retrying the same dead refresh token.
+"""
+import os, threading, time
+from concurrent.futures import Future
+
+from services.db_service import get_db_connection, get_tokens, save_tokens
+from services.metrics import Counter
+
+REFRESH_SKEW = int(os.getenv("TOKEN_REFRESH_SKEW", "60"))  # seconds before expires_at
+
+LOOKUPS = Counter("astrasync_token_cache_total", "Token cache lookups by outcome.", ["provider", "result"])
+
+
+class NotConnected(LookupError):
+    pass
+
+
+class TokenCache:
+    def __init__(self, provider: str, refresh_fn, skew: int = REFRESH_SKEW):
+        """refresh_fn(refresh_token) -> {"access_token", "expires_in"[, "refresh_token"]}"""
+        self.provider = provider
+        self.refresh_fn = refresh_fn
+        self.skew = skew
+        self._tokens = {}    # user_id -> (access_token, refresh_token, expires_at)
+        self._inflight = {}  # user_id -> Future of the refreshed tuple
+        self._lock = threading.Lock()
+
+    def access_token(self, user_id: str) -> str:
+        """A valid access token for user_id; raises NotConnected if there is none."""
+        tokens = self._tokens.get(user_id)
+        if tokens is None:
+            LOOKUPS.inc(provider=self.provider, result="miss")
+            row = get_tokens(get_db_connection(), user_id, self.provider)
+            if not row:
+                raise NotConnected(f"{self.provider} not connected for {user_id}")
+            tokens = self._tokens.setdefault(user_id, tuple(row))
+        if time.time() < tokens[2] - self.skew:
+            LOOKUPS.inc(provider=self.provider, result="hit")
+            return tokens[0]
+        return self._refresh(user_id, tokens)[0]
+
+    def _refresh(self, user_id: str, stale: tuple) -> tuple:
+        with self._lock:
+            current = self._tokens.get(user_id, stale)
+            if current is not stale and time.time() < current[2] - self.skew:
+                return current  # refreshed while we waited for the lock
+            flight = self._inflight.get(user_id)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[user_id] = Future()
+        if not leader:
+            LOOKUPS.inc(provider=self.provider, result="refresh_wait")
+            return flight.result()
+
+        try:
+            row = get_tokens(get_db_connection(), user_id, self.provider)
+            if not row:
+                raise NotConnected(f"{self.provider} not connected for {user_id}")
+            stored = tuple(row)
+            if time.time() < stored[2] - self.skew:
+                LOOKUPS.inc(provider=self.provider, result="refreshed_elsewhere")
+                tokens = self._tokens[user_id] = stored
+            else:
+                LOOKUPS.inc(provider=self.provider, result="refresh")
+                refresh = stored[1]
+                new = self.refresh_fn(refresh)
+                tokens = self.put(user_id, new["access_token"], new.get("refresh_token") or refresh,
+                                  new["expires_in"])
+            flight.set_result(tokens)
+            return tokens
+        except BaseException as e:
+            self.invalidate(user_id)
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+
+    def put(self, user_id: str, access_token: str, refresh_token: str, expires_in: int) -> tuple:
+        """Writes tokens through to user_tokens and the cache."""
+        save_tokens(get_db_connection(), user_id, self.provider, access_token, refresh_token, expires_in)
+        tokens = (access_token, refresh_token, int(time.time()) + expires_in)
+        self._tokens[user_id] = tokens
+        return tokens
+
+    def prime(self, rows):
+        """
+        Loads (user_id, access_token, refresh_token, expires_at) rows, e.g.
+        get_all_tokens; a row replaces a cached entry that expires sooner.
+        """
+        for user_id, access, refresh, expires_at in rows:
+            cached = self._tokens.get(user_id)
+            if cached is None or expires_at > cached[2]:
+                self._tokens[user_id] = (access, refresh, expires_at)
+
+    def invalidate(self, user_id: str | None = None):
+        if user_id is None:
+            self._tokens.clear()
+        else:
+            self._tokens.pop(user_id, None)
@@ -0,0 +1,18 @@
+# backend/tests/conftest.py
+import os, tempfile
+from contextlib import closing
+
+import pytest
+
+# read at import by services.db_service / services.jobs: keep tests off the
+# real DB and the job runner threads off
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="astrasync-tests-"), "app.db"))
+os.environ.setdefault("JOB_WORKERS", "0")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def app_db():
+    """The DB_PATH database, created once (as app.py does at import)."""
+    from services.db_service import get_conn, init_db
+    with closing(get_conn()) as conn:
+        init_db(conn)
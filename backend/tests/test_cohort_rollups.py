@@ -0,0 +1,62 @@
+# backend/tests/test_cohort_rollups.py  (run from backend/: python -m pytest tests)
+import json, threading, time
+
+from ml.dual_baseline import cohort
+from services.cohort_rollups import summarize
+from services.db_service import get_conn, init_db, migrate, save_log, save_logs, save_profile
+
+
+def _legacy_db(path):
+    # a profile stored before cohorts were computed on writes, with an age
+    # the baseline code never rejected
+    conn = get_conn(path)
+    init_db(conn)
+    conn.execute("INSERT INTO profiles (user_id, payload) VALUES (?,?)",
+                 ("u1", json.dumps({"age": "abc", "height": 170, "weight": 70})))
+    conn.execute("INSERT INTO logs (user_id, date, payload, bp_sys) VALUES (?,?,?,?)",
+                 ("u1", "2025-01-01", json.dumps({"bp_sys": 120}), 120))
+    conn.commit()
+    return conn
+
+
+def test_cohort_of_unparseable_age_is_unknown():
+    assert cohort({"age": "abc"})[0] == "unknown"
+    assert cohort({"age": "45.5"})[0] == "45_59"
+    assert cohort({"age": "inf"})[0] == "unknown"
+
+
+def test_legacy_profile_with_bad_age(tmp_path):
+    conn = _legacy_db(str(tmp_path / "legacy.db"))
+
+    # the rollup backfill migration runs over it
+    conn.execute("PRAGMA user_version = 1")
+    migrate(conn)
+
+    # and every write path still works for that user
+    save_log(conn, "u1", "2025-01-02", {"bp_sys": 130})
+    save_logs(conn, [("u1", "2025-01-03", {"bp_sys": 140})])
+    save_profile(conn, "u1", {"age": "45.5", "height": 170, "weight": 70})
+
+    cohorts = {(c["age_group"], c["bmi_band"]): c["metrics"]["bp_sys"]["n"]
+               for c in summarize(conn, ["bp_sys"])}
+    assert cohorts == {("45_59", "normal"): 3}
+
+
+def test_profile_change_waits_for_concurrent_log_write(tmp_path):
+    path = str(tmp_path / "race.db")
+    conn = get_conn(path)
+    init_db(conn)
+    save_profile(conn, "u1", {"age": 25})
+
+    # another worker is mid-way through writing a log for u1 (old cohort)
+    other = get_conn(path)
+    save_logs(other, [("u1", "2025-01-01", {"bp_sys": 120})], commit=False)
+
+    moved = threading.Thread(target=lambda: save_profile(get_conn(path), "u1", {"age": 50}))
+    moved.start()
+    time.sleep(0.2)  # the profile write is now waiting for the lock
+    other.commit()
+    moved.join()
+
+    cohorts = {c["age_group"]: c["metrics"]["bp_sys"]["n"] for c in summarize(conn, ["bp_sys"])}
+    assert cohorts == {"45_59": 1}
@@ -0,0 +1,76 @@
+# backend/tests/test_compact_forest.py  (run from backend/: python -m pytest tests)
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from services.compact_forest import CompactModel, UnsupportedModel
+
+NUM = ["age", "bp_sys", "resting_hr", "never_measured"]
+CAT = ["sex", "smoker"]
+
+
+def _frame(rng, n):
+    X = pd.DataFrame({
+        "age": rng.uniform(18, 90, n),
+        "bp_sys": rng.normal(130, 20, n),
+        "resting_hr": rng.normal(72, 10, n),
+        "never_measured": np.nan,  # dropped by the imputer
+        "sex": rng.choice(["F", "M"], n).astype(object),
+        "smoker": rng.choice(["no", "yes", "former"], n).astype(object),
+    })
+    for col in ["age", "bp_sys", "resting_hr", "sex", "smoker"]:
+        X.loc[rng.random(n) < 0.15, col] = np.nan
+    return X
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    # the training scripts' pipeline shape, fitted in-process
+    rng = np.random.default_rng(7)
+    X = _frame(rng, 600)
+    y = np.where(X["bp_sys"].fillna(130) + rng.normal(0, 10, len(X)) > 140, "Red",
+                 np.where(X["resting_hr"].fillna(72) > 75, "Yellow", "Green"))
+    pre = ColumnTransformer([
+        ("num", Pipeline([("imp", SimpleImputer(strategy="median"))]), NUM),
+        ("cat", Pipeline([("imp", SimpleImputer(strategy="most_frequent")),
+                          ("oh", OneHotEncoder(handle_unknown="ignore"))]), CAT),
+    ])
+    clf = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0)
+    pipe = Pipeline([("pre", pre), ("clf", clf)]).fit(X, y)
+    return pipe, NUM + CAT
+
+
+def _compact_proba(compact, X):
+    num = X[compact.num_cols].to_numpy(dtype=float)
+    cat = [[None if v != v else v for v in row] for row in X[compact.cat_cols].itertuples(index=False)]
+    return compact.predict_proba(compact.transform(num, cat))
+
+
+def test_matches_sklearn_with_missing_values_and_unseen_categories(fitted):
+    pipe, features = fitted
+    compact = CompactModel.from_pipeline(pipe, features)
+    X = _frame(np.random.default_rng(11), 300)
+    X.loc[::7, "sex"] = "X"         # not seen in training
+    X.loc[::5, "smoker"] = "vapes"  # not seen in training
+    X.loc[::9, ["age", "bp_sys", "resting_hr"]] = np.nan
+    assert compact.classes == list(pipe.classes_)
+    np.testing.assert_allclose(_compact_proba(compact, X), pipe.predict_proba(X[features]), atol=1e-12)
+
+
+def test_flat_arrays_round_trip(fitted):
+    pipe, features = fitted
+    compact = CompactModel.from_pipeline(pipe, features)
+    loaded = CompactModel.from_parts(compact.meta(), compact.arrays())
+    X = _frame(np.random.default_rng(3), 50)
+    np.testing.assert_array_equal(_compact_proba(loaded, X), _compact_proba(compact, X))
+
+
+def test_rejects_other_pipelines(fitted):
+    pipe, _ = fitted
+    with pytest.raises(UnsupportedModel):
+        CompactModel.from_pipeline(pipe.named_steps["clf"], NUM + CAT)
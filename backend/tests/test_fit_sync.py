@@ -0,0 +1,145 @@
+# backend/tests/test_fit_sync.py  (run from backend/: python -m pytest tests)
+import threading
+
+import pytest
+import requests
+
+from bench.fit_stub import FitStub, aggregate_response
+from services import fit_sync, google_fit_service
+from services.db_service import (
+    get_db_connection, get_logs, get_baseline, get_sync_cursor, save_log, save_tokens
+)
+
+AGGREGATE = "/users/me/dataset:aggregate"
+DAY_MS = fit_sync.DAY_MS
+
+
+@pytest.fixture
+def fit_stub(monkeypatch):
+    """Starts a FitStub(**kwargs) that google_fit_service talks to, with no backoff sleeps."""
+    stubs = []
+
+    def start(pool_size=google_fit_service.POOL_SIZE, **kwargs):
+        stub = FitStub(**kwargs).__enter__()
+        stubs.append(stub)
+        monkeypatch.setattr(google_fit_service, "FIT_API_BASE", stub.url)
+        monkeypatch.setattr(google_fit_service, "TOKEN_URL", stub.url + "/token")
+        monkeypatch.setattr(google_fit_service, "BACKOFF", 0)
+        monkeypatch.setattr(google_fit_service, "POOL_SIZE", pool_size)
+        monkeypatch.setattr(google_fit_service, "_sessions", {})  # rebuilt with the settings above
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.__exit__(None, None, None)
+
+
+def test_bucket_entry_maps_a_daily_bucket():
+    bucket = {"startTimeMillis": str(3 * DAY_MS), "dataset": [
+        {"dataSourceId": "derived:com.google.step_count.delta:aggregated",
+         "point": [{"value": [{"intVal": 1200}]}, {"value": [{"intVal": 800}]}]},
+        {"dataSourceId": "derived:com.google.heart_rate.summary:aggregated",
+         "point": [{"value": [{"fpVal": 71.26}, {"fpVal": 140.0}, {"fpVal": 52.04}]}]},
+        {"dataSourceId": "derived:com.google.calories.expended:aggregated",
+         "point": [{"value": [{"fpVal": 1000.04}]}, {"value": [{"fpVal": 900.0}]}]},
+    ]}
+    assert fit_sync.bucket_entry(bucket) == {
+        "date": "1970-01-04", "source": "google_fit", "steps": 2000,
+        "avg_hr": 71.3, "min_hr": 52.0, "calories_kcal": 1900.0,
+    }
+
+
+def test_bucket_entry_skips_empty_days_and_partial_heart_rate():
+    empty = {"startTimeMillis": "0", "dataset": [
+        {"dataSourceId": "derived:com.google.step_count.delta:aggregated", "point": []},
+        {"dataSourceId": "derived:com.google.heart_rate.summary:aggregated",
+         "point": [{"value": [{"fpVal": 70.0}]}]},
+    ]}
+    assert fit_sync.bucket_entry(empty) is None
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_aggregate_retries_throttling_and_server_errors(fit_stub, status):
+    stub = fit_stub(script={AGGREGATE: [status, status]})
+    data = google_fit_service.fetch_aggregated_data("tok", 0, 2 * DAY_MS)
+    assert len(data["bucket"]) == 2
+    assert stub.paths[AGGREGATE] == 3
+
+
+def test_aggregate_gives_up_after_retries(fit_stub):
+    stub = fit_stub(script={AGGREGATE: [503] * 10})
+    with pytest.raises(requests.HTTPError):
+        google_fit_service.fetch_aggregated_data("tok", 0, DAY_MS)
+    assert stub.paths[AGGREGATE] == google_fit_service.RETRIES + 1
+
+
+def test_refresh_token_post_is_retried(fit_stub):
+    stub = fit_stub(script={"/token": [503]})
+    assert google_fit_service.refresh_access_token("r")["access_token"]
+    assert stub.paths["/token"] == 2
+
+
+def test_code_exchange_is_not_retried(fit_stub):
+    # a code is redeemable once: a retry would fail with invalid_grant and hide the outcome
+    stub = fit_stub(script={"/token": [503]})
+    assert google_fit_service.exchange_code_for_tokens("code") == {"error": {"code": 503}}
+    assert stub.paths["/token"] == 1
+
+
+def test_concurrent_requests_per_host_are_capped(fit_stub):
+    stub = fit_stub(pool_size=2, latency=0.05)
+    threads = [threading.Thread(target=google_fit_service.fetch_aggregated_data, args=("tok", 0, DAY_MS))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stub.paths[AGGREGATE] == 8
+    assert stub.peak_in_flight <= 2
+
+
+def test_sync_all_advances_the_cursor_chunk_by_chunk(fit_stub, monkeypatch):
+    monkeypatch.setattr(fit_sync, "BACKFILL_DAYS", 20)
+    monkeypatch.setattr(fit_sync, "CHUNK_DAYS", 7)
+    # first chunk answers, the second keeps failing past the retries
+    stub = fit_stub(script={AGGREGATE: [200] + [503] * (google_fit_service.RETRIES + 1)})
+    conn = get_db_connection()
+    save_tokens(conn, "fit_cursor_u", fit_sync.PROVIDER, "tok", "ref", 3600)
+
+    report = fit_sync.sync_all(workers=2, user_ids=["fit_cursor_u"])
+    assert (report.ok, report.failed, report.days) == (0, 1, 0)
+    first = get_sync_cursor(conn, "fit_cursor_u", fit_sync.PROVIDER)
+    assert first is not None
+    assert len(get_logs(conn, "fit_cursor_u", limit=100)) == 7  # the first chunk stayed written
+
+    report = fit_sync.sync_all(workers=2, user_ids=["fit_cursor_u"])
+    assert (report.ok, report.days, report.requests) == (1, 13, 2)  # 7 + 6 days from the cursor on
+    end = get_sync_cursor(conn, "fit_cursor_u", fit_sync.PROVIDER)
+    assert end - first == 13 * DAY_MS and end % DAY_MS == 0
+    assert len(get_logs(conn, "fit_cursor_u", limit=100)) == 20
+
+    before = stub.paths[AGGREGATE]
+    assert fit_sync.sync_all(workers=2, user_ids=["fit_cursor_u"]).requests == 0
+    assert stub.paths[AGGREGATE] == before
+
+
+def test_sync_merges_fit_days_into_logged_days(fit_stub, monkeypatch):
+    monkeypatch.setattr(fit_sync, "BACKFILL_DAYS", 3)
+    fit_stub()
+    conn = get_db_connection()
+    now_ms = 20000 * DAY_MS + 3600 * 1000
+    dates = [fit_sync.bucket_entry(b)["date"]
+             for b in aggregate_response("tok", (20000 - 3) * DAY_MS, 20000 * DAY_MS)["bucket"]]
+    manual = {"user_id": "fit_merge_u", "date": dates[1], "steps": 4321, "resting_hr": 61}
+    save_log(conn, "fit_merge_u", dates[1], manual)
+    save_tokens(conn, "fit_merge_u", fit_sync.PROVIDER, "tok", "ref", 3600)
+
+    done = fit_sync.sync_user("fit_merge_u", now_ms=now_ms)
+    assert done["days"] == 3
+    logs = get_logs(conn, "fit_merge_u", limit=100)
+    assert sorted(log["date"] for log in logs) == dates  # one log per date
+    merged = next(log for log in logs if log["date"] == dates[1])
+    assert merged["steps"] == 4321 and merged["resting_hr"] == 61  # the logged values win
+    assert "min_hr" in merged and "avg_hr" in merged and "source" not in merged
+    assert all("resting_hr" not in log for log in logs if log["date"] != dates[1])
+    assert get_baseline(conn, "fit_merge_u").days == 3
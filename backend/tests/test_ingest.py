@@ -0,0 +1,58 @@
+# backend/tests/test_ingest.py  (run from backend/: python -m pytest tests)
+import json, threading, time
+
+from app import app
+from services.db_service import get_conn, get_logs, save_log
+
+
+class SlowBody:
+    """A request body whose second half only arrives once `release` is set."""
+
+    def __init__(self, data: bytes, release: threading.Event):
+        self.data, self.pos, self.release = data, 0, release
+        self.waiting = threading.Event()
+
+    def read(self, n=-1):
+        half = len(self.data) // 2
+        if self.pos >= half:
+            self.waiting.set()
+            self.release.wait(10)
+        end = len(self.data) if self.pos >= half else half
+        chunk = self.data[self.pos:end if n is None or n < 0 else min(end, self.pos + n)]
+        self.pos += len(chunk)
+        return chunk
+
+    readline = read
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=0):  # the test client measures the body
+        self.pos = {0: pos, 1: self.pos + pos, 2: len(self.data) + pos}[whence]
+        return self.pos
+
+
+def test_slow_bulk_upload_does_not_block_save_log():
+    rows = [{"user_id": "bulk_u", "date": f"2025-02-{d:02d}", "sleep_hours": 7} for d in range(1, 29)]
+    data = "\n".join(json.dumps(r) for r in rows).encode()
+    release = threading.Event()
+    body = SlowBody(data, release)
+    result = {}
+
+    def upload():
+        result["resp"] = app.test_client().post(
+            "/submit_data/bulk", input_stream=body, content_type="application/x-ndjson")
+
+    t = threading.Thread(target=upload)
+    t.start()
+    try:
+        assert body.waiting.wait(5), "upload never started"
+        conn = get_conn()
+        t0 = time.perf_counter()
+        save_log(conn, "other_u", "2025-02-01", {"sleep_hours": 6})  # mid-upload
+        assert time.perf_counter() - t0 < 1.0
+    finally:
+        release.set()
+        t.join(10)
+    assert result["resp"].get_json()["accepted"] == len(rows)
+    assert len(get_logs(conn, "bulk_u", limit=100)) == len(rows)
@@ -0,0 +1,54 @@
+# backend/tests/test_jobs.py  (run from backend/: python -m pytest tests)
+import pytest
+
+from app import app
+from services import jobs
+from services.db_service import get_conn, init_db
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = get_conn(str(tmp_path / "jobs.db"))
+    init_db(conn)
+    return conn
+
+
+def _expire_leases(conn):
+    conn.execute("UPDATE jobs SET lease_until=0 WHERE status='running'")
+    conn.commit()
+
+
+def test_job_that_loses_its_worker_every_time_fails(conn):
+    job_id = jobs.submit(conn, "migrate", max_attempts=2)
+    for _ in range(2):
+        assert jobs.claim(conn, "crashes")[0] == job_id
+        _expire_leases(conn)
+    assert jobs.claim(conn, "next") is None
+    job = jobs.get_job(conn, job_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert "lease expired" in job["error"]
+
+
+def test_finish_after_losing_the_lease_is_ignored(conn):
+    job_id = jobs.submit(conn, "migrate")
+    jobs.claim(conn, "slow")
+    _expire_leases(conn)
+    assert jobs.claim(conn, "fresh")[0] == job_id
+    assert not jobs.finish(conn, job_id, "slow", error="late")
+    assert jobs.get_job(conn, job_id)["status"] == "running"
+    assert jobs.finish(conn, job_id, "fresh", result={"ok": 1})
+    assert jobs.get_job(conn, job_id)["result"] == {"ok": 1}
+
+
+@pytest.mark.parametrize("params", [{}, {"user_id": 5}, {"user_id": "u", "limit": "all"}, {"user": "u"}])
+def test_submit_rejects_bad_params(params):
+    resp = app.test_client().post("/jobs", json={"kind": "rescore_history", "params": params})
+    assert resp.status_code == 400
+    assert not resp.get_json()["ok"]
+
+
+def test_jobs_limit_is_at_least_one():
+    client = app.test_client()
+    client.post("/jobs", json={"kind": "migrate"})
+    client.post("/jobs", json={"kind": "migrate"})
+    assert len(client.get("/jobs?limit=-1").get_json()["jobs"]) == 1
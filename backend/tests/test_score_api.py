@@ -0,0 +1,23 @@
+# backend/tests/test_score_api.py  (run from backend/: python -m pytest tests)
+import pytest
+
+from app import app
+
+
+@pytest.mark.parametrize("path,body", [
+    ("/score", {"user_id": ["a"], "bp_sys": 120}),
+    ("/score/batch", {"entries": [{"user_id": "a"}, {"user_id": {"id": "b"}}]}),
+    ("/score/batch", [{"user_id": 7}]),
+    ("/score/models", {"user_id": ["a"], "bp_sys": 120}),
+    ("/score/models", {"entries": [{"user_id": None}]}),
+])
+def test_non_string_user_id_is_a_bad_request(path, body):
+    resp = app.test_client().post(path, json=body)
+    assert resp.status_code == 400
+    assert resp.get_json() == {"ok": False, "error": "user_id must be a string"}
+
+
+def test_batch_without_user_ids_scores_as_demo_user():
+    resp = app.test_client().post("/score/batch", json={"entries": [{"bp_sys": 120}, {"spo2_avg": 97}]})
+    assert resp.status_code == 200
+    assert len(resp.get_json()["results"]) == 2
@@ -0,0 +1,75 @@
+# backend/tests/test_token_cache.py  (run from backend/: python -m pytest tests)
+import threading, time
+
+import pytest
+
+from services.db_service import get_db_connection, get_tokens, save_tokens
+from services.token_cache import NotConnected, TokenCache
+
+
+class Refresher:
+    """refresh_fn that counts calls, takes a while and fails for refresh token "dead"."""
+
+    def __init__(self, delay=0.05):
+        self.calls, self.delay = [], delay
+
+    def __call__(self, refresh_token):
+        self.calls.append(refresh_token)
+        time.sleep(self.delay)
+        if refresh_token == "dead":
+            raise RuntimeError("invalid_grant")
+        return {"access_token": f"new-{refresh_token}", "expires_in": 3600}
+
+
+@pytest.fixture
+def conn():
+    return get_db_connection()
+
+
+def test_concurrent_refreshes_share_one_call(conn):
+    refresh = Refresher(delay=0.2)
+    cache = TokenCache("test_flight", refresh)
+    save_tokens(conn, "u", "test_flight", "old", "r1", -10)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.access_token("u"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert out == ["new-r1"] * 8
+    assert refresh.calls == ["r1"]
+    assert get_tokens(conn, "u", "test_flight")[0] == "new-r1"  # written through once
+
+
+def test_failed_refresh_is_not_cached(conn):
+    refresh = Refresher()
+    cache = TokenCache("test_fail", refresh)
+    save_tokens(conn, "u", "test_fail", "old", "dead", -10)
+    with pytest.raises(RuntimeError):
+        cache.access_token("u")
+    # the user re-authorized through another worker
+    save_tokens(conn, "u", "test_fail", "fresh", "r2", 3600)
+    assert cache.access_token("u") == "fresh"
+    assert refresh.calls == ["dead"]
+
+
+def test_refresh_rereads_tokens_refreshed_elsewhere(conn):
+    refresh = Refresher()
+    cache = TokenCache("test_reread", refresh)
+    save_tokens(conn, "u", "test_reread", "stale", "r1", -10)
+    assert cache.access_token("u") == "new-r1"
+    cache._tokens["u"] = ("stale", "r1", 0)  # another worker refreshed since
+    assert cache.access_token("u") == "new-r1"
+    assert refresh.calls == ["r1"]
+
+
+def test_not_connected(conn):
+    with pytest.raises(NotConnected):
+        TokenCache("test_none", Refresher()).access_token("nobody")
+
+
+def test_prime_keeps_the_newest_tokens():
+    cache = TokenCache("test_prime", Refresher())
+    cache._tokens.update({"v": ("v-old", "r", 100), "w": ("w-new", "r", 10 ** 10)})
+    cache.prime([("v", "v-new", "r", 200), ("w", "w-old", "r", 5), ("x", "x", "r", 1)])
+    assert {u: t[0] for u, t in cache._tokens.items()} == {"v": "v-new", "w": "w-new", "x": "x"}
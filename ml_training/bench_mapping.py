@@ -0,0 +1,143 @@
+"""
+Declarative (utils_columns) vs row-wise column mapping on synthetic raw
+frames (from ml_training/):
+
+    python bench_mapping.py --rows 2000000
+
+The row-wise mappers below are the previous utils_columns implementation,
+kept as the reference: per-row standardize_gender / parse_bp_text callbacks
+through .map / .apply. Reports seconds per mapper for each (best of
+--repeat) and checks both produce the same frame.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils_columns import (map_human_vitals, map_sleep_lifestyle, map_wearable_spo2,
+                           parse_bp_text, standardize_gender)
+
+GENDERS = np.array(["Male", "Female", "male", "F", " m ", "woman", "other", "1", "0"], dtype=object)
+DISORDERS = np.array(["None", "Insomnia", "Sleep Apnea"], dtype=object)
+
+
+# ---------------------------
+# Row-wise reference
+# ---------------------------
+def rowwise_human_vitals(df):
+    out = pd.DataFrame()
+    out["age"] = pd.to_numeric(df.get("Age"), errors="coerce")
+    out["gender"] = df.get("Gender").map(standardize_gender) if "Gender" in df.columns else "Unknown"
+    if "Height (m)" in df.columns:
+        out["height_m"] = pd.to_numeric(df["Height (m)"], errors="coerce")
+    elif "Height (cm)" in df.columns:
+        out["height_m"] = pd.to_numeric(df["Height (cm)"], errors="coerce") / 100.0
+    else:
+        out["height_m"] = np.nan
+    out["weight_kg"] = pd.to_numeric(df["Weight (kg)"], errors="coerce") if "Weight (kg)" in df.columns else np.nan
+    out["resting_hr"] = pd.to_numeric(df.get("Heart Rate"), errors="coerce")
+    out["spo2_avg"] = pd.to_numeric(df.get("Oxygen Saturation"), errors="coerce")
+    out["bp_sys"] = pd.to_numeric(df.get("Systolic Blood Pressure"), errors="coerce")
+    out["bp_dia"] = pd.to_numeric(df.get("Diastolic Blood Pressure"), errors="coerce")
+    return out
+
+
+def rowwise_sleep_lifestyle(df):
+    out = pd.DataFrame()
+    out["age"] = pd.to_numeric(df.get("Age"), errors="coerce")
+    out["gender"] = df.get("Gender").map(standardize_gender) if "Gender" in df.columns else "Unknown"
+    out["sleep_hours"] = pd.to_numeric(df["Sleep Duration"], errors="coerce")
+    out["resting_hr"] = pd.to_numeric(df["Heart Rate"], errors="coerce")
+    out["steps"] = pd.to_numeric(df["Daily Steps"], errors="coerce")
+    out["stress_level"] = pd.to_numeric(df.get("Stress Level"), errors="coerce")
+    out["quality_sleep"] = pd.to_numeric(df.get("Quality of Sleep"), errors="coerce")
+    sys_dia = df["Blood Pressure (systolic/diastolic)"].apply(parse_bp_text)
+    out["bp_sys"] = [t[0] for t in sys_dia]
+    out["bp_dia"] = [t[1] for t in sys_dia]
+    y = df["Sleep Disorder"].fillna("None").astype(str).str.lower()
+    out["_sleep_disorder"] = (y != "none").astype(int)
+    return out
+
+
+def rowwise_wearable_spo2(df):
+    out = pd.DataFrame()
+    out["spo2_avg"] = pd.to_numeric(df.get("Blood_Oxygen"), errors="coerce")
+    out["resting_hr"] = pd.to_numeric(df.get("Heart_Rate"), errors="coerce")
+    out["steps"] = pd.to_numeric(df.get("Step_Count"), errors="coerce")
+    return out
+
+
+# ---------------------------
+# Synthetic raw frames
+# ---------------------------
+def _with_missing(rng, values, share=0.05):
+    values = values.astype(object)
+    values[rng.random(len(values)) < share] = np.nan
+    return values
+
+
+def raw_frames(rows, seed):
+    """Raw frames shaped like each dataset's CSV after read_csv (strings as object)."""
+    rng = np.random.default_rng(seed)
+    age = rng.integers(18, 90, rows).astype(float)
+    gender = _with_missing(rng, GENDERS[rng.integers(0, len(GENDERS), rows)])
+    hr = rng.normal(72, 10, rows).round()
+    sys_, dia = rng.integers(95, 180, rows), rng.integers(55, 110, rows)
+    bp = _with_missing(rng, np.char.add(np.char.add(sys_.astype(str), "/"), dia.astype(str)).astype(object))
+    bp[rng.random(rows) < 0.01] = "n/a"
+    return {
+        "human_vitals": pd.DataFrame({
+            "Age": age, "Gender": gender, "Height (cm)": rng.normal(170, 10, rows).round(1),
+            "Weight (kg)": rng.normal(75, 15, rows).round(1), "Heart Rate": hr,
+            "Oxygen Saturation": rng.normal(97, 1.5, rows).round(1),
+            "Systolic Blood Pressure": sys_, "Diastolic Blood Pressure": dia,
+        }),
+        "sleep_lifestyle": pd.DataFrame({
+            "Age": age, "Gender": gender, "Sleep Duration": rng.normal(7, 1, rows).round(1),
+            "Heart Rate": hr, "Daily Steps": rng.integers(1000, 15000, rows),
+            "Stress Level": rng.integers(1, 10, rows), "Quality of Sleep": rng.integers(1, 10, rows),
+            "Blood Pressure (systolic/diastolic)": bp,
+            "Sleep Disorder": _with_missing(rng, DISORDERS[rng.integers(0, len(DISORDERS), rows)], 0.5),
+        }),
+        "wearable_spo2": pd.DataFrame({
+            "Blood_Oxygen": rng.normal(97, 1.5, rows).round(1), "Heart_Rate": hr,
+            "Step_Count": rng.integers(0, 2000, rows),
+        }),
+    }
+
+
+def best_seconds(fn, arg, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return round(best, 3), out
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python bench_mapping.py")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = raw_frames(args.rows, args.seed)
+    result = {"rows": args.rows}
+    for name, rowwise, declarative in (("human_vitals", rowwise_human_vitals, map_human_vitals),
+                                       ("sleep_lifestyle", rowwise_sleep_lifestyle, map_sleep_lifestyle),
+                                       ("wearable_spo2", rowwise_wearable_spo2, map_wearable_spo2)):
+        df = frames[name]
+        t_row, expected = best_seconds(rowwise, df, args.repeat)
+        t_decl, got = best_seconds(declarative, df, args.repeat)
+        # same values; dtypes may differ (e.g. int vs float columns, object vs str)
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+        result[name] = {"rowwise_s": t_row, "declarative_s": t_decl,
+                        "speedup": round(t_row / t_decl, 1) if t_decl else None}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Export-time shrinking of the classifier forests (used by
+export_models_to_backend.py).
+
+The training scripts save 250-300 tree forests. /score walks every tree of
+every model (backend/services/compact_forest.py does ~max_depth gathers
+over all trees per call) and each worker maps every node, so p99 latency
+and per-worker memory grow with trees x depth. shrink() tries smaller
+candidates:
+
+  - the first k trees of the fitted forest (no refit: the trees are
+    bagged independently, so any k of them are a smaller forest)
+  - refits with k trees of depth <= d on the training split
+
+Selection never sees the test split from the training module's holdout():
+VALIDATION of the training split is set aside, the original forest's
+settings are refit on the rest as the reference, and every candidate is
+built from that fit and scored on the validation rows. The smallest one
+within `tolerance` of the reference's accuracy that also keeps
+MIN_BAND_AGREEMENT of its Green/Yellow/Red bands wins, and is then rebuilt
+from the original forest / the whole training split and checked against
+the same budget on the test split; if it misses there, the original is
+exported and the report says so. The report compares the original and
+the chosen model on the test split: accuracy, band agreement, artifact
+size, compact (mmapped) bytes, load time, single-row p50/p99 and batch
+latency on both scoring backends.
+"""
+import copy
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+from services.compact_forest import CompactModel, UnsupportedModel  # noqa: E402
+
+TOLERANCE = 0.005      # max drop in validation accuracy vs the reference
+MIN_BAND_AGREEMENT = 0.95  # min share of validation rows keeping their risk band
+VALIDATION = 0.25      # share of the training split held out for selection
+TRUNCATE = (25, 50, 100, 150)
+REFIT_TREES = (25, 50, 100)
+REFIT_DEPTHS = (6, 10, 14)
+BANDS = (0.40, 0.70)   # Green / Yellow / Red cut-offs on p_red, as scoring_engine
+SINGLE_CALLS = 200
+BATCH_ROWS = 1000
+
+
+def _with_forest(pipe, clf):
+    return Pipeline([("pre", pipe.named_steps["pre"]), ("clf", clf)])
+
+
+def truncated(pipe, k):
+    clf = copy.copy(pipe.named_steps["clf"])
+    clf.estimators_ = clf.estimators_[:k]
+    clf.n_estimators = k
+    return _with_forest(pipe, clf)
+
+
+def candidates(pipe):
+    """(label, spec) for every smaller forest tried; build() turns a spec into a pipeline."""
+    n = len(pipe.named_steps["clf"].estimators_)
+    for k in TRUNCATE:
+        if k < n:
+            yield f"first {k} trees", ("truncate", k)
+    for k in REFIT_TREES:
+        for d in REFIT_DEPTHS:
+            yield f"refit {k} trees, depth {d}", ("refit", k, d)
+
+
+def build(pipe, spec, X, y, n_jobs=None):
+    """The candidate `spec` made from the fitted pipe (truncation) or refit on X, y."""
+    if spec[0] == "truncate":
+        return truncated(pipe, spec[1])
+    params = {"clf__n_estimators": spec[1], "clf__max_depth": spec[2], "clf__n_jobs": n_jobs}
+    # n_jobs is only for the refit: measured and exported models predict single-threaded
+    return clone(pipe).set_params(**params).fit(X, y).set_params(clf__n_jobs=None)
+
+
+def validation_split(Xtr, ytr):
+    """(Xfit, Xval, yfit, yval) out of the training split, stratified where every class allows it."""
+    stratify = ytr if ytr.value_counts().min() >= 2 else None
+    return train_test_split(Xtr, ytr, test_size=VALIDATION, random_state=42, stratify=stratify)
+
+
+# ---------------------------
+# Measurements
+# ---------------------------
+def describe(pipe, features, Xte, yte, reference_bands=None):
+    """Size and held-out quality of one candidate."""
+    clf = pipe.named_steps["clf"]
+    p_red = pipe.predict_proba(Xte[features])[:, -1]
+    bands = np.digitize(p_red, BANDS)
+    out = {
+        "trees": len(clf.estimators_),
+        "max_depth": max(t.tree_.max_depth for t in clf.estimators_),
+        "nodes": int(sum(t.tree_.node_count for t in clf.estimators_)),
+        "artifact_bytes": len(_dump({"model": pipe, "features": features})),
+        "accuracy": round(float((pipe.predict(Xte[features]) == yte).mean()), 4),
+    }
+    if reference_bands is not None:
+        out["band_agreement"] = round(float((bands == reference_bands).mean()), 4)
+    return out, bands
+
+
+def latency(art, Xte):
+    """Load time and single-row / batch inference times of an artifact."""
+    blob = _dump(art)
+    pipe, features = art["model"], art["features"]
+    X = Xte[features]
+    rows = min(len(X), BATCH_ROWS)
+    out = {"load_ms": _best_ms(lambda: joblib.load(io.BytesIO(blob)))}
+    out["sklearn"] = _timings(lambda i: pipe.predict_proba(X.iloc[i:i + 1]),
+                              lambda: pipe.predict_proba(X.iloc[:rows]), len(X), rows)
+    try:
+        compact = CompactModel.from_pipeline(pipe, features)
+    except UnsupportedModel:
+        return out
+    num = X[compact.num_cols].to_numpy(dtype=float)
+    cat = [[None if v != v else v for v in row] for row in X[compact.cat_cols].itertuples(index=False)]
+    out["compact"] = _timings(lambda i: compact.predict_proba(compact.transform(num[i:i + 1], cat[i:i + 1])),
+                              lambda: compact.predict_proba(compact.transform(num[:rows], cat[:rows])), len(X), rows)
+    out["compact"]["mapped_bytes"] = int(sum(a.nbytes for a in compact.arrays().values()))
+    return out
+
+
+def _dump(obj) -> bytes:
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    return buf.getvalue()
+
+
+def _best_ms(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1e3, 3)
+
+
+def _timings(single, batch, n, rows):
+    times = []
+    for c in range(SINGLE_CALLS):
+        t0 = time.perf_counter()
+        single(c % n)
+        times.append(time.perf_counter() - t0)
+    p50, p99 = np.percentile(times, [50, 99]) * 1e3
+    return {"single_p50_ms": round(p50, 3), "single_p99_ms": round(p99, 3),
+            "batch_us_per_row": round(_best_ms(batch) * 1e3 / rows, 3)}
+
+
+# ---------------------------
+# Search
+# ---------------------------
+def shrink(art, module, tolerance=TOLERANCE, n_jobs=None, min_band_agreement=MIN_BAND_AGREEMENT):
+    """
+    art: the {"model", "features"} dict train() saved; module: its training
+    script (load() + holdout()). Returns (artifact to export, report).
+    """
+    pipe, features = art["model"], art["features"]
+    pipe.set_params(clf__n_jobs=None)  # artifacts trained before train() reset it on save
+    Xtr, Xte, ytr, yte = module.holdout(module.load())
+    Xtr = Xtr[features]
+
+    # select on validation rows carved out of the training split
+    Xfit, Xval, yfit, yval = validation_split(Xtr, ytr)
+    ref = clone(pipe).set_params(clf__n_jobs=n_jobs).fit(Xfit, yfit).set_params(clf__n_jobs=None)
+    reference, ref_bands = describe(ref, features, Xval, yval)
+    best_label, best_spec, best_bytes = "original", None, reference["artifact_bytes"]
+    tried = []
+    for label, spec in candidates(pipe):
+        info, _ = describe(build(ref, spec, Xfit, yfit, n_jobs), features, Xval, yval, ref_bands)
+        info["ok"] = (info["accuracy"] >= reference["accuracy"] - tolerance
+                      and info["band_agreement"] >= min_band_agreement)
+        tried.append({"candidate": label, **info})
+        if info["ok"] and info["artifact_bytes"] < best_bytes:
+            best_label, best_spec, best_bytes = label, spec, info["artifact_bytes"]
+
+    # re-checked and reported on the test split, which selection never saw:
+    # a winner that misses the budget there ships as the original instead
+    best_pipe = pipe if best_spec is None else build(pipe, best_spec, Xtr, ytr, n_jobs)
+    original, orig_bands = describe(pipe, features, Xte, yte)
+    exported, _ = describe(best_pipe, features, Xte, yte, orig_bands)
+    rejected = None
+    if best_pipe is not pipe and (exported["accuracy"] < original["accuracy"] - tolerance
+                                  or exported["band_agreement"] < min_band_agreement):
+        rejected = {"candidate": best_label, **exported}
+        best_label, best_pipe = "original", pipe
+        exported, _ = describe(pipe, features, Xte, yte, orig_bands)
+    chosen = {**art, "model": best_pipe}
+    if best_pipe is not pipe:
+        chosen["shrunk_from"] = {"trees": original["trees"], "accuracy": original["accuracy"],
+                                 "candidate": best_label}
+    report = {
+        "tolerance": tolerance,
+        "min_band_agreement": min_band_agreement,
+        "validation_rows": len(Xval),
+        "holdout_rows": len(Xte),
+        "chosen": best_label,
+        "rejected_on_test": rejected,  # the validation winner, if the test split overruled it
+        "original": {**original, **latency(art, Xte)},
+        "exported": {**exported, **latency(chosen, Xte)},
+        "reference": reference,  # the original's settings refit without the validation rows
+        "candidates": tried,
+    }
+    return chosen, report
@@ -1,15 +1,137 @@
+"""
+Publishes the trained models to the backend (from ml_training/):
+
+    python export_models_to_backend.py                    # shrink classifiers, 0.5% accuracy budget
+    python export_models_to_backend.py --tolerance 0.01
+    python export_models_to_backend.py --no-shrink        # export the pickles as trained
+    python export_models_to_backend.py --no-activate      # publish, activate later with manage.py models
+
+Each classifier goes through distill.shrink(): the smallest smaller forest
+within --tolerance of the original's accuracy, keeping at least
+--min-band-agreement of its risk bands, is exported instead (re-reading
+its dataset; chosen on a validation split, reported on the test split). The per-model comparison
+of size, load time and latency is written to data/processed/export_report.json.
+
+The exported pickles become a new version in backend/models/registry/
+(services/model_registry.py). Unless --no-activate it is then loaded and
+warmed up here, and only if that works becomes the CURRENT one: running
+workers load, warm up and swap to it without a restart. The
+population baseline is exported as the lookup grid the backend serves.
+"""
+import argparse
+import json
 import os
 import shutil
+import joblib
+
+import distill  # also puts ../backend on sys.path
+import train_heart_model
+import train_kidney_model
+import train_sleep_model
+import train_spo2_model
+from services.model_registry import ModelRegistry, RegistryError, current_version, publish
+from services.scoring_engine import MODEL_FILES, warm_up
 
 SRC = os.path.join("data", "processed")
-DST = os.path.join("..", "backend", "ml", "models")
+STAGE = os.path.join(SRC, "export")  # what gets published, after shrinking
+REGISTRY = os.path.join("..", "backend", "models", "registry")
+GRID_DST = os.path.join("..", "backend", "models", "population_grid.npz")
+REPORT = os.path.join(SRC, "export_report.json")
+
+# pickle -> training module (load + holdout) for the classifiers shrink() handles
+CLASSIFIERS = {
+    "sleep_model.pkl": train_sleep_model,
+    "spo2_model.pkl": train_spo2_model,
+    "heart_model.pkl": train_heart_model,
+    "kidney_model.pkl": train_kidney_model,
+}
+
+
+def export_classifier(f, module, tolerance, min_band_agreement, n_jobs):
+    """Writes the shrunk artifact to STAGE; returns its report."""
+    art = joblib.load(os.path.join(SRC, f))
+    chosen, report = distill.shrink(art, module, tolerance, n_jobs, min_band_agreement)
+    joblib.dump(chosen, os.path.join(STAGE, f))
+    o, e = report["original"], report["exported"]
+    if report["rejected_on_test"]:
+        r = report["rejected_on_test"]
+        print(f"Kept original: {f}: {r['candidate']} missed the budget on the test split "
+              f"(accuracy {o['accuracy']} -> {r['accuracy']}, bands agree {r['band_agreement']})")
+    print(f"Shrunk: {f}: {report['chosen']}; {o['trees']} -> {e['trees']} trees, "
+          f"{o['artifact_bytes'] / 1e6:.1f} -> {e['artifact_bytes'] / 1e6:.1f} MB, "
+          f"test accuracy {o['accuracy']} -> {e['accuracy']}, bands agree {e['band_agreement']}")
+    for backend in ("compact", "sklearn"):
+        if backend in o and backend in e:
+            print(f"  {backend:<8} single-row p99 {o[backend]['single_p99_ms']} -> {e[backend]['single_p99_ms']} ms, "
+                  f"batch {o[backend]['batch_us_per_row']} -> {e[backend]['batch_us_per_row']} us/row")
+    return report
 
-os.makedirs(DST, exist_ok=True)
 
-for f in ["population_baseline.pkl","sleep_model.pkl","spo2_model.pkl","heart_model.pkl","kidney_model.pkl"]:
-    src = os.path.join(SRC, f)
-    if os.path.exists(src):
-        shutil.copy2(src, os.path.join(DST, f))
+def main():
+    parser = argparse.ArgumentParser(prog="python export_models_to_backend.py")
+    parser.add_argument("--tolerance", type=float, default=distill.TOLERANCE,
+                        help="max validation accuracy drop for a smaller model")
+    parser.add_argument("--min-band-agreement", type=float, default=distill.MIN_BAND_AGREEMENT,
+                        help="min share of validation rows a smaller model keeps in the same risk band")
+    parser.add_argument("--no-shrink", action="store_true", help="copy the pickles as trained")
+    parser.add_argument("--jobs", type=int, help="threads for candidate refits")
+    parser.add_argument("--no-activate", action="store_true", help="publish without making it CURRENT")
+    args = parser.parse_args()
+
+    shutil.rmtree(STAGE, ignore_errors=True)
+    os.makedirs(STAGE)
+    reports = {}
+    for f in ["sleep_model.pkl","spo2_model.pkl","heart_model.pkl","kidney_model.pkl"]:
+        src = os.path.join(SRC, f)
+        if not os.path.exists(src):
+            print("Missing:", f)
+            continue
+        if f in CLASSIFIERS and not args.no_shrink:
+            try:
+                reports[f] = export_classifier(f, CLASSIFIERS[f], args.tolerance, args.min_band_agreement,
+                                               args.jobs)
+                continue
+            except FileNotFoundError as e:  # no raw data for the held-out split
+                print(f"Not shrunk: {f} ({e})")
+                reports[f] = {"chosen": "original", "skipped": str(e)}
+        shutil.copy2(src, os.path.join(STAGE, f))
         print("Copied:", f)
+
+    if reports:
+        with open(REPORT, "w") as fh:
+            json.dump(reports, fh, indent=2)
+        print("Report:", REPORT)
+
+    if os.listdir(STAGE):
+        # a version is a whole model set: models not retrained this time come from the active one
+        current = current_version(REGISTRY)
+        served = os.path.join(REGISTRY, current) if current else os.path.dirname(REGISTRY)
+        for f in MODEL_FILES.values():
+            if not os.path.exists(os.path.join(STAGE, f)) and os.path.exists(os.path.join(served, f)):
+                shutil.copy2(os.path.join(served, f), os.path.join(STAGE, f))
+                print(f"Carried over: {f} (from {served})")
+        manifest = publish(STAGE, MODEL_FILES, REGISTRY, notes={f: r["chosen"] for f, r in reports.items()})
+        state = "not activated: python manage.py models --activate " + manifest["version"]
+        if not args.no_activate:
+            # the backend's own load + warm-up; CURRENT moves only if it passes
+            registry = ModelRegistry(REGISTRY, os.path.dirname(REGISTRY), MODEL_FILES, warm_up=warm_up, check_s=0)
+            try:
+                registry.reload(manifest["version"], make_current=True)
+                state = "CURRENT"
+            except RegistryError as e:
+                state = f"not activated, it failed to load: {e}"
+        print(f"Published: {REGISTRY}/{manifest['version']} ({', '.join(manifest['models'])}; {state})")
+
+    # population baseline -> lookup grid served by backend/ml/population_grid.py
+    pop = os.path.join(SRC, "population_baseline.pkl")
+    if os.path.exists(pop):
+        from ml.population_grid import build_grid, save_grid
+        grid = build_grid(joblib.load(pop))
+        save_grid(grid, GRID_DST)
+        print("Grid:", GRID_DST, grid["values"].shape)
     else:
-        print("Missing:", f)
+        print("Missing: population_baseline.pkl (no population grid)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Trains every model in one run (from ml_training/):
+
+    python train_all.py                     # all models, all cores
+    python train_all.py --cores 8 --jobs 2  # 2 models at a time, 4 forest threads each
+    python train_all.py heart population    # just these
+
+Each distinct dataset is read and mapped once in this process; the worker
+processes inherit the frames (fork) or get them once at start-up (spawn),
+so heart and population share one map_human_vitals frame. The core budget
+is split into --jobs concurrent trainings with cores // jobs threads for
+each forest. Output of each job is printed when it finishes, followed by
+a wall-clock summary.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import train_heart_model
+import train_kidney_model
+import train_population_baseline
+import train_sleep_model
+import train_spo2_model
+
+JOBS = {
+    "heart": train_heart_model,
+    "population": train_population_baseline,
+    "sleep": train_sleep_model,
+    "spo2": train_spo2_model,
+    "kidney": train_kidney_model,
+}
+
+_frames = {}
+
+
+def dataset_key(module):
+    return tuple(module.DATASET), module.MAPPER
+
+
+def load_frames(names):
+    """{dataset_key: frame, or the exception that loading raised}, one load per distinct dataset."""
+    frames = {}
+    for name in names:
+        key = dataset_key(JOBS[name])
+        if key not in frames:
+            t0 = time.perf_counter()
+            try:
+                frames[key] = JOBS[name].load()
+            except Exception as e:
+                frames[key] = e
+            print(f"[{name}] dataset ready in {time.perf_counter() - t0:.1f}s")
+    return frames
+
+
+def _init_worker(frames):
+    _frames.update(frames)
+
+
+def run_job(name, n_jobs):
+    """Trains one model in a worker; returns (name, ok, seconds, captured output)."""
+    t0 = time.perf_counter()
+    out = io.StringIO()
+    ok = True
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        try:
+            frame = _frames[dataset_key(JOBS[name])]
+            if isinstance(frame, Exception):
+                raise frame
+            JOBS[name].train(frame, n_jobs=n_jobs)
+        except Exception:
+            ok = False
+            traceback.print_exc()
+    return name, ok, time.perf_counter() - t0, out.getvalue()
+
+
+def split_cores(cores, n_models, jobs=None):
+    """(concurrent jobs, forest n_jobs per job) for a core budget."""
+    jobs = max(1, min(jobs or cores, n_models, cores))
+    return jobs, max(1, cores // jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python train_all.py")
+    parser.add_argument("models", nargs="*", help=f"any of {', '.join(JOBS)} (default: all)")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1, help="total core budget")
+    parser.add_argument("--jobs", type=int, help="models trained at once (default: as many as fit)")
+    args = parser.parse_args()
+
+    unknown = [m for m in args.models if m not in JOBS]
+    if unknown:
+        parser.error(f"unknown models {unknown}, expected some of {list(JOBS)}")
+    names = args.models or list(JOBS)
+    jobs, n_jobs = split_cores(args.cores, len(names), args.jobs)
+    print(f"{len(names)} models, {args.cores} cores: {jobs} at a time x {n_jobs} forest threads")
+
+    t0 = time.perf_counter()
+    frames = load_frames(names)
+    load_seconds = time.perf_counter() - t0
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(frames,)) as pool:
+        futures = [pool.submit(run_job, name, n_jobs) for name in names]
+        for f in as_completed(futures):
+            name, ok, seconds, output = f.result()
+            results.append((name, ok, seconds))
+            print(f"\n===== {name} ({'ok' if ok else 'FAILED'}, {seconds:.1f}s)")
+            print(output.rstrip())
+
+    wall = time.perf_counter() - t0
+    busy = sum(s for _, _, s in results)
+    print("\n===== summary")
+    for name, ok, seconds in sorted(results, key=lambda r: names.index(r[0])):
+        print(f"  {name:<12} {'ok' if ok else 'FAILED':<7} {seconds:8.1f}s")
+    print(f"  datasets loaded in {load_seconds:.1f}s; wall clock {wall:.1f}s "
+          f"for {busy:.1f}s of training ({busy / wall if wall else 0:.1f}x)")
+    if not all(ok for _, ok, _ in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,23 +9,38 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-from utils_io import read_csv_any
-from utils_columns import map_human_vitals
+from utils_io import read_mapped
+from utils_columns import map_human_vitals, HUMAN_VITALS_COLUMNS
 
 OUT = "data/processed/heart_model.pkl"
 
-def main():
-    df_raw, path = read_csv_any(["human_vital_signs_dataset_2024.csv"])
-    print("Loaded:", path)
+DATASET = ["human_vital_signs_dataset_2024.csv"]
+MAPPER = map_human_vitals
+USECOLS = HUMAN_VITALS_COLUMNS
 
-    df = map_human_vitals(df_raw)
+def load():
+    # mapped frame from the columnar cache (see utils_io.read_mapped)
+    df, path = read_mapped(DATASET, MAPPER, usecols=USECOLS)
+    print("Loaded:", path)
+    return df
 
+def holdout(df):
+    """(Xtr, Xte, ytr, yte): the split train() fits and reports on (and distill.py scores on)."""
     feats = ["age","gender","bp_sys","bp_dia","resting_hr","spo2_avg","height_m","weight_kg"]
     X = df[feats].copy()
 
     # rule-based label for heart risk (binary)
     y = ((df["bp_sys"] >= 140) | (df["bp_dia"] >= 90) | (df["resting_hr"] >= 95) | (df["spo2_avg"] < 94)).astype(int)
 
+    # drop rows with no bp_sys and no hr
+    keep = df["bp_sys"].notna() | df["resting_hr"].notna()
+    return train_test_split(X[keep], y[keep], test_size=0.2, random_state=42, stratify=y[keep])
+
+def train(df, n_jobs=None):
+    """Fits on the mapped frame (not modified) and saves OUT; n_jobs goes to the forest."""
+
+    Xtr, Xte, ytr, yte = holdout(df)
+    feats = list(Xtr.columns)
     cat = ["gender"]
     num = [c for c in feats if c not in cat]
 
@@ -35,22 +50,21 @@ def main():
                          ("oh", OneHotEncoder(handle_unknown="ignore"))]), cat),
     ])
 
-    clf = RandomForestClassifier(n_estimators=300, random_state=42, class_weight="balanced")
+    clf = RandomForestClassifier(n_estimators=300, random_state=42, class_weight="balanced", n_jobs=n_jobs)
     pipe = Pipeline([("pre", pre), ("clf", clf)])
 
-    # drop rows with no bp_sys and no hr
-    keep = df["bp_sys"].notna() | df["resting_hr"].notna()
-    X = X[keep]
-    y = y[keep]
-
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
     pipe.fit(Xtr, ytr)
     pred = pipe.predict(Xte)
     print(classification_report(yte, pred))
 
+    clf.n_jobs = None  # the training core budget; the backend predicts single-threaded
     os.makedirs("data/processed", exist_ok=True)
     joblib.dump({"model": pipe, "features": feats}, OUT)
     print("Saved:", OUT)
+    return OUT
+
+def main():
+    train(load())
 
 if __name__ == "__main__":
     main()
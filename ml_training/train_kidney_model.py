@@ -7,14 +7,20 @@ from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-from utils_io import read_csv_any
+from utils_io import read_mapped
 
 OUT = "data/processed/kidney_model.pkl"
 
-def main():
-    df, path = read_csv_any(["Chronic_Kidney_Dsease_data.csv"])
+DATASET = ["Chronic_Kidney_Dsease_data.csv"]
+MAPPER = None
+
+def load():
+    df, path = read_mapped(DATASET)
     print("Loaded:", path)
+    return df
 
+def holdout(df):
+    """(Xtr, Xte, ytr, yte): the split train() fits and reports on (and distill.py scores on)."""
     # Candidate columns in YOUR file (based on your dataset)
     candidates = [
         "Age","BloodPressure","SerumCreatinine","BUNLevels","GFR","ACR",
@@ -29,22 +35,33 @@ def main():
 
     X = df[cols].copy()
     y = df["Diagnosis"].astype(str).str.lower().str.contains("ckd").astype(int)
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def train(df, n_jobs=None):
+    """Fits on the raw frame (not modified) and saves OUT; n_jobs goes to the forest."""
+
+    Xtr, Xte, ytr, yte = holdout(df)
+    cols = list(Xtr.columns)
 
     pre = ColumnTransformer([
         ("num", Pipeline([("imp", SimpleImputer(strategy="median"))]), cols)
     ])
 
-    clf = RandomForestClassifier(n_estimators=300, random_state=42, class_weight="balanced")
+    clf = RandomForestClassifier(n_estimators=300, random_state=42, class_weight="balanced", n_jobs=n_jobs)
     pipe = Pipeline([("pre", pre), ("clf", clf)])
 
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
     pipe.fit(Xtr, ytr)
     pred = pipe.predict(Xte)
     print(classification_report(yte, pred))
 
+    clf.n_jobs = None  # the training core budget; the backend predicts single-threaded
     os.makedirs("data/processed", exist_ok=True)
     joblib.dump({"model": pipe, "features": cols}, OUT)
     print("Saved:", OUT)
+    return OUT
+
+def main():
+    train(load())
 
 if __name__ == "__main__":
     main()
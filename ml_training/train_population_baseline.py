@@ -8,16 +8,23 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.ensemble import RandomForestRegressor
-from utils_io import read_csv_any
-from utils_columns import map_human_vitals
+from utils_io import read_mapped
+from utils_columns import map_human_vitals, HUMAN_VITALS_COLUMNS
 
 OUT = "data/processed/population_baseline.pkl"
 
-def main():
-    df_raw, path = read_csv_any(["human_vital_signs_dataset_2024.csv"])
+DATASET = ["human_vital_signs_dataset_2024.csv"]
+MAPPER = map_human_vitals
+USECOLS = HUMAN_VITALS_COLUMNS
+
+def load():
+    # mapped frame from the columnar cache (see utils_io.read_mapped)
+    df, path = read_mapped(DATASET, MAPPER, usecols=USECOLS)
     print("Loaded:", path)
+    return df
 
-    df = map_human_vitals(df_raw)
+def train(df, n_jobs=None):
+    """Fits on the mapped frame (not modified) and saves OUT; n_jobs goes to the forest."""
 
     # Targets we can baseline
     targets = ["bp_sys", "bp_dia", "resting_hr", "spo2_avg"]
@@ -42,7 +49,7 @@ def main():
                          ("oh", OneHotEncoder(handle_unknown="ignore"))]), cat),
     ])
 
-    reg = RandomForestRegressor(n_estimators=250, random_state=42)
+    reg = RandomForestRegressor(n_estimators=250, random_state=42, n_jobs=n_jobs)
     model = Pipeline([
         ("pre", pre),
         ("reg", MultiOutputRegressor(reg))
@@ -50,9 +57,15 @@ def main():
 
     model.fit(X, Y)
 
+    for est in model.named_steps["reg"].estimators_:
+        est.n_jobs = None  # the training core budget; the backend predicts single-threaded
     os.makedirs("data/processed", exist_ok=True)
     joblib.dump({"model": model, "features": feats, "targets": targets}, OUT)
     print("Saved:", OUT)
+    return OUT
+
+def main():
+    train(load())
 
 if __name__ == "__main__":
     main()
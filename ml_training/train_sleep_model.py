@@ -8,17 +8,23 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-from utils_io import read_csv_any
-from utils_columns import map_sleep_lifestyle
+from utils_io import read_mapped
+from utils_columns import map_sleep_lifestyle, SLEEP_LIFESTYLE_COLUMNS
 
 OUT = "data/processed/sleep_model.pkl"
 
-def main():
-    df_raw, path = read_csv_any(["sleep_health_lifestyle_dataset.csv", "sleep_health_and_lifestyle_dataset.csv"])
-    print("Loaded:", path)
+DATASET = ["sleep_health_lifestyle_dataset.csv", "sleep_health_and_lifestyle_dataset.csv"]
+MAPPER = map_sleep_lifestyle
+USECOLS = SLEEP_LIFESTYLE_COLUMNS
 
-    df = map_sleep_lifestyle(df_raw)
+def load():
+    # mapped frame from the columnar cache (see utils_io.read_mapped)
+    df, path = read_mapped(DATASET, MAPPER, usecols=USECOLS)
+    print("Loaded:", path)
+    return df
 
+def holdout(df):
+    """(Xtr, Xte, ytr, yte): the split train() fits and reports on (and distill.py scores on)."""
     # features aligned with your app
     feats = ["age","gender","sleep_hours","resting_hr","steps","stress_level","quality_sleep"]
     X = df[feats].copy()
@@ -26,6 +32,13 @@ def main():
     if df["_sleep_disorder"].isna().all():
         raise RuntimeError("Sleep Disorder label not found in this sleep dataset.")
     y = df["_sleep_disorder"].astype(int)
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def train(df, n_jobs=None):
+    """Fits on the mapped frame (not modified) and saves OUT; n_jobs goes to the forest."""
+
+    Xtr, Xte, ytr, yte = holdout(df)
+    feats = list(Xtr.columns)
 
     cat = ["gender"]
     num = [c for c in feats if c not in cat]
@@ -36,17 +49,21 @@ def main():
                          ("oh", OneHotEncoder(handle_unknown="ignore"))]), cat),
     ])
 
-    clf = RandomForestClassifier(n_estimators=250, random_state=42, class_weight="balanced")
+    clf = RandomForestClassifier(n_estimators=250, random_state=42, class_weight="balanced", n_jobs=n_jobs)
     pipe = Pipeline([("pre", pre), ("clf", clf)])
 
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
     pipe.fit(Xtr, ytr)
     pred = pipe.predict(Xte)
     print(classification_report(yte, pred))
 
+    clf.n_jobs = None  # the training core budget; the backend predicts single-threaded
     os.makedirs("data/processed", exist_ok=True)
     joblib.dump({"model": pipe, "features": feats}, OUT)
     print("Saved:", OUT)
+    return OUT
+
+def main():
+    train(load())
 
 if __name__ == "__main__":
     main()
@@ -8,17 +8,23 @@ from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-from utils_io import read_csv_any
-from utils_columns import map_wearable_spo2
+from utils_io import read_mapped
+from utils_columns import map_wearable_spo2, WEARABLE_SPO2_COLUMNS
 
 OUT = "data/processed/spo2_model.pkl"
 
-def main():
-    df_raw, path = read_csv_any(["wearable_sports_health_dataset*.csv"])
-    print("Loaded:", path)
+DATASET = ["wearable_sports_health_dataset*.csv"]
+MAPPER = map_wearable_spo2
+USECOLS = WEARABLE_SPO2_COLUMNS
 
-    df = map_wearable_spo2(df_raw)
+def load():
+    # mapped frame from the columnar cache (see utils_io.read_mapped)
+    df, path = read_mapped(DATASET, MAPPER, usecols=USECOLS)
+    print("Loaded:", path)
+    return df
 
+def holdout(df):
+    """(Xtr, Xte, ytr, yte): the split train() fits and reports on (and distill.py scores on)."""
     feats = ["spo2_avg","resting_hr","steps"]
     X = df[feats].copy()
 
@@ -29,24 +35,33 @@ def main():
     y = ((spo2 < 94) | (hr > 95)).astype(int)
     # drop rows where spo2 is missing
     keep = spo2.notna()
-    X = X[keep]
-    y = y[keep]
+    return train_test_split(X[keep], y[keep], test_size=0.2, random_state=42, stratify=y[keep])
+
+def train(df, n_jobs=None):
+    """Fits on the mapped frame (not modified) and saves OUT; n_jobs goes to the forest."""
+
+    Xtr, Xte, ytr, yte = holdout(df)
+    feats = list(Xtr.columns)
 
     pre = ColumnTransformer([
         ("num", Pipeline([("imp", SimpleImputer(strategy="median"))]), feats)
     ])
 
-    clf = RandomForestClassifier(n_estimators=250, random_state=42, class_weight="balanced")
+    clf = RandomForestClassifier(n_estimators=250, random_state=42, class_weight="balanced", n_jobs=n_jobs)
     pipe = Pipeline([("pre", pre), ("clf", clf)])
 
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
     pipe.fit(Xtr, ytr)
     pred = pipe.predict(Xte)
     print(classification_report(yte, pred))
 
+    clf.n_jobs = None  # the training core budget; the backend predicts single-threaded
     os.makedirs("data/processed", exist_ok=True)
     joblib.dump({"model": pipe, "features": feats}, OUT)
     print("Saved:", OUT)
+    return OUT
+
+def main():
+    train(load())
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,14 @@
 import pandas as pd
 import numpy as np
 
+GENDER_MALE = ["m", "male", "man", "1"]
+GENDER_FEMALE = ["f", "female", "woman", "0"]
+
 def standardize_gender(x):
     if pd.isna(x): return "Unknown"
     s = str(x).strip().lower()
-    if s in ["m", "male", "man", "1"]: return "Male"
-    if s in ["f", "female", "woman", "0"]: return "Female"
+    if s in GENDER_MALE: return "Male"
+    if s in GENDER_FEMALE: return "Female"
     return "Unknown"
 
 def parse_bp_text(s):
@@ -17,84 +20,124 @@ def parse_bp_text(s):
         return (pd.to_numeric(a, errors="coerce"), pd.to_numeric(b, errors="coerce"))
     return (np.nan, np.nan)
 
-def map_human_vitals(df):
+# ---------------------------
+# Declarative column mappings
+# ---------------------------
+# output column -> (kind, sources). Sources are raw column names tried in
+# order, the first one present in the frame wins; (name, divisor) converts
+# units on the way, e.g. ("Height (cm)", 100.0) for metres. Kinds:
+#   num      pd.to_numeric, NaN where unparseable
+#   gender   "Male" / "Female" / "Unknown", as standardize_gender
+#   bp_sys   first half of a "120/80" string, as parse_bp_text
+#   bp_dia   second half of it
+#   flag     1 unless missing or "none" (e.g. Sleep Disorder), else 0
+# With no source present the column is NaN ("Unknown" for gender).
+# compile_mapping turns a spec into mapper(df): whole-column operations, and
+# string kinds are worked out once per distinct value, then spread back to
+# the rows with one take.
+
+HUMAN_VITALS_SPEC = {
     # human_vital_signs_dataset_2024.csv
-    out = pd.DataFrame()
-    out["age"] = pd.to_numeric(df.get("Age"), errors="coerce")
-    out["gender"] = df.get("Gender").map(standardize_gender) if "Gender" in df.columns else "Unknown"
-    # height might be "Height (m)" OR "Height (cm)" depending on dataset
-    if "Height (m)" in df.columns:
-        out["height_m"] = pd.to_numeric(df["Height (m)"], errors="coerce")
-    elif "Height (cm)" in df.columns:
-        out["height_m"] = pd.to_numeric(df["Height (cm)"], errors="coerce") / 100.0
-    else:
-        out["height_m"] = np.nan
-
-    if "Weight (kg)" in df.columns:
-        out["weight_kg"] = pd.to_numeric(df["Weight (kg)"], errors="coerce")
-    else:
-        out["weight_kg"] = np.nan
-
-    out["resting_hr"] = pd.to_numeric(df.get("Heart Rate"), errors="coerce")
-    out["spo2_avg"] = pd.to_numeric(df.get("Oxygen Saturation"), errors="coerce")
-    out["bp_sys"] = pd.to_numeric(df.get("Systolic Blood Pressure"), errors="coerce")
-    out["bp_dia"] = pd.to_numeric(df.get("Diastolic Blood Pressure"), errors="coerce")
-    return out
-
-def map_sleep_lifestyle(df):
+    "age": ("num", ["Age"]),
+    "gender": ("gender", ["Gender"]),
+    "height_m": ("num", ["Height (m)", ("Height (cm)", 100.0)]),
+    "weight_kg": ("num", ["Weight (kg)"]),
+    "resting_hr": ("num", ["Heart Rate"]),
+    "spo2_avg": ("num", ["Oxygen Saturation"]),
+    "bp_sys": ("num", ["Systolic Blood Pressure"]),
+    "bp_dia": ("num", ["Diastolic Blood Pressure"]),
+}
+SLEEP_LIFESTYLE_SPEC = {
     # sleep_health_lifestyle_dataset.csv (400 rows) OR similar
-    out = pd.DataFrame()
-    out["age"] = pd.to_numeric(df.get("Age"), errors="coerce")
-    out["gender"] = df.get("Gender").map(standardize_gender) if "Gender" in df.columns else "Unknown"
-
-    # sleep hours
-    if "Sleep Duration (hours)" in df.columns:
-        out["sleep_hours"] = pd.to_numeric(df["Sleep Duration (hours)"], errors="coerce")
-    elif "Sleep Duration" in df.columns:
-        out["sleep_hours"] = pd.to_numeric(df["Sleep Duration"], errors="coerce")
-    else:
-        out["sleep_hours"] = np.nan
-
-    # HR
-    if "Heart Rate (bpm)" in df.columns:
-        out["resting_hr"] = pd.to_numeric(df["Heart Rate (bpm)"], errors="coerce")
-    elif "Heart Rate" in df.columns:
-        out["resting_hr"] = pd.to_numeric(df["Heart Rate"], errors="coerce")
-    else:
-        out["resting_hr"] = np.nan
-
-    # Steps
-    if "Daily Steps" in df.columns:
-        out["steps"] = pd.to_numeric(df["Daily Steps"], errors="coerce")
-    else:
-        out["steps"] = np.nan
-
-    # Stress & Quality
-    out["stress_level"] = pd.to_numeric(df.get("Stress Level"), errors="coerce")
-    out["quality_sleep"] = pd.to_numeric(df.get("Quality of Sleep"), errors="coerce")
-
-    # BP string
-    if "Blood Pressure (systolic/diastolic)" in df.columns:
-        sys_dia = df["Blood Pressure (systolic/diastolic)"].apply(parse_bp_text)
-        out["bp_sys"] = [t[0] for t in sys_dia]
-        out["bp_dia"] = [t[1] for t in sys_dia]
-    else:
-        out["bp_sys"] = np.nan
-        out["bp_dia"] = np.nan
-
-    # Sleep disorder label (if exists)
-    if "Sleep Disorder" in df.columns:
-        y = df["Sleep Disorder"].fillna("None").astype(str).str.lower()
-        out["_sleep_disorder"] = (y != "none").astype(int)
-    else:
-        out["_sleep_disorder"] = np.nan
-
-    return out
-
-def map_wearable_spo2(df):
+    "age": ("num", ["Age"]),
+    "gender": ("gender", ["Gender"]),
+    "sleep_hours": ("num", ["Sleep Duration (hours)", "Sleep Duration"]),
+    "resting_hr": ("num", ["Heart Rate (bpm)", "Heart Rate"]),
+    "steps": ("num", ["Daily Steps"]),
+    "stress_level": ("num", ["Stress Level"]),
+    "quality_sleep": ("num", ["Quality of Sleep"]),
+    "bp_sys": ("bp_sys", ["Blood Pressure (systolic/diastolic)"]),
+    "bp_dia": ("bp_dia", ["Blood Pressure (systolic/diastolic)"]),
+    "_sleep_disorder": ("flag", ["Sleep Disorder"]),
+}
+WEARABLE_SPO2_SPEC = {
     # wearable_sports_health_dataset......csv
-    out = pd.DataFrame()
-    out["spo2_avg"] = pd.to_numeric(df.get("Blood_Oxygen"), errors="coerce")
-    out["resting_hr"] = pd.to_numeric(df.get("Heart_Rate"), errors="coerce")
-    out["steps"] = pd.to_numeric(df.get("Step_Count"), errors="coerce")
-    return out
+    "spo2_avg": ("num", ["Blood_Oxygen"]),
+    "resting_hr": ("num", ["Heart_Rate"]),
+    "steps": ("num", ["Step_Count"]),
+}
+
+def _num(col):
+    return pd.to_numeric(col, errors="coerce")
+
+def _uniques(col):
+    # (codes, distinct non-missing values as str); code -1 = missing
+    codes, uniques = pd.factorize(col)
+    return codes, pd.Series(uniques, dtype=object).astype(str)
+
+def _gender(col):
+    codes, u = _uniques(col)
+    u = u.str.strip().str.lower()
+    labels = np.where(u.isin(GENDER_MALE), "Male", np.where(u.isin(GENDER_FEMALE), "Female", "Unknown"))
+    # a str array, like .map(standardize_gender) gives; code -1 takes the trailing "Unknown"
+    return pd.array(np.append(labels, "Unknown"), dtype="str").take(codes)
+
+def _bp(col):
+    codes, u = _uniques(col)
+    if u.empty:  # all missing
+        return [np.full(len(codes), np.nan)] * 2
+    head, sep, tail = (u.str.strip().str.partition("/")[i] for i in range(3))
+    split = sep.to_numpy() == "/"
+    sys_dia = [np.where(split, _num(half).to_numpy(dtype=float, na_value=np.nan), np.nan) for half in (head, tail)]
+    return [np.append(v, np.nan)[codes] for v in sys_dia]
+
+def _flag(col):
+    codes, u = _uniques(col)
+    return np.append((u.str.lower() != "none").to_numpy(dtype=np.int64), 0)[codes]
+
+KINDS = ("num", "gender", "bp_sys", "bp_dia", "flag")
+
+def compile_mapping(spec):
+    """mapper(df) -> frame with spec's columns, on df's index. mapper.spec is the spec."""
+    bad = {out: kind for out, (kind, _) in spec.items() if kind not in KINDS}
+    if bad:
+        raise ValueError(f"unknown column kinds {bad}, expected some of {list(KINDS)}")
+    steps = [(out, kind, [s if isinstance(s, tuple) else (s, None) for s in sources])
+             for out, (kind, sources) in spec.items()]
+
+    def mapper(df):
+        data = {}
+        bp = {}  # source -> (sys, dia), split once for both halves
+        for out, kind, sources in steps:
+            name, divisor = next(((n, d) for n, d in sources if n in df.columns), (None, None))
+            if name is None:
+                data[out] = "Unknown" if kind == "gender" else np.nan
+            elif kind == "num":
+                v = _num(df[name]).to_numpy()
+                data[out] = v / divisor if divisor else v
+            elif kind == "gender":
+                data[out] = _gender(df[name])
+            elif kind in ("bp_sys", "bp_dia"):
+                if name not in bp:
+                    bp[name] = _bp(df[name])
+                data[out] = bp[name][kind == "bp_dia"]
+            else:
+                data[out] = _flag(df[name])
+        return pd.DataFrame(data, index=df.index)
+
+    mapper.spec = spec
+    return mapper
+
+def source_columns(spec):
+    """Every raw column spec may read, for read_csv usecols."""
+    return list(dict.fromkeys(s[0] if isinstance(s, tuple) else s for _, sources in spec.values() for s in sources))
+
+map_human_vitals = compile_mapping(HUMAN_VITALS_SPEC)
+map_sleep_lifestyle = compile_mapping(SLEEP_LIFESTYLE_SPEC)
+map_wearable_spo2 = compile_mapping(WEARABLE_SPO2_SPEC)
+
+# raw columns each mapper reads (any that a given file lacks are skipped);
+# passed as usecols so the rest of the CSV is never parsed
+HUMAN_VITALS_COLUMNS = source_columns(HUMAN_VITALS_SPEC)
+SLEEP_LIFESTYLE_COLUMNS = source_columns(SLEEP_LIFESTYLE_SPEC)
+WEARABLE_SPO2_COLUMNS = source_columns(WEARABLE_SPO2_SPEC)
@@ -1,8 +1,16 @@
 import os
 import glob
+import hashlib
+import inspect
+import json
+import shutil
+import numpy as np
 import pandas as pd
 
 RAW_DIR = os.path.join(os.path.dirname(__file__), "data", "raw")
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "cache")
+CHUNK_ROWS = 200_000  # raw rows parsed per read_csv chunk when building a cache
+CACHE_FORMAT = 1
 
 def find_file(possible_names):
     """
@@ -19,3 +27,106 @@ def find_file(possible_names):
 def read_csv_any(possible_names):
     path = find_file(possible_names)
     return pd.read_csv(path), path
+
+# ---------------------------
+# Columnar cache of mapped frames
+# ---------------------------
+# data/cache/<key>/ holds one raw .bin file per column plus meta.json.
+# The key covers the raw file (path, size, mtime), the source of the
+# mapper's module (its code and column specs) and usecols, so editing any
+# of them rebuilds the cache. Numeric and bool
+# columns are stored as float64; everything else as int32 codes into a list
+# of strings (NaN = -1), restored as object columns.
+
+def read_mapped(possible_names, mapper=None, usecols=None, chunk_rows=CHUNK_ROWS):
+    """
+    mapper(read_csv_any(possible_names)[0]) (the raw frame if mapper is
+    None), served from the columnar cache when the raw file is unchanged.
+    A cache miss reads only usecols, chunk_rows rows at a time, maps each
+    chunk and appends it to the cache, so memory is bounded by one chunk
+    plus the finished columns. Returns (frame, raw path).
+    """
+    path = find_file(possible_names)
+    cache = os.path.join(CACHE_DIR, _cache_key(path, mapper, usecols))
+    if not os.path.exists(os.path.join(cache, "meta.json")):
+        try:
+            _build_cache(path, cache, mapper, usecols, chunk_rows)
+        except _SchemaChange as e:
+            print(f"Not cached ({e}); reading {path} in one go")
+            df = pd.read_csv(path, usecols=_usecols_filter(usecols))
+            return (mapper(df) if mapper else df), path
+    return _load_cache(cache), path
+
+class _SchemaChange(Exception):
+    pass
+
+def _usecols_filter(usecols):
+    # columns a mapper may look for don't all exist in every file version
+    if usecols is None:
+        return None
+    wanted = set(usecols)
+    return lambda c: c in wanted
+
+def _cache_key(path, mapper, usecols):
+    st = os.stat(path)
+    parts = [CACHE_FORMAT, os.path.abspath(path), st.st_size, st.st_mtime_ns,
+             inspect.getsource(inspect.getmodule(mapper)) if mapper else None, sorted(usecols) if usecols else None]
+    digest = hashlib.blake2b(json.dumps(parts).encode(), digest_size=10).hexdigest()
+    return f"{os.path.splitext(os.path.basename(path))[0][:40]}-{digest}"
+
+def _build_cache(path, cache, mapper, usecols, chunk_rows):
+    tmp = f"{cache}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = {}  # name -> {"kind", "file", "categories"}
+    codes = {}    # name -> {string: code} for category columns
+    rows = 0
+    try:
+        for chunk in pd.read_csv(path, usecols=_usecols_filter(usecols), chunksize=chunk_rows):
+            df = mapper(chunk) if mapper else chunk
+            if columns and list(df.columns) != list(columns):
+                raise _SchemaChange("columns differ between chunks")
+            for i, name in enumerate(df.columns):
+                col = df[name]
+                kind = "num" if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col) else "cat"
+                meta = columns.setdefault(name, {"kind": kind, "file": f"{i}.bin", "categories": []})
+                if meta["kind"] != kind:
+                    raise _SchemaChange(f"column {name!r} is {meta['kind']} in one chunk and {kind} in another")
+                if kind == "num":
+                    values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+                else:
+                    seen = codes.setdefault(name, {})
+                    for v in col.dropna().unique():
+                        s = str(v)
+                        if s not in seen:
+                            seen[s] = len(seen)
+                            meta["categories"].append(s)
+                    values = col.map(lambda v: seen[str(v)], na_action="ignore").fillna(-1).to_numpy(dtype=np.int32)
+                with open(os.path.join(tmp, meta["file"]), "ab") as f:
+                    values.tofile(f)
+            rows += len(df)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"source": path, "rows": rows,
+                       "columns": [{"name": n, **m} for n, m in columns.items()]}, f)
+        shutil.rmtree(cache, ignore_errors=True)
+        os.replace(tmp, cache)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def _load_cache(cache):
+    with open(os.path.join(cache, "meta.json")) as f:
+        meta = json.load(f)
+    data = {}
+    for col in meta["columns"]:
+        file = os.path.join(cache, col["file"])
+        if col["kind"] == "num":
+            data[col["name"]] = np.fromfile(file, dtype=np.float64)
+        else:
+            lookup = np.array(col["categories"] + [np.nan], dtype=object)
+            # -1 -> NaN; object dtype keeps one shared str per category (no per-row copies)
+            data[col["name"]] = pd.Series(lookup[np.fromfile(file, dtype=np.int32)], dtype=object, copy=False)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), copy=False)
+
+def clear_cache():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)